@@ -10,7 +10,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from app.core.config import settings
 from app.core.database import Base
-from app.models import User, Order, Supplier, Product, Message  # Импортируем все модели
+from app.models import User, Order, Supplier, Product, Message, Conversation, NotificationOutbox, SupplierInterest, SupplierInterestTerm, MessageReadCursor  # Импортируем все модели
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
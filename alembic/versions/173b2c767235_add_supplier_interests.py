@@ -0,0 +1,49 @@
+"""add_supplier_interests
+
+Revision ID: 173b2c767235
+Revises: 6e8a899f7104
+Create Date: 2026-10-17 17:10:38.169604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '173b2c767235'
+down_revision = '6e8a899f7104'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'supplier_interests',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('value', sa.String(length=100), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_supplier_interests_id'), 'supplier_interests', ['id'], unique=False)
+    op.create_index(op.f('ix_supplier_interests_user_id'), 'supplier_interests', ['user_id'], unique=False)
+    op.create_table(
+        'supplier_interest_terms',
+        sa.Column('interest_id', sa.Integer(), nullable=False),
+        sa.Column('term', sa.String(length=100), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['interest_id'], ['supplier_interests.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('interest_id', 'term')
+    )
+    op.create_index('ix_supplier_interest_terms_term_user_id', 'supplier_interest_terms', ['term', 'user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_supplier_interest_terms_term_user_id', table_name='supplier_interest_terms')
+    op.drop_table('supplier_interest_terms')
+    op.drop_index(op.f('ix_supplier_interests_user_id'), table_name='supplier_interests')
+    op.drop_index(op.f('ix_supplier_interests_id'), table_name='supplier_interests')
+    op.drop_table('supplier_interests')
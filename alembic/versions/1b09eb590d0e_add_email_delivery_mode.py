@@ -0,0 +1,36 @@
+"""add_email_delivery_mode
+
+Revision ID: 1b09eb590d0e
+Revises: 173b2c767235
+Create Date: 2026-10-17 17:42:06.318247
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b09eb590d0e'
+down_revision = '173b2c767235'
+branch_labels = None
+depends_on = None
+
+delivery_mode = sa.Enum('IMMEDIATE', 'HOURLY', 'DAILY', name='emaildeliverymode')
+
+
+def upgrade() -> None:
+    delivery_mode.create(op.get_bind(), checkfirst=True)
+    op.add_column(
+        'users',
+        sa.Column('email_delivery_mode', delivery_mode, nullable=False, server_default='IMMEDIATE')
+    )
+    op.add_column(
+        'notification_outbox',
+        sa.Column('delivery_mode', delivery_mode, nullable=False, server_default='IMMEDIATE')
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('notification_outbox', 'delivery_mode')
+    op.drop_column('users', 'email_delivery_mode')
+    delivery_mode.drop(op.get_bind(), checkfirst=True)
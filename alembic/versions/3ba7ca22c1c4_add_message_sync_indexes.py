@@ -0,0 +1,43 @@
+"""add_message_sync_indexes
+
+Revision ID: 3ba7ca22c1c4
+Revises: 1b09eb590d0e
+Create Date: 2026-10-17 18:21:37.904512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3ba7ca22c1c4'
+down_revision = '1b09eb590d0e'
+branch_labels = None
+depends_on = None
+
+# Индексы инкрементальной синхронизации сообщений:
+# - новые сообщения заказа: order_id = ? AND id > ?
+# - новые сообщения пользователя: (sender_id = ? OR receiver_id = ?) AND id > ?
+# - прочтения: (sender_id = ? OR receiver_id = ?) AND read_at > ?
+INDEXES = [
+    ('ix_messages_order_id_id', 'messages', ['order_id', 'id']),
+    ('ix_messages_receiver_id_id', 'messages', ['receiver_id', 'id']),
+    ('ix_messages_sender_id_id', 'messages', ['sender_id', 'id']),
+    ('ix_messages_sender_id_read_at', 'messages', ['sender_id', 'read_at']),
+    ('ix_messages_receiver_id_read_at', 'messages', ['receiver_id', 'read_at']),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY не блокирует запись в messages, но не работает в транзакции
+    concurrently = op.get_bind().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=concurrently)
+
+
+def downgrade() -> None:
+    concurrently = op.get_bind().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=concurrently)
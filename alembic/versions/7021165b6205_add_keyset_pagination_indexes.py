@@ -0,0 +1,41 @@
+"""add_keyset_pagination_indexes
+
+Revision ID: 7021165b6205
+Revises: d46180e5c334
+Create Date: 2026-10-17 12:40:05.903114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7021165b6205'
+down_revision = 'd46180e5c334'
+branch_labels = None
+depends_on = None
+
+
+# Составные индексы под курсорную пагинацию по (created_at, id)
+INDEXES = [
+    ('ix_orders_created_at_id', 'orders', ['created_at', 'id']),
+    ('ix_messages_order_id_created_at_id', 'messages', ['order_id', 'created_at', 'id']),
+    ('ix_suppliers_created_at_id', 'suppliers', ['created_at', 'id']),
+    ('ix_users_created_at_id', 'users', ['created_at', 'id']),
+]
+
+
+def upgrade() -> None:
+    # В PostgreSQL строим индексы CONCURRENTLY, чтобы не блокировать запись в таблицы.
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    concurrently = op.get_bind().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=concurrently)
+
+
+def downgrade() -> None:
+    concurrently = op.get_bind().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=concurrently)
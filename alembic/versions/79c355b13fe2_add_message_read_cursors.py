@@ -0,0 +1,127 @@
+"""add_message_read_cursors
+
+Revision ID: 79c355b13fe2
+Revises: 3ba7ca22c1c4
+Create Date: 2026-10-17 19:04:12.583106
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '79c355b13fe2'
+down_revision = '3ba7ca22c1c4'
+branch_labels = None
+depends_on = None
+
+# Размер пачки заказов при заполнении курсоров по существующим отметкам read_at
+BACKFILL_BATCH_SIZE = 1000
+
+# Непрочитанные считаются как order_id = ? AND receiver_id = ? AND id > курсора
+NEW_INDEXES = [
+    ('ix_messages_order_id_receiver_id_id', 'messages', ['order_id', 'receiver_id', 'id'], None),
+]
+
+# Индексы по read_at больше не нужны: прочтения хранятся в message_read_cursors
+OLD_INDEXES = [
+    ('ix_messages_sender_id_read_at', 'messages', ['sender_id', 'read_at'], None),
+    ('ix_messages_receiver_id_read_at', 'messages', ['receiver_id', 'read_at'], None),
+    ('ix_messages_unread_receiver_id_order_id', 'messages', ['receiver_id', 'order_id'], 'read_at IS NULL'),
+]
+
+
+def _create_indexes(indexes, concurrently: bool) -> None:
+    for name, table, columns, where in indexes:
+        op.create_index(
+            name, table, columns, unique=False,
+            postgresql_where=sa.text(where) if where else None,
+            sqlite_where=sa.text(where) if where else None,
+            postgresql_concurrently=concurrently
+        )
+
+
+def _drop_indexes(indexes, concurrently: bool) -> None:
+    for name, table, columns, where in indexes:
+        op.drop_index(name, table_name=table, postgresql_concurrently=concurrently)
+
+
+def upgrade() -> None:
+    op.create_table(
+        'message_read_cursors',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('last_read_message_id', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('order_id', 'user_id', name='uq_message_read_cursors_order_id_user_id')
+    )
+    op.create_index(op.f('ix_message_read_cursors_id'), 'message_read_cursors', ['id'], unique=False)
+    op.create_index(op.f('ix_message_read_cursors_updated_at'), 'message_read_cursors', ['updated_at'], unique=False)
+
+    # Курсор ставится перед первым непрочитанным сообщением (или на последнее,
+    # если прочитано все): счетчики непрочитанных в conversations не меняются.
+    # Сообщения выше курсора с уже выставленным read_at остаются прочитанными
+    bind = op.get_bind()
+    select_batch = sa.text(
+        "SELECT id FROM orders WHERE id > :after_id ORDER BY id LIMIT :batch_size"
+    )
+    backfill = sa.text("""
+        INSERT INTO message_read_cursors (order_id, user_id, last_read_message_id, updated_at)
+        SELECT order_id, user_id, last_read_message_id, updated_at FROM (
+            SELECT
+                m.order_id AS order_id,
+                m.receiver_id AS user_id,
+                COALESCE(MIN(CASE WHEN m.read_at IS NULL THEN m.id END) - 1, MAX(m.id)) AS last_read_message_id,
+                MAX(m.read_at) AS updated_at
+            FROM messages m
+            WHERE m.order_id >= :first_id AND m.order_id <= :last_id
+            GROUP BY m.order_id, m.receiver_id
+            HAVING MAX(m.read_at) IS NOT NULL
+        ) cursors
+        WHERE last_read_message_id > 0
+    """)
+
+    concurrently = bind.dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        after_id = 0
+        while True:
+            order_ids = [
+                row[0] for row in bind.execute(
+                    select_batch, {"after_id": after_id, "batch_size": BACKFILL_BATCH_SIZE}
+                )
+            ]
+            if not order_ids:
+                break
+            bind.execute(backfill, {"first_id": order_ids[0], "last_id": order_ids[-1]})
+            after_id = order_ids[-1]
+
+        # CREATE/DROP INDEX CONCURRENTLY не блокирует запись в messages
+        _create_indexes(NEW_INDEXES, concurrently)
+        _drop_indexes(OLD_INDEXES, concurrently)
+
+
+def downgrade() -> None:
+    # Возвращаем курсоры в построчные отметки read_at
+    op.execute("""
+        UPDATE messages SET read_at = (
+            SELECT c.updated_at FROM message_read_cursors c
+            WHERE c.order_id = messages.order_id AND c.user_id = messages.receiver_id
+        )
+        WHERE read_at IS NULL AND id <= (
+            SELECT c.last_read_message_id FROM message_read_cursors c
+            WHERE c.order_id = messages.order_id AND c.user_id = messages.receiver_id
+        )
+    """)
+
+    concurrently = op.get_bind().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        _create_indexes(OLD_INDEXES, concurrently)
+        _drop_indexes(NEW_INDEXES, concurrently)
+
+    op.drop_index(op.f('ix_message_read_cursors_updated_at'), table_name='message_read_cursors')
+    op.drop_index(op.f('ix_message_read_cursors_id'), table_name='message_read_cursors')
+    op.drop_table('message_read_cursors')
@@ -0,0 +1,39 @@
+"""make_created_at_not_null
+
+Revision ID: add33dc53cde
+Revises: b3c83e5e0c6b
+Create Date: 2026-10-17 21:12:40.518734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add33dc53cde'
+down_revision = 'b3c83e5e0c6b'
+branch_labels = None
+depends_on = None
+
+# created_at - часть ключа курсорной пагинации (created_at, id) этих таблиц
+TABLES = ('orders', 'users', 'suppliers')
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        # Старые строки без created_at ставим в начало списка: на момент самой
+        # ранней известной записи таблицы (или сейчас, если известных нет)
+        op.execute(f"""
+            UPDATE {table}
+            SET created_at = COALESCE(
+                (SELECT MIN(created_at) FROM {table}),
+                CURRENT_TIMESTAMP
+            )
+            WHERE created_at IS NULL
+        """)
+        op.alter_column(table, 'created_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.alter_column(table, 'created_at', existing_type=sa.DateTime(), nullable=True)
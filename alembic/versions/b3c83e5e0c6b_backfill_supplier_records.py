@@ -0,0 +1,40 @@
+"""backfill_supplier_records
+
+Revision ID: b3c83e5e0c6b
+Revises: 79c355b13fe2
+Create Date: 2026-10-17 19:41:56.270318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3c83e5e0c6b'
+down_revision = '79c355b13fe2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Запись suppliers для каждого пользователя-поставщика: раньше она могла
+    # создаваться лениво при первом GET /orders, теперь - только при регистрации.
+    # Повторный запуск ничего не меняет (NOT EXISTS по уникальному user_id)
+    op.execute("""
+        INSERT INTO suppliers (name, user_id, contact_info, country, rating, created_at)
+        SELECT
+            COALESCE(u.organization_name, u.username),
+            u.id,
+            COALESCE(u.email, ''),
+            'China',
+            0.0,
+            CURRENT_TIMESTAMP
+        FROM users u
+        WHERE u.role = 'SUPPLIER'
+          AND NOT EXISTS (SELECT 1 FROM suppliers s WHERE s.user_id = u.id)
+    """)
+
+
+def downgrade() -> None:
+    # Созданные записи не отличить от созданных при регистрации - оставляем их
+    pass
@@ -0,0 +1,85 @@
+"""add_conversations_table
+
+Revision ID: d46180e5c334
+Revises: d55ee86d41d3
+Create Date: 2026-10-17 10:12:31.418207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd46180e5c334'
+down_revision = 'd55ee86d41d3'
+branch_labels = None
+depends_on = None
+
+# Размер пачки заказов при заполнении сводок по существующим сообщениям
+BACKFILL_BATCH_SIZE = 1000
+
+
+def upgrade() -> None:
+    op.create_table(
+        'conversations',
+        sa.Column('order_id', sa.Integer(), nullable=False),
+        sa.Column('last_message_id', sa.Integer(), nullable=True),
+        sa.Column('last_message_at', sa.DateTime(), nullable=True),
+        sa.Column('last_message_preview', sa.String(length=200), nullable=True),
+        sa.Column('buyer_unread_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('supplier_unread_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['last_message_id'], ['messages.id'], ),
+        sa.PrimaryKeyConstraint('order_id')
+    )
+    op.create_index(op.f('ix_conversations_last_message_at'), 'conversations', ['last_message_at'], unique=False)
+
+    # Заполняем сводки пачками заказов, фиксируя каждую пачку отдельно,
+    # чтобы не держать длинную транзакцию на больших таблицах
+    bind = op.get_bind()
+    select_batch = sa.text(
+        "SELECT id FROM orders WHERE id > :after_id ORDER BY id LIMIT :batch_size"
+    )
+    backfill = sa.text("""
+        INSERT INTO conversations (
+            order_id, last_message_id, last_message_at, last_message_preview,
+            buyer_unread_count, supplier_unread_count, updated_at
+        )
+        SELECT
+            o.id,
+            lm.id,
+            lm.created_at,
+            SUBSTR(lm.content, 1, 200),
+            (SELECT COUNT(*) FROM messages m
+             WHERE m.order_id = o.id AND m.receiver_id = o.buyer_id AND m.read_at IS NULL),
+            (SELECT COUNT(*) FROM messages m
+             WHERE m.order_id = o.id AND m.receiver_id <> o.buyer_id AND m.read_at IS NULL),
+            CURRENT_TIMESTAMP
+        FROM orders o
+        JOIN messages lm ON lm.id = (
+            SELECT m.id FROM messages m
+            WHERE m.order_id = o.id
+            ORDER BY m.created_at DESC, m.id DESC
+            LIMIT 1
+        )
+        WHERE o.id >= :first_id AND o.id <= :last_id
+    """)
+
+    with op.get_context().autocommit_block():
+        after_id = 0
+        while True:
+            order_ids = [
+                row[0] for row in bind.execute(
+                    select_batch, {"after_id": after_id, "batch_size": BACKFILL_BATCH_SIZE}
+                )
+            ]
+            if not order_ids:
+                break
+            bind.execute(backfill, {"first_id": order_ids[0], "last_id": order_ids[-1]})
+            after_id = order_ids[-1]
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_conversations_last_message_at'), table_name='conversations')
+    op.drop_table('conversations')
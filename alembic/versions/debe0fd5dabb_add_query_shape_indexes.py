@@ -0,0 +1,49 @@
+"""add_query_shape_indexes
+
+Revision ID: debe0fd5dabb
+Revises: 7021165b6205
+Create Date: 2026-10-17 14:02:47.260518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'debe0fd5dabb'
+down_revision = '7021165b6205'
+branch_labels = None
+depends_on = None
+
+# Индексы под реальные запросы сервисов:
+# - заказы покупателя: buyer_id = ? [AND status = ?]
+# - заказы поставщика: supplier_id = ? ORDER BY created_at
+# - свободные заказы: supplier_id IS NULL ORDER BY created_at, id (частичный)
+# - непрочитанные: receiver_id = ? AND order_id = ? AND read_at IS NULL (частичный)
+INDEXES = [
+    ('ix_orders_buyer_id_status', 'orders', ['buyer_id', 'status'], None),
+    ('ix_orders_supplier_id_created_at', 'orders', ['supplier_id', 'created_at'], None),
+    ('ix_orders_unassigned_created_at_id', 'orders', ['created_at', 'id'], 'supplier_id IS NULL'),
+    ('ix_messages_unread_receiver_id_order_id', 'messages', ['receiver_id', 'order_id'], 'read_at IS NULL'),
+]
+
+
+def upgrade() -> None:
+    # В PostgreSQL строим индексы CONCURRENTLY, чтобы не блокировать запись в таблицы.
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    concurrently = op.get_bind().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name, table, columns, unique=False,
+                postgresql_where=sa.text(where) if where else None,
+                sqlite_where=sa.text(where) if where else None,
+                postgresql_concurrently=concurrently
+            )
+
+
+def downgrade() -> None:
+    concurrently = op.get_bind().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=concurrently)
@@ -1,36 +1,52 @@
+from typing import Optional, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.core.database import get_db
+from app.core.database import get_db, get_async_db
 from app.core.security import decode_access_token
 from app.models.user import User
 from app.services import user_service
+from app.services.aio import user_service as aio_user_service
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    """Получить текущего аутентифицированного пользователя"""
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Не удалось подтвердить учетные данные",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+
+def _get_token_subject(token: str) -> Tuple[Optional[int], str]:
+    """Достать id (uid, может отсутствовать в старых токенах) и username из JWT токена"""
     payload = decode_access_token(token)
     if payload is None:
-        raise credentials_exception
+        raise _credentials_exception()
     
     username: str = payload.get("sub")
     if username is None:
-        raise credentials_exception
+        raise _credentials_exception()
     
-    user = user_service.get_user_by_username(db, username=username)
+    user_id = payload.get("uid")
+    if user_id is not None and not isinstance(user_id, int):
+        raise _credentials_exception()
+    
+    return user_id, username
+
+
+def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> User:
+    """Получить текущего аутентифицированного пользователя"""
+    user_id, username = _get_token_subject(token)
+    
+    user = user_service.get_principal(db, user_id=user_id, username=username)
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
     
     return user
 
@@ -41,3 +57,24 @@ def get_current_active_user(
     """Получить текущего активного пользователя"""
     return current_user
 
+
+
+async def get_current_user_async(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """Получить текущего аутентифицированного пользователя (для async роутеров)"""
+    user_id, username = _get_token_subject(token)
+    
+    user = await aio_user_service.get_principal(db, user_id=user_id, username=username)
+    if user is None:
+        raise _credentials_exception()
+    
+    return user
+
+
+async def get_current_active_user_async(
+    current_user: User = Depends(get_current_user_async)
+) -> User:
+    """Получить текущего активного пользователя (для async роутеров)"""
+    return current_user
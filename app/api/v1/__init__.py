@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1 import auth, orders, suppliers, users, messages
+from app.api.v1 import auth, orders, suppliers, users, messages, realtime, admin
 
 api_router = APIRouter()
 
@@ -8,4 +8,5 @@ api_router.include_router(orders.router, prefix="/orders", tags=["orders"])
 api_router.include_router(suppliers.router, prefix="/suppliers", tags=["suppliers"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(messages.router, prefix="", tags=["messages"])
-
+api_router.include_router(realtime.router, prefix="", tags=["realtime"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
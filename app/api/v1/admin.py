@@ -0,0 +1,39 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from app.api.deps import get_current_active_user_async
+from app.core import slow_queries
+from app.core.database import get_pool_status
+from app.models.user import User, UserRole
+from app.schemas.admin import PoolStatusResponse, SlowQueryResponse
+
+router = APIRouter()
+
+
+def _require_admin(current_user: User) -> None:
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Доступно только администраторам"
+        )
+
+
+@router.get("/slow-queries", response_model=List[SlowQueryResponse])
+async def get_slow_queries(
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_active_user_async)
+):
+    """
+    Самые медленные запросы этого процесса по суммарному времени
+    (включается SLOW_QUERY_LOG_ENABLED)
+    """
+    _require_admin(current_user)
+    return slow_queries.top(limit)
+
+
+@router.get("/db-pool", response_model=List[PoolStatusResponse])
+async def get_db_pool(
+    current_user: User = Depends(get_current_active_user_async)
+):
+    """Пулы соединений с БД этого процесса: заполненность и возраст соединений"""
+    _require_admin(current_user)
+    return get_pool_status()
@@ -1,25 +1,59 @@
 from datetime import timedelta
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from app.core.database import SessionLocal
 from app.core.config import settings
 from app.core.security import create_access_token
 from app.api.deps import get_current_active_user
 from app.models.user import User
 from app.schemas.auth import Token
 from app.schemas.user import UserCreate, UserResponse
-from app.services import user_service
+from app.services import user_service, credential_service
 
 router = APIRouter()
 
 
+# Работа с БД в auth-эндпоинтах идет короткими сессиями в пуле потоков:
+# соединение не удерживается, пока пароль хешируется в пуле процессов
+
+def _load_user(username: str) -> Optional[User]:
+    """Загрузить пользователя по username в отдельной сессии"""
+    db = SessionLocal()
+    try:
+        return user_service.get_user_by_username(db, username)
+    finally:
+        db.close()
+
+
+def _validate_new_user(user: UserCreate) -> None:
+    """Проверить занятость username и email в отдельной сессии"""
+    db = SessionLocal()
+    try:
+        user_service.validate_new_user(db, user)
+    finally:
+        db.close()
+
+
+def _create_user(user: UserCreate, password_hash: str) -> UserResponse:
+    """Создать пользователя в отдельной сессии"""
+    db = SessionLocal()
+    try:
+        db_user = user_service.create_user(db, user, password_hash=password_hash)
+        return UserResponse.model_validate(db_user)
+    finally:
+        db.close()
+
+
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate):
     """Регистрация нового пользователя"""
     try:
-        db_user = user_service.create_user(db, user)
-        return db_user
+        # Пароль хешируется только для регистрации, прошедшей проверки
+        await run_in_threadpool(_validate_new_user, user)
+        password_hash = await credential_service.hash_password(user.password)
+        return await run_in_threadpool(_create_user, user, password_hash)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -28,12 +62,11 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
 
 
 @router.post("/login", response_model=Token)
-def login(
-    form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
-):
+async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     """Вход в систему"""
-    user = user_service.authenticate_user(db, form_data.username, form_data.password)
+    user = await run_in_threadpool(_load_user, form_data.username)
+    if user and not await credential_service.verify_password(form_data.password, user.password_hash):
+        user = None
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -43,7 +76,7 @@ def login(
     
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username},
+        data={"sub": user.username, "uid": user.id},
         expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
@@ -64,6 +97,7 @@ def get_current_user_info(
         organization_name=current_user.organization_name,
         inn=current_user.inn,
         email_notifications=current_user.email_notifications,
+        email_delivery_mode=current_user.email_delivery_mode,
         created_at=current_user.created_at,
         updated_at=current_user.updated_at
     )
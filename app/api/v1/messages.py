@@ -1,12 +1,15 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
-from sqlalchemy.orm import joinedload
 from app.core.database import get_db
 from app.api.deps import get_current_active_user
 from app.models.user import User
 from app.models.message import Message
-from app.schemas.message import MessageCreate, MessageResponse, ChatInfo
+from app.schemas.message import MessageCreate, MessageResponse, ChatInfo, MessageUpdates
+from app.core.pagination import (
+    decode_cursor, set_cursor_headers, row_cursor, PREV_CURSOR_HEADER,
+    decode_sync_cursor, encode_sync_cursor
+)
 
 router = APIRouter()
 
@@ -35,27 +38,68 @@ def format_message_response(message: Message) -> MessageResponse:
 @router.get("/orders/{order_id}/messages", response_model=List[MessageResponse])
 def get_order_messages(
     order_id: int,
-    skip: int = Query(0, ge=0),
+    response: Response,
+    skip: int = Query(0, ge=0, deprecated=True),
     limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Курсор X-Next-Cursor: сообщения новее"),
+    before: Optional[str] = Query(None, description="Курсор X-Prev-Cursor: сообщения старее"),
+    latest: bool = Query(False, description="Последние limit сообщений"),
+    after_id: Optional[int] = Query(None, ge=0, description="Только сообщения с id больше after_id"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Получить сообщения по заказу"""
     from app.services import message_service
     
-    # Проверяем доступ и получаем сообщения через сервис
-    messages = message_service.get_messages_by_order(db, order_id, current_user.id, skip, limit)
-    if not messages:
-        # Если нет доступа, возвращаем пустой список
-        return []
+    # Проверяем доступ и получаем сообщения (с отправителем и получателем) через сервис.
+    # Если нет доступа, сервис возвращает пустой список
+    messages = message_service.get_messages_by_order(
+        db, order_id, current_user.id, skip, limit,
+        cursor=decode_cursor(cursor) if cursor else None,
+        before=decode_cursor(before) if before else None,
+        latest=latest,
+        after_id=after_id
+    )
+    
+    if after_id is not None:
+        # Курсоры не нужны: клиент сам ведет водяной знак по id последнего сообщения
+        return [format_message_response(msg) for msg in messages]
     
-    # Перезагружаем с отношениями
-    messages_with_relations = db.query(Message).options(
-        joinedload(Message.sender),
-        joinedload(Message.receiver)
-    ).filter(Message.order_id == order_id).order_by(Message.created_at.asc()).offset(skip).limit(limit).all()
+    if before or latest:
+        # Обратная пагинация: курсор на более старые сообщения
+        if messages and len(messages) >= limit:
+            response.headers[PREV_CURSOR_HEADER] = row_cursor(messages[0])
+    else:
+        set_cursor_headers(response, messages, limit)
     
-    return [format_message_response(msg) for msg in messages_with_relations]
+    return [format_message_response(msg) for msg in messages]
+
+
+@router.get("/messages/updates", response_model=MessageUpdates)
+def get_message_updates(
+    since: Optional[str] = Query(None, description="Курсор из предыдущего ответа; без него - текущий водяной знак"),
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Новые сообщения и прочтения во всех переписках пользователя с момента since
+    
+    Используется при переподключении вместо перезагрузки сообщений каждого заказа.
+    """
+    from app.services import message_service
+    
+    updates = message_service.get_message_updates(
+        db, current_user.id,
+        since=decode_sync_cursor(since) if since else None,
+        limit=limit
+    )
+    return MessageUpdates(
+        messages=[format_message_response(msg) for msg in updates["messages"]],
+        reads=updates["reads"],
+        cursor=encode_sync_cursor(updates["cursor"]),
+        has_more=updates["has_more"]
+    )
 
 
 @router.post("/messages", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
@@ -66,15 +110,10 @@ def create_message(
 ):
     """Отправить сообщение"""
     from app.services import message_service
-    from sqlalchemy.orm import joinedload
     
     try:
+        # Отправитель и получатель загружены сервисом и берутся из identity map
         db_message = message_service.create_message(db, message, current_user.id)
-        # Перезагружаем с отношениями
-        db_message = db.query(Message).options(
-            joinedload(Message.sender),
-            joinedload(Message.receiver)
-        ).filter(Message.id == db_message.id).first()
         return format_message_response(db_message)
     except ValueError as e:
         raise HTTPException(
@@ -91,8 +130,8 @@ def mark_message_read(
 ):
     """Отметить сообщение как прочитанное"""
     from app.services import message_service
-    from sqlalchemy.orm import joinedload
     
+    # Сервис возвращает сообщение с отправителем, получателем и read_at по курсору
     message = message_service.mark_message_as_read(db, message_id, current_user.id)
     if not message:
         raise HTTPException(
@@ -100,12 +139,6 @@ def mark_message_read(
             detail="Сообщение не найдено или нет доступа"
         )
     
-    # Перезагружаем с отношениями
-    message = db.query(Message).options(
-        joinedload(Message.sender),
-        joinedload(Message.receiver)
-    ).filter(Message.id == message.id).first()
-    
     return format_message_response(message)
 
 
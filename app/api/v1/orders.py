@@ -1,21 +1,30 @@
 from typing import Optional, List
-from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
 from app.core.database import get_db
 from app.api.deps import get_current_active_user
 from app.models.user import User
 from app.models.order import OrderStatus
 from app.models.supplier import Supplier
 from app.schemas.order import Order, OrderCreate, OrderUpdate, OrderResponse
-from app.services import order_service
+from app.services import order_service, order_feed_service, participant_service, supplier_service
+from app.core.pagination import decode_cursor, keyset_condition, set_cursor_headers
 
 router = APIRouter()
 
 
-def format_order_response(order, db: Session) -> OrderResponse:
-    """Форматирование ответа с расчетом оставшегося времени"""
+def format_order_response(order, db: Session, buyer=None, supplier=None) -> OrderResponse:
+    """
+    Форматирование ответа с расчетом оставшегося времени
+    
+    order - ORM объект или строка с колонками заказа; buyer и supplier можно
+    передать явно, если они уже загружены (для строки - обязательно).
+    """
     from app.schemas.order import BuyerInfo, SupplierInfo
     
+    buyer = buyer if buyer is not None else order.buyer
+    supplier = supplier if supplier is not None else order.supplier
     order_dict = {
         "id": order.id,
         "title": order.title,
@@ -34,23 +43,25 @@ def format_order_response(order, db: Session) -> OrderResponse:
         "updated_at": order.updated_at,
         "remaining_time": order_service.calculate_remaining_time(order.deadline_at),
         "buyer": BuyerInfo(
-            id=order.buyer.id,
-            username=order.buyer.username,
-            email=order.buyer.email if order.buyer.email else None
-        ) if order.buyer else None,
+            id=buyer.id,
+            username=buyer.username,
+            email=buyer.email if buyer.email else None
+        ) if buyer else None,
         "supplier": SupplierInfo(
-            id=order.supplier.id,
-            name=order.supplier.name,
-            user_id=order.supplier.user_id
-        ) if order.supplier else None
+            id=supplier.id,
+            name=supplier.name,
+            user_id=supplier.user_id
+        ) if supplier else None
     }
     return OrderResponse(**order_dict)
 
 
 @router.get("/", response_model=List[OrderResponse])
 def get_orders(
-    skip: int = Query(0, ge=0),
+    response: Response,
+    skip: int = Query(0, ge=0, deprecated=True),
     limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (X-Next-Cursor)"),
     status: Optional[OrderStatus] = Query(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
@@ -64,6 +75,7 @@ def get_orders(
         joinedload(Order.buyer),
         joinedload(Order.supplier)
     )
+    cursor_key = decode_cursor(cursor) if cursor else None
     
     # Фильтрация в зависимости от роли
     if current_user.role == UserRole.ADMIN:
@@ -76,28 +88,54 @@ def get_orders(
         # Поставщик видит:
         # 1. Заказы без поставщика (на которые можно откликнуться)
         # 2. Заказы, на которые он уже откликнулся (supplier_id = его supplier_id)
-        supplier = db.query(Supplier).filter(Supplier.user_id == current_user.id).first()
+        supplier_id = supplier_service.get_supplier_id_by_user(db, current_user.id)
         
-        # Если нет supplier, создаем его автоматически
-        if not supplier:
-            supplier = Supplier(
-                name=current_user.organization_name or current_user.username,
-                user_id=current_user.id,
-                contact_info=current_user.email or ""
-            )
-            db.add(supplier)
-            db.commit()
-            db.refresh(supplier)
+        # Свободные заказы - из общего снимка, запрос только за своими
+        snapshot = order_feed_service.get_unassigned(db, lambda order: format_order_response(order, db))
+        if snapshot is not None:
+            own = []
+            if supplier_id is not None:
+                own_query = query.filter(Order.supplier_id == supplier_id)
+                if status:
+                    own_query = own_query.filter(Order.status == status)
+                if cursor_key:
+                    own_query = own_query.filter(keyset_condition(Order.created_at, Order.id, cursor_key))
+                own = [
+                    format_order_response(order, db)
+                    for order in own_query.order_by(
+                        Order.created_at.asc(), Order.id.asc()
+                    ).limit(limit + (0 if cursor_key else skip)).all()
+                ]
+            page = order_feed_service.merge_page(snapshot, own, status, cursor_key, skip, limit)
+            set_cursor_headers(response, page, limit)
+            # Оставшееся время в снимке могло устареть - пересчитываем для страницы
+            return [
+                item.model_copy(update={
+                    "remaining_time": order_service.calculate_remaining_time(item.deadline_at)
+                })
+                for item in page
+            ]
         
         # Показываем заказы без поставщика ИЛИ заказы, на которые он откликнулся
-        query = query.filter(
-            (Order.supplier_id.is_(None)) | (Order.supplier_id == supplier.id)
-        )
+        if supplier_id is None:
+            query = query.filter(Order.supplier_id.is_(None))
+        else:
+            query = query.filter(
+                (Order.supplier_id.is_(None)) | (Order.supplier_id == supplier_id)
+            )
     
     if status:
         query = query.filter(Order.status == status)
     
-    orders = query.offset(skip).limit(limit).all()
+    # Стабильный порядок (created_at, id) для курсорной пагинации
+    query = query.order_by(Order.created_at.asc(), Order.id.asc())
+    if cursor_key:
+        query = query.filter(keyset_condition(Order.created_at, Order.id, cursor_key))
+    else:
+        query = query.offset(skip)
+    
+    orders = query.limit(limit).all()
+    set_cursor_headers(response, orders, limit)
     
     return [format_order_response(order, db) for order in orders]
 
@@ -112,7 +150,6 @@ def get_order(
     from sqlalchemy.orm import joinedload
     from app.models.order import Order
     from app.models.user import UserRole
-    from app.models.supplier import Supplier
     
     order = db.query(Order).options(
         joinedload(Order.buyer),
@@ -125,37 +162,14 @@ def get_order(
             detail="Заказ не найден"
         )
     
-    # Проверка прав доступа
-    if current_user.role == UserRole.ADMIN:
-        pass  # Админ видит все
-    elif current_user.role == UserRole.BUYER:
-        # Заказчик видит только свои заказы
-        if order.buyer_id != current_user.id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Недостаточно прав для доступа к этому заказу"
-            )
-    elif current_user.role == UserRole.SUPPLIER:
-        # Поставщик видит заказы без поставщика ИЛИ заказы, на которые он откликнулся
-        supplier = db.query(Supplier).filter(Supplier.user_id == current_user.id).first()
-        
-        # Если нет supplier, создаем его автоматически
-        if not supplier:
-            supplier = Supplier(
-                name=current_user.organization_name or current_user.username,
-                user_id=current_user.id,
-                contact_info=current_user.email or ""
-            )
-            db.add(supplier)
-            db.commit()
-            db.refresh(supplier)
-        
-        # Видит заказы без поставщика ИЛИ свои заказы
-        if order.supplier_id is not None and order.supplier_id != supplier.id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Недостаточно прав для доступа к этому заказу"
-            )
+    # Проверка прав доступа: админ видит все, покупатель - свои заказы,
+    # поставщик - свободные заказы и заказы, на которые он откликнулся
+    participants = participant_service.OrderParticipants.from_order(order)
+    if current_user.role != UserRole.ADMIN and not participants.can_access(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Недостаточно прав для доступа к этому заказу"
+        )
     
     return format_order_response(order, db)
 
@@ -163,69 +177,17 @@ def get_order(
 @router.post("/", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
 def create_order(
     order: OrderCreate,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Создать новый заказ"""
-    from sqlalchemy.orm import joinedload
-    from app.models.order import Order
-    from app.models.user import User, UserRole
-    from app.services import email_service
-    
     try:
+        # Email уведомления поставщикам ставятся в outbox вместе с заказом
         db_order = order_service.create_order(db, order, current_user.id)
         
-        # Отправляем email уведомления в фоне
-        if not order.supplier_id:
-            # Отправляем всем поставщикам с включенными уведомлениями
-            suppliers = db.query(User).filter(
-                User.role == UserRole.SUPPLIER,
-                User.email_notifications == True,
-                User.email.isnot(None)
-            ).all()
-            
-            buyer_name = current_user.organization_name or current_user.username
-            
-            for supplier in suppliers:
-                if supplier.email:
-                    background_tasks.add_task(
-                        email_service.send_order_notification_sync,
-                        supplier_email=supplier.email,
-                        order_title=db_order.title,
-                        product_name=db_order.product_name,
-                        delivery_volume=db_order.delivery_volume,
-                        purchase_budget=db_order.purchase_budget,
-                        deadline_at=db_order.deadline_at.isoformat(),
-                        product_description=db_order.product_description,
-                        buyer_name=buyer_name
-                    )
-        else:
-            # Отправляем конкретному поставщику
-            from app.models.supplier import Supplier
-            supplier = db.query(Supplier).filter(Supplier.id == order.supplier_id).first()
-            if supplier and supplier.user_id:
-                supplier_user = db.query(User).filter(User.id == supplier.user_id).first()
-                if supplier_user and supplier_user.email_notifications and supplier_user.email:
-                    buyer_name = current_user.organization_name or current_user.username
-                    background_tasks.add_task(
-                        email_service.send_order_notification_sync,
-                        supplier_email=supplier_user.email,
-                        order_title=db_order.title,
-                        product_name=db_order.product_name,
-                        delivery_volume=db_order.delivery_volume,
-                        purchase_budget=db_order.purchase_budget,
-                        deadline_at=db_order.deadline_at.isoformat(),
-                        product_description=db_order.product_description,
-                        buyer_name=buyer_name
-                    )
-        
-        # Перезагружаем с отношениями
-        db_order = db.query(Order).options(
-            joinedload(Order.buyer),
-            joinedload(Order.supplier)
-        ).filter(Order.id == db_order.id).first()
-        return format_order_response(db_order, db)
+        # Покупатель - текущий пользователь, поставщик (если указан) загружен
+        # сервисом при проверке: оба берутся из identity map без запросов
+        return format_order_response(db_order, db, buyer=current_user)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -241,8 +203,6 @@ def update_order(
     current_user: User = Depends(get_current_active_user)
 ):
     """Обновить заказ"""
-    from sqlalchemy.orm import joinedload
-    
     order = order_service.get_order(db, order_id)
     if not order:
         raise HTTPException(
@@ -257,15 +217,9 @@ def update_order(
             detail="Недостаточно прав для изменения этого заказа"
         )
     
-    from app.models.order import Order
-    
     try:
+        # Сервис изменяет тот же объект заказа (identity map), после commit он не перечитывается
         updated_order = order_service.update_order(db, order_id, order_update)
-        # Перезагружаем с отношениями
-        updated_order = db.query(Order).options(
-            joinedload(Order.buyer),
-            joinedload(Order.supplier)
-        ).filter(Order.id == updated_order.id).first()
         return format_order_response(updated_order, db)
     except ValueError as e:
         raise HTTPException(
@@ -311,7 +265,6 @@ def update_order_status(
     current_user: User = Depends(get_current_active_user)
 ):
     """Изменить статус заказа"""
-    from sqlalchemy.orm import joinedload
     from app.models.user import UserRole
     
     order = order_service.get_order(db, order_id)
@@ -338,14 +291,7 @@ def update_order_status(
             detail="Поставщики не могут изменять статус заказа"
         )
     
-    from app.models.order import Order
-    
     updated_order = order_service.update_order_status(db, order_id, new_status)
-    # Перезагружаем с отношениями
-    updated_order = db.query(Order).options(
-        joinedload(Order.buyer),
-        joinedload(Order.supplier)
-    ).filter(Order.id == updated_order.id).first()
     return format_order_response(updated_order, db)
 
 
@@ -356,9 +302,7 @@ def respond_to_order(
     current_user: User = Depends(get_current_active_user)
 ):
     """Откликнуться на заказ (только для поставщиков)"""
-    from sqlalchemy.orm import joinedload
     from app.models.user import UserRole
-    from app.models.order import Order
     
     if current_user.role != UserRole.SUPPLIER:
         raise HTTPException(
@@ -366,43 +310,37 @@ def respond_to_order(
             detail="Только поставщики могут откликаться на заказы"
         )
     
-    order = order_service.get_order(db, order_id)
-    if not order:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Заказ не найден"
-        )
+    # Получаем supplier для текущего пользователя; запись создается при
+    # регистрации, здесь - только если ее нет (POST, запись допустима)
+    supplier_id = supplier_service.get_supplier_id_by_user(db, current_user.id)
+    if supplier_id is None:
+        supplier_id = supplier_service.ensure_supplier_for_user(db, current_user)
+        db.commit()
     
-    # Проверяем, что заказ еще не взят
-    if order.supplier_id is not None:
+    # Атомарно закрепляем заказ за поставщиком, если он еще свободен
+    try:
+        claimed = order_service.claim_order(db, order_id, supplier_id)
+    except IntegrityError:
+        # Запись поставщика удалена в другом воркере, а кеш этого воркера еще
+        # помнит ее id (нарушение внешнего ключа) - находим или создаем запись заново
+        db.rollback()
+        supplier_service.supplier_id_cache.invalidate(current_user.id)
+        supplier_id = supplier_service.ensure_supplier_for_user(db, current_user)
+        db.commit()
+        claimed = order_service.claim_order(db, order_id, supplier_id)
+    if claimed is None:
+        if not order_service.get_order(db, order_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Заказ не найден"
+            )
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
+            status_code=status.HTTP_409_CONFLICT,
             detail="Этот заказ уже взят другим поставщиком"
         )
     
-    # Получаем supplier для текущего пользователя
-    supplier = db.query(Supplier).filter(Supplier.user_id == current_user.id).first()
-    if not supplier:
-        # Автоматически создаем supplier, если его нет (для существующих пользователей)
-        supplier = Supplier(
-            name=current_user.organization_name or current_user.username,
-            user_id=current_user.id,
-            contact_info=current_user.email or ""
-        )
-        db.add(supplier)
-        db.commit()
-        db.refresh(supplier)
-    
-    # Обновляем заказ, привязывая его к поставщику
-    order.supplier_id = supplier.id
-    db.commit()
-    db.refresh(order)
-    
-    # Перезагружаем с отношениями
-    order = db.query(Order).options(
-        joinedload(Order.buyer),
-        joinedload(Order.supplier)
-    ).filter(Order.id == order.id).first()
-    
-    return format_order_response(order, db)
+    # Ответ собирается из возвращенной строки: покупатель и поставщик - по ключу
+    buyer = db.get(User, claimed.buyer_id)
+    supplier = db.get(Supplier, supplier_id)
+    return format_order_response(claimed, db, buyer=buyer, supplier=supplier)
 
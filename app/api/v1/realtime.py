@@ -0,0 +1,79 @@
+import asyncio
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from app.api.deps import _get_token_subject
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.services import realtime_service
+from app.services.aio import user_service as aio_user_service
+
+router = APIRouter()
+
+
+async def _authenticate(token: str):
+    """Пользователь по JWT токену или None"""
+    try:
+        user_id, username = _get_token_subject(token)
+    except HTTPException:
+        return None
+    async with AsyncSessionLocal() as db:
+        return await aio_user_service.get_principal(db, user_id=user_id, username=username)
+
+
+async def _send_events(websocket: WebSocket, subscription: realtime_service.Subscription) -> None:
+    """Пересылать события подписки клиенту; пинговать простаивающее соединение"""
+    while True:
+        try:
+            event = await asyncio.wait_for(
+                subscription.queue.get(), settings.REALTIME_PING_INTERVAL_SECONDS
+            )
+        except asyncio.TimeoutError:
+            await websocket.send_json({"type": "ping"})
+            continue
+        if event is None:
+            # Очередь переполнена - клиент переподключится и догрузит историю
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+            return
+        await websocket.send_json(event)
+
+
+async def _receive(websocket: WebSocket) -> None:
+    """Читать сообщения клиента до отключения (поддерживается только ping)"""
+    while True:
+        message = await websocket.receive_json()
+        if isinstance(message, dict) and message.get("type") == "ping":
+            await websocket.send_json({"type": "pong"})
+
+
+@router.websocket("/ws")
+async def chat_events(
+    websocket: WebSocket,
+    token: str = Query(..., description="JWT токен (заголовок Authorization в WebSocket недоступен браузеру)")
+):
+    """
+    События чата в реальном времени для текущего пользователя
+    
+    Приходят новые сообщения (message.created) и отметки о прочтении
+    (message.read) по всем перепискам пользователя, поэтому подключенному
+    клиенту не нужно опрашивать /orders/{id}/messages и /messages/chats.
+    """
+    user = await _authenticate(token)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await websocket.accept()
+    subscription = realtime_service.hub.subscribe(user.id)
+    tasks = [
+        asyncio.create_task(_send_events(websocket, subscription)),
+        asyncio.create_task(_receive(websocket)),
+    ]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+        realtime_service.hub.unsubscribe(subscription)
@@ -1,35 +1,42 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.api.deps import get_current_active_user
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
+from app.api.deps import get_current_active_user_async
 from app.models.user import User, UserRole
 from app.schemas.supplier import Supplier, SupplierCreate, SupplierResponse
-from app.services import supplier_service
+from app.services.aio import supplier_service
+from app.core.pagination import decode_cursor, set_cursor_headers
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[SupplierResponse])
-def get_suppliers(
-    skip: int = Query(0, ge=0),
+async def get_suppliers(
+    response: Response,
+    skip: int = Query(0, ge=0, deprecated=True),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (X-Next-Cursor)"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user_async)
 ):
     """Получить список поставщиков"""
-    suppliers = supplier_service.get_suppliers(db, skip=skip, limit=limit)
+    suppliers = await supplier_service.get_suppliers(
+        db, skip=skip, limit=limit,
+        cursor=decode_cursor(cursor) if cursor else None
+    )
+    set_cursor_headers(response, suppliers, limit)
     return suppliers
 
 
 @router.get("/{supplier_id}", response_model=SupplierResponse)
-def get_supplier(
+async def get_supplier(
     supplier_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user_async)
 ):
     """Получить поставщика по ID"""
-    supplier = supplier_service.get_supplier(db, supplier_id)
+    supplier = await supplier_service.get_supplier(db, supplier_id)
     if not supplier:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -39,10 +46,10 @@ def get_supplier(
 
 
 @router.post("/", response_model=SupplierResponse, status_code=status.HTTP_201_CREATED)
-def create_supplier(
+async def create_supplier(
     supplier: SupplierCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user_async)
 ):
     """Создать нового поставщика (только для админов)"""
     if current_user.role != UserRole.ADMIN:
@@ -51,14 +58,14 @@ def create_supplier(
             detail="Только администраторы могут создавать поставщиков"
         )
     
-    return supplier_service.create_supplier(db, supplier)
+    return await supplier_service.create_supplier(db, supplier)
 
 
 @router.delete("/{supplier_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_supplier(
+async def delete_supplier(
     supplier_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user_async)
 ):
     """Удалить поставщика (только для админов)"""
     if current_user.role != UserRole.ADMIN:
@@ -67,7 +74,7 @@ def delete_supplier(
             detail="Только администраторы могут удалять поставщиков"
         )
     
-    success = supplier_service.delete_supplier(db, supplier_id)
+    success = await supplier_service.delete_supplier(db, supplier_id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1,20 +1,24 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.core.config import settings
 from app.api.deps import get_current_active_user
 from app.models.user import User, UserRole
 from app.schemas.user import UserResponse, UserNotificationSettings, UserUpdate, UserUpdateResponse
-from app.services import user_service
+from app.schemas.interest import SupplierInterests
+from app.services import user_service, interest_service
+from app.core.pagination import decode_cursor, set_cursor_headers
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[UserResponse])
 def get_users(
-    skip: int = Query(0, ge=0),
+    response: Response,
+    skip: int = Query(0, ge=0, deprecated=True),
     limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (X-Next-Cursor)"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
@@ -25,10 +29,60 @@ def get_users(
             detail="Только администраторы могут просматривать список пользователей"
         )
     
-    users = user_service.get_users(db, skip=skip, limit=limit)
+    users = user_service.get_users(
+        db, skip=skip, limit=limit,
+        cursor=decode_cursor(cursor) if cursor else None
+    )
+    set_cursor_headers(response, users, limit)
     return users
 
 
+def _require_supplier(current_user: User) -> None:
+    if current_user.role != UserRole.SUPPLIER:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Подписки на заказы доступны только поставщикам"
+        )
+
+
+@router.get("/me/interests", response_model=SupplierInterests)
+def get_interests(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Получить подписки текущего поставщика на заказы"""
+    _require_supplier(current_user)
+    return interest_service.get_interests(db, current_user.id)
+
+
+@router.put("/me/interests", response_model=SupplierInterests)
+def update_interests(
+    interests: SupplierInterests,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Заменить подписки текущего поставщика
+    
+    Уведомления о свободных заказах приходят только по совпавшим категориям
+    и ключевым словам; без подписок поставщик получает все заказы.
+    """
+    _require_supplier(current_user)
+    return interest_service.replace_interests(
+        db, current_user.id, interests.categories, interests.keywords
+    )
+
+
+@router.get("/me/interests/suggestions", response_model=SupplierInterests)
+def suggest_interests(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Предложить подписки по категориям и наименованиям товаров поставщика"""
+    _require_supplier(current_user)
+    return interest_service.suggest_from_products(db, current_user.id)
+
+
 @router.get("/{user_id}", response_model=UserResponse)
 def get_user(
     user_id: int,
@@ -60,8 +114,10 @@ def update_notification_settings(
 ):
     """Обновить настройки уведомлений текущего пользователя"""
     current_user.email_notifications = settings.email_notifications
+    if settings.email_delivery_mode is not None:
+        current_user.email_delivery_mode = settings.email_delivery_mode
     db.commit()
-    db.refresh(current_user)
+    user_service.invalidate_principal(current_user.id)
     return current_user
 
 
@@ -119,14 +175,14 @@ def update_profile(
         current_user.inn = user_update.inn
     
     db.commit()
-    db.refresh(current_user)
+    user_service.invalidate_principal(current_user.id)
     
     # Если username изменился, генерируем новый токен
     access_token = None
     if username_changed:
         access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            data={"sub": current_user.username},
+            data={"sub": current_user.username, "uid": current_user.id},
             expires_delta=access_token_expires
         )
     
@@ -139,6 +195,7 @@ def update_profile(
         organization_name=current_user.organization_name,
         inn=current_user.inn,
         email_notifications=current_user.email_notifications,
+        email_delivery_mode=current_user.email_delivery_mode,
         created_at=current_user.created_at,
         updated_at=current_user.updated_at,
         access_token=access_token
@@ -1,24 +1,175 @@
-from sqlalchemy import create_engine
+import time
+import weakref
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.core import metrics, query_stats, slow_queries
 
-# Настройка пула соединений для продакшена
-# pool_size - количество постоянных соединений
-# max_overflow - максимальное количество дополнительных соединений
-# pool_pre_ping - проверка соединения перед использованием (важно для продакшена)
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_size=10,  # 10 постоянных соединений
-    max_overflow=20,  # до 20 дополнительных при нагрузке (итого до 30)
-    pool_pre_ping=True,  # проверка соединения перед использованием
-    pool_recycle=3600,  # пересоздавать соединения каждые 3600 секунд (1 час)
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def _session_timeouts() -> dict:
+    """Таймауты сессии PostgreSQL в миллисекундах (0 в настройках - не задавать)"""
+    timeouts = {
+        "statement_timeout": settings.DB_STATEMENT_TIMEOUT_MS,
+        "lock_timeout": settings.DB_LOCK_TIMEOUT_MS,
+        "idle_in_transaction_session_timeout": settings.DB_IDLE_IN_TRANSACTION_TIMEOUT_MS,
+    }
+    return {name: str(value) for name, value in timeouts.items() if value > 0}
+
+
+def engine_options(url) -> dict:
+    """
+    Параметры create_engine/create_async_engine для диалекта URL
+
+    PostgreSQL: пул из настроек DB_POOL_*, таймауты сессии передаются при
+    подключении (psycopg2 - через options, asyncpg - через server_settings).
+    SQLite (тесты, локальная разработка): пул диалекта по умолчанию без
+    параметров размера, DB_LOCK_TIMEOUT_MS - ожидание занятой базы.
+    """
+    url = make_url(url)
+    backend = url.get_backend_name()
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    connect_args = {}
+    if backend == "sqlite":
+        if settings.DB_LOCK_TIMEOUT_MS > 0:
+            connect_args["timeout"] = settings.DB_LOCK_TIMEOUT_MS / 1000
+    else:
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+            pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+            pool_use_lifo=settings.DB_POOL_USE_LIFO,
+        )
+    timeouts = _session_timeouts() if backend == "postgresql" else {}
+    if timeouts:
+        if url.get_driver_name() == "asyncpg":
+            connect_args["server_settings"] = timeouts
+        else:
+            connect_args["options"] = " ".join(f"-c {name}={value}" for name, value in timeouts.items())
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+
+# Записи соединений пулов (ConnectionPoolEntry) по движку
+_connection_records = {}
+
+
+def _track_connections(engine) -> None:
+    """Время открытия и выдачи соединений пула для get_pool_status()"""
+    records = weakref.WeakSet()
+    _connection_records[engine] = records
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        connection_record.info["connected_at"] = time.time()
+        records.add(connection_record)
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.time()
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        if connection_record is not None:
+            connection_record.info.pop("checked_out_at", None)
+
+
+def _pool_status(name: str, engine) -> dict:
+    """Заполненность пула движка и возраст его открытых соединений"""
+    pool = engine.pool
+    now = time.time()
+    connections = []
+    for record in list(_connection_records.get(engine, ())):
+        # Запись остается в пуле после закрытия соединения (recycle, invalidate)
+        if record.dbapi_connection is None or "connected_at" not in record.info:
+            continue
+        checked_out_at = record.info.get("checked_out_at")
+        connections.append({
+            "age_seconds": now - record.info["connected_at"],
+            "checked_out": checked_out_at is not None,
+            "checked_out_seconds": now - checked_out_at if checked_out_at is not None else None,
+        })
+    connections.sort(key=lambda connection: connection["age_seconds"], reverse=True)
+    return {
+        "engine": name,
+        "dialect": engine.dialect.name,
+        "pool_class": type(pool).__name__,
+        # NullPool и StaticPool не ведут счетчиков размера
+        "size": pool.size() if hasattr(pool, "size") else None,
+        "checked_in": pool.checkedin() if hasattr(pool, "checkedin") else None,
+        "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+        "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+        "max_overflow": getattr(pool, "_max_overflow", None),
+        "timeout_seconds": pool.timeout() if hasattr(pool, "timeout") else None,
+        "recycle_seconds": pool._recycle if pool._recycle >= 0 else None,
+        "connections": connections,
+    }
+
+
+# Пул соединений: размер, таймауты и recycle задаются настройками DB_POOL_*,
+# чтобы подбирать их под окружение без изменения кода
+engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
+_track_connections(engine)
+query_stats.instrument(engine)
+slow_queries.instrument(engine)
+metrics.instrument_pool(engine, "sync")
+# expire_on_commit=False: после commit объекты не перечитываются из БД - ответ
+# строится из уже загруженных данных (значения по умолчанию вычисляются в Python
+# и известны после flush), а связанные объекты берутся из identity map сессии
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 Base = declarative_base()
 
 
+def get_async_database_url(database_url: str):
+    """
+    URL и connect_args для асинхронного драйвера
+    
+    PostgreSQL работает через asyncpg, SQLite (тесты) - через aiosqlite.
+    Параметр sslmode (как в URL от Render) asyncpg не понимает, поэтому
+    переносим его в connect_args["ssl"].
+    """
+    url = make_url(database_url)
+    connect_args = {}
+    backend = url.get_backend_name()
+    if backend == "postgresql":
+        query = dict(url.query)
+        sslmode = query.pop("sslmode", None)
+        if sslmode:
+            connect_args["ssl"] = sslmode
+        url = url.set(drivername="postgresql+asyncpg", query=query)
+    elif backend == "sqlite":
+        url = url.set(drivername="sqlite+aiosqlite")
+    return url, connect_args
+
+
+# Асинхронный движок работает параллельно с синхронным: роутеры переводятся
+# на async def по одному, синхронный путь продолжает работать
+_async_url, _async_connect_args = get_async_database_url(settings.DATABASE_URL)
+_async_options = engine_options(_async_url)
+_async_options["connect_args"] = {**_async_options.get("connect_args", {}), **_async_connect_args}
+async_engine = create_async_engine(_async_url, **_async_options)
+_track_connections(async_engine.sync_engine)
+query_stats.instrument(async_engine.sync_engine)
+slow_queries.instrument(async_engine.sync_engine)
+metrics.instrument_pool(async_engine.sync_engine, "async")
+# expire_on_commit=False: после commit атрибуты не перечитываются лениво,
+# что в асинхронном коде привело бы к неявному запросу вне await
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+
+def get_pool_status() -> list:
+    """Состояние пулов синхронного и асинхронного движков (GET /api/v1/admin/db-pool)"""
+    return [
+        _pool_status("sync", engine),
+        _pool_status("async", async_engine.sync_engine),
+    ]
+
+
 def get_db():
     """Dependency для получения сессии БД"""
     db = SessionLocal()
@@ -27,3 +178,8 @@ def get_db():
     finally:
         db.close()
 
+
+async def get_async_db():
+    """Dependency для получения асинхронной сессии БД"""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,338 @@
+"""
+Метрики в текстовом формате Prometheus (GET /metrics)
+
+Счетчики и гистограммы процесса (Counter, Histogram) обновляются в коде,
+остальные значения (размер пула БД, кеши, очередь почты) снимают
+коллекторы в момент выгрузки.
+
+Несколько воркеров uvicorn и воркер outbox - отдельные процессы, и запрос
+/metrics попадает в один из них. Если задан METRICS_DIR, каждый процесс раз
+в METRICS_FLUSH_INTERVAL_SECONDS записывает снимок своих метрик в
+собственный файл этого каталога, а /metrics суммирует файлы всех процессов:
+счетчики и гистограммы - всех, в том числе завершившихся (значения не
+теряются при перезапуске воркера), gauge - только процессов, обновлявших
+файл недавно. Каталог очищается при деплое. Без METRICS_DIR выгружаются
+метрики только текущего процесса.
+"""
+import asyncio
+import bisect
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+# Значение коллектора: (имя, тип, описание, метки, значение)
+Sample = Tuple[str, str, str, Dict[str, str], float]
+
+_metrics: List["_Metric"] = []
+_collectors: List[Callable[[], Iterable[Sample]]] = []
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _labels(self, values: tuple) -> Dict[str, str]:
+        return dict(zip(self.labelnames, (str(value) for value in values)))
+
+
+class Counter(_Metric):
+    """Монотонно растущий счетчик"""
+
+    type = COUNTER
+
+    def inc(self, labels: tuple = (), amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in values.items():
+            yield self.name, self._labels(labels), value
+
+
+class Histogram(_Metric):
+    """Распределение значений по корзинам (le) с суммой и числом наблюдений"""
+
+    type = HISTOGRAM
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = ()):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, labels: tuple = ()) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # Число наблюдений в каждой корзине (последняя - +Inf), сумма
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def samples(self):
+        with self._lock:
+            values = {labels: (list(counts), total) for labels, (counts, total) in self._values.items()}
+        for labels, (counts, total) in values.items():
+            label_dict = self._labels(labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                yield f"{self.name}_bucket", {**label_dict, "le": le}, cumulative
+            yield f"{self.name}_sum", label_dict, total
+            yield f"{self.name}_count", label_dict, cumulative
+
+
+def register_collector(collector: Callable[[], Iterable[Sample]]) -> None:
+    """Добавить функцию, которая возвращает значения на момент выгрузки"""
+    if collector not in _collectors:
+        _collectors.append(collector)
+
+
+# HTTP запросы (MetricsMiddleware)
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP запросы по маршруту и статусу ответа",
+    ("method", "route", "status")
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP запроса",
+    ("method", "route"),
+    (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+# Пулы соединений с БД (instrument_pool)
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_duration_seconds",
+    "Ожидание соединения из пула, включая открытие нового соединения",
+    ("engine",),
+    (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+)
+_engines: Dict[str, Engine] = {}
+
+
+def _time_checkout(pool, engine_name: str) -> None:
+    do_get = pool._do_get
+
+    def timed_do_get():
+        started_at = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - started_at, (engine_name,))
+
+    pool._do_get = timed_do_get
+
+
+def instrument_pool(engine: Engine, name: str) -> None:
+    """
+    Метрики пула соединений движка (для AsyncEngine - его .sync_engine):
+    время ожидания соединения и заполненность пула
+    """
+    _engines[name] = engine
+    _time_checkout(engine.pool, name)
+    # dispose() заменяет пул новым
+    event.listen(engine, "engine_disposed", lambda conn: _time_checkout(engine.pool, name))
+
+
+def _collect_pools() -> Iterable[Sample]:
+    for name, engine in _engines.items():
+        pool = engine.pool
+        labels = {"engine": name}
+        for metric, method, help in (
+            ("db_pool_size", "size", "Постоянных соединений в пуле"),
+            ("db_pool_checked_out", "checkedout", "Соединений выдано из пула"),
+            ("db_pool_checked_in", "checkedin", "Свободных соединений в пуле"),
+            ("db_pool_overflow", "overflow", "Соединений сверх pool_size (отрицательно - еще не открыты)"),
+        ):
+            # NullPool и StaticPool не ведут этих счетчиков
+            if hasattr(pool, method):
+                yield metric, GAUGE, help, labels, getattr(pool, method)()
+
+
+register_collector(_collect_pools)
+
+
+class MetricsMiddleware:
+    """ASGI middleware: число и время HTTP запросов по шаблону маршрута"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started_at = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Путь без маршрута (404) не попадает в метки: их число не ограничено
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope.get("method", "")
+            HTTP_REQUESTS.inc((method, route, status_code))
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started_at, (method, route))
+
+
+def _snapshot() -> dict:
+    """Метрики процесса: {имя: {type, help, samples: [[имя значения, метки, значение]]}}"""
+    families = {}
+    for metric in _metrics:
+        family = families.setdefault(metric.name, {"type": metric.type, "help": metric.help, "samples": []})
+        family["samples"].extend([name, labels, value] for name, labels, value in metric.samples())
+    for collector in _collectors:
+        try:
+            samples = list(collector())
+        except Exception:
+            logger.exception("Ошибка коллектора метрик")
+            continue
+        for name, metric_type, help, labels, value in samples:
+            family = families.setdefault(name, {"type": metric_type, "help": help, "samples": []})
+            family["samples"].append([name, labels, float(value)])
+    return families
+
+
+_file_pid: Optional[int] = None
+_file_path: Optional[str] = None
+
+
+def _own_file() -> str:
+    """Файл снимка процесса (pid и случайный суффикс: pid переиспользуются)"""
+    global _file_pid, _file_path
+    pid = os.getpid()
+    if _file_pid != pid:
+        _file_pid = pid
+        _file_path = os.path.join(settings.METRICS_DIR, f"{pid}-{secrets.token_hex(4)}.json")
+    return _file_path
+
+
+def flush() -> None:
+    """Записать снимок метрик процесса в METRICS_DIR"""
+    if not settings.METRICS_DIR:
+        return
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    path = _own_file()
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"updated_at": time.time(), "metrics": _snapshot()}, f)
+    # Читатели видят либо старый, либо новый файл целиком
+    os.replace(tmp_path, path)
+
+
+def _load_snapshots() -> List[Tuple[dict, bool]]:
+    """Снимки всех процессов: (метрики, процесс жив); свой - без чтения файла"""
+    snapshots = [(_snapshot(), True)]
+    if not settings.METRICS_DIR:
+        return snapshots
+    own = _own_file()
+    stale_after = max(settings.METRICS_FLUSH_INTERVAL_SECONDS * 3, 15.0)
+    try:
+        names = os.listdir(settings.METRICS_DIR)
+    except FileNotFoundError:
+        return snapshots
+    for name in names:
+        path = os.path.join(settings.METRICS_DIR, name)
+        if not name.endswith(".json") or path == own:
+            continue
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        snapshots.append((data["metrics"], time.time() - data["updated_at"] < stale_after))
+    return snapshots
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        f'{key}="' + str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') + '"'
+        for key, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def render() -> str:
+    """Метрики всех процессов в текстовом формате Prometheus 0.0.4"""
+    families: Dict[str, dict] = {}
+    for snapshot, alive in _load_snapshots():
+        for name, family in snapshot.items():
+            if family["type"] == GAUGE and not alive:
+                continue
+            merged = families.setdefault(name, {"type": family["type"], "help": family["help"], "samples": {}})
+            for sample_name, labels, value in family["samples"]:
+                key = (sample_name, tuple(labels.items()))
+                merged["samples"][key] = merged["samples"].get(key, 0.0) + value
+
+    lines = []
+    for name in sorted(families):
+        family = families[name]
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        for (sample_name, labels), value in family["samples"].items():
+            lines.append(f"{sample_name}{_format_labels(dict(labels))} {float(value)!r}")
+    return "\n".join(lines) + "\n"
+
+
+_flusher: Optional[asyncio.Task] = None
+
+
+async def _flush_periodically() -> None:
+    while True:
+        await asyncio.sleep(settings.METRICS_FLUSH_INTERVAL_SECONDS)
+        try:
+            flush()
+        except Exception:
+            logger.exception("Не удалось записать снимок метрик")
+
+
+async def start() -> None:
+    """Запустить периодическую запись снимка (только с METRICS_DIR)"""
+    global _flusher
+    if settings.METRICS_DIR and _flusher is None:
+        flush()
+        _flusher = asyncio.create_task(_flush_periodically())
+
+
+async def stop() -> None:
+    """Остановить запись снимка, сохранив последние значения счетчиков"""
+    global _flusher
+    if _flusher is None:
+        return
+    _flusher.cancel()
+    _flusher = None
+    try:
+        flush()
+    except Exception:
+        logger.exception("Не удалось записать снимок метрик")
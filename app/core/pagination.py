@@ -0,0 +1,110 @@
+"""
+Курсорная (keyset) пагинация по стабильному ключу (created_at, id)
+
+Курсор непрозрачен для клиента: это base64 от JSON с ключом последней строки
+страницы. Следующая страница выбирается условием по индексу, а не OFFSET,
+поэтому глубокие страницы не дорожают и не сдвигаются при вставке новых строк.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import NamedTuple, Optional, Sequence, Tuple
+from fastapi import HTTPException, Response, status
+from sqlalchemy import and_, or_
+
+# Заголовки ответа с курсорами соседних страниц
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+PREV_CURSOR_HEADER = "X-Prev-Cursor"
+
+CursorKey = Tuple[datetime, int]
+
+
+def _encode(values: list) -> str:
+    raw = json.dumps(values).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode(cursor: str) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError, binascii.Error):
+        values = None
+    if not isinstance(values, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор пагинации"
+        )
+    return values
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Закодировать ключ строки в курсор"""
+    return _encode([created_at.isoformat(), row_id])
+
+
+def decode_cursor(cursor: str) -> CursorKey:
+    """Раскодировать курсор; при некорректном значении - HTTP 400"""
+    try:
+        created_at, row_id = _decode(cursor)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор пагинации"
+        )
+
+
+class SyncCursor(NamedTuple):
+    """Водяной знак синхронизации: последнее сообщение и последнее прочтение"""
+    message_id: int
+    read_at: datetime
+    read_id: int  # id последней отданной отметки о прочтении (при равном read_at)
+
+
+def encode_sync_cursor(cursor: SyncCursor) -> str:
+    """Закодировать водяной знак синхронизации"""
+    return _encode([cursor.message_id, cursor.read_at.isoformat(), cursor.read_id])
+
+
+def decode_sync_cursor(cursor: str) -> SyncCursor:
+    """Раскодировать водяной знак синхронизации; при некорректном значении - HTTP 400"""
+    try:
+        message_id, read_at, read_id = _decode(cursor)
+        return SyncCursor(int(message_id), datetime.fromisoformat(read_at), int(read_id))
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор синхронизации"
+        )
+
+
+def row_cursor(row) -> str:
+    """Курсор, указывающий на строку (по ее created_at и id)"""
+    return encode_cursor(row.created_at, row.id)
+
+
+def keyset_condition(created_column, id_column, key: CursorKey, descending: bool = False):
+    """Условие "строго после ключа" в порядке сортировки (created_at, id)"""
+    created_at, row_id = key
+    if descending:
+        return or_(
+            created_column < created_at,
+            and_(created_column == created_at, id_column < row_id)
+        )
+    return or_(
+        created_column > created_at,
+        and_(created_column == created_at, id_column > row_id)
+    )
+
+
+def set_cursor_headers(
+    response: Response,
+    items: Sequence,
+    limit: int,
+    next_header: str = NEXT_CURSOR_HEADER
+) -> None:
+    """Отдать курсор следующей страницы, если текущая заполнена целиком"""
+    if items and len(items) >= limit:
+        response.headers[next_header] = row_cursor(items[-1])
@@ -0,0 +1,209 @@
+"""
+Учет SQL запросов в пределах HTTP запроса
+
+События SQLAlchemy before/after_cursor_execute на движках считают запросы
+и время в БД в объекте QueryStats текущего контекста (contextvar). Контекст
+задает QueryStatsMiddleware на каждый HTTP запрос или track() при прямом
+вызове сервисов; код без контекста (воркеры) не учитывается. capture()
+собирает статистику HTTP запросов, завершившихся внутри блока, а
+problems() проверяет ее на бюджет и N+1 - для проверки эндпоинтов через
+TestClient (scripts/check_write_queries.py).
+
+По итогам запроса middleware:
+- добавляет заголовки Server-Timing и X-DB-Queries (DB_QUERY_HEADERS);
+- пишет предупреждение, если маршрут превысил DB_QUERY_BUDGET запросов;
+- пишет предупреждение о вероятном N+1, если один и тот же SQL (с разными
+  параметрами) выполнен DB_N_PLUS_ONE_THRESHOLD раз и больше.
+"""
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Ключ Connection.info со стеком времени начала выполняемых запросов
+_START_KEY = "query_stats_start"
+
+
+class QueryStats:
+    """Запросы к БД в пределах одного HTTP запроса"""
+
+    __slots__ = ("count", "duration", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0  # Секунды в БД
+        self.statements: Counter = Counter()
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Одинаковые запросы, выполненные threshold раз и больше"""
+        return [
+            (statement, count)
+            for statement, count in self.statements.most_common()
+            if count >= threshold
+        ]
+
+    def server_timing(self) -> str:
+        """Значение заголовка Server-Timing"""
+        return f'db;dur={self.duration * 1000:.1f};desc="{self.count} queries"'
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+# ASGI scope текущего HTTP запроса: маршрут становится известен после роутинга
+_scope: ContextVar[Optional[Scope]] = ContextVar("query_stats_scope", default=None)
+
+# Списки, открытые capture(): в них middleware складывает (маршрут, статистика)
+_captures: List[list] = []
+
+
+def current() -> Optional[QueryStats]:
+    """Статистика текущего запроса или None вне учета"""
+    return _current.get()
+
+
+def current_route() -> Optional[str]:
+    """Маршрут текущего HTTP запроса (например, GET /api/v1/orders/) или None"""
+    scope = _scope.get()
+    return _route_label(scope) if scope is not None else None
+
+
+@contextmanager
+def track() -> Iterator[QueryStats]:
+    """
+    Считать запросы к БД внутри блока
+
+        with query_stats.track() as stats:
+            client.post(...)
+        assert stats.count <= 3
+    """
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def capture() -> Iterator[List[Tuple[str, QueryStats]]]:
+    """
+    Собрать статистику HTTP запросов, завершившихся внутри блока
+
+    TestClient выполняет приложение в другом потоке, куда контекст track()
+    не передается, поэтому статистику отдает middleware:
+
+        with query_stats.capture() as requests:
+            client.post("/api/v1/messages", ...)
+        route, stats = requests[-1]
+        assert stats.count <= 3, stats.statements
+    """
+    sink: List[Tuple[str, QueryStats]] = []
+    _captures.append(sink)
+    try:
+        yield sink
+    finally:
+        _captures.remove(sink)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault(_START_KEY, []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    starts = conn.info.get(_START_KEY)
+    if stats is None or not starts:
+        return
+    stats.record(statement, time.perf_counter() - starts.pop())
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute не вызывается для упавшего запроса
+    connection = exception_context.connection
+    if connection is not None and connection.info.get(_START_KEY):
+        connection.info[_START_KEY].pop()
+
+
+def instrument(engine: Engine) -> None:
+    """Подключить учет запросов к синхронному движку (для AsyncEngine - к .sync_engine)"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def _route_label(scope: Scope) -> str:
+    """Метод и шаблон пути маршрута (например, GET /api/v1/orders/{order_id})"""
+    path = getattr(scope.get("route"), "path", None) or scope.get("path", "")
+    return f"{scope.get('method', '')} {path}"
+
+
+def problems(stats: QueryStats, budget: Optional[int] = None, threshold: Optional[int] = None) -> List[str]:
+    """
+    Превышение бюджета запросов и вероятные N+1 (по умолчанию - пороги
+    DB_QUERY_BUDGET и DB_N_PLUS_ONE_THRESHOLD, 0 - без проверки)
+
+        with query_stats.capture() as requests:
+            client.get("/api/v1/messages/chats", ...)
+        assert not query_stats.problems(requests[-1][1], budget=4)
+    """
+    budget = settings.DB_QUERY_BUDGET if budget is None else budget
+    threshold = settings.DB_N_PLUS_ONE_THRESHOLD if threshold is None else threshold
+    found = []
+    if budget > 0 and stats.count > budget:
+        found.append(f"{stats.count} запросов к БД (бюджет {budget}), {stats.duration * 1000:.1f} мс")
+    if threshold > 0:
+        for statement, count in stats.repeated(threshold):
+            found.append(
+                f"вероятный N+1 - запрос выполнен {count} раз: " + " ".join(statement.split())[:300]
+            )
+    return found
+
+
+def report(label: str, stats: QueryStats) -> None:
+    """Предупредить о превышении бюджета запросов и вероятных N+1"""
+    for problem in problems(stats):
+        logger.warning("%s: %s", label, problem)
+
+
+class QueryStatsMiddleware:
+    """ASGI middleware: учет запросов к БД на каждый HTTP запрос"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        scope_token = _scope.set(scope)
+        with track() as stats:
+            async def send_with_headers(message: Message) -> None:
+                if message["type"] == "http.response.start" and settings.DB_QUERY_HEADERS:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("X-DB-Queries", str(stats.count))
+                    headers.append("Server-Timing", stats.server_timing())
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_headers)
+            finally:
+                _scope.reset(scope_token)
+        label = _route_label(scope)
+        report(label, stats)
+        for sink in _captures:
+            sink.append((label, stats))
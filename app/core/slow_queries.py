@@ -0,0 +1,198 @@
+"""
+Журнал медленных SQL запросов
+
+Включается SLOW_QUERY_LOG_ENABLED. Запросы дольше SLOW_QUERY_THRESHOLD_MS
+попадают в кольцевой буфер (SLOW_QUERY_BUFFER_SIZE последних) с
+нормализованным текстом, типами параметров, длительностью и маршрутом,
+из которого они выполнены. На PostgreSQL для каждого нового отпечатка
+запроса снимается план EXPLAIN (FORMAT JSON) - без ANALYZE, запрос не
+выполняется повторно. План снимается на том же соединении внутри
+SAVEPOINT, чтобы ошибка EXPLAIN не прервала транзакцию запроса.
+
+top() агрегирует буфер по отпечаткам для GET /api/v1/admin/slow-queries.
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.core.config import settings
+from app.core import query_stats
+
+logger = logging.getLogger(__name__)
+
+# Ключ Connection.info со стеком времени начала выполняемых запросов
+_START_KEY = "slow_queries_start"
+
+# Запросы, для которых EXPLAIN имеет смысл
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+# Списки IN разной длины (IN (?, ?, ?), IN (%(p_1)s, ...), развернутые POSTCOMPILE)
+_IN_LIST = re.compile(r"\bIN\s*\((?:[^()]|\([^()]*\))*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+class SlowQuery(NamedTuple):
+    fingerprint: str
+    statement: str  # Нормализованный текст
+    parameters: str  # Типы параметров, например (int, str)
+    duration_ms: float
+    route: Optional[str]
+    at: datetime
+
+
+_samples: "deque[SlowQuery]" = deque(maxlen=max(settings.SLOW_QUERY_BUFFER_SIZE, 1))
+# Планы по отпечаткам (не больше, чем записей в буфере)
+_plans: "OrderedDict[str, Any]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def normalize(statement: str) -> str:
+    """Текст запроса без литералов и с одинаковыми списками IN любой длины"""
+    statement = _STRING_LITERAL.sub("?", statement)
+    statement = _NUMBER_LITERAL.sub("?", statement)
+    statement = _IN_LIST.sub("IN (...)", statement)
+    return _WHITESPACE.sub(" ", statement).strip()
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def _parameter_shape(parameters, executemany: bool) -> str:
+    """Типы связанных параметров без значений"""
+    if executemany:
+        size = len(parameters) if parameters is not None else 0
+        first = parameters[0] if size else None
+        return f"{size} x {_parameter_shape(first, False)}"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(type(value).__name__ for value in parameters) + ")"
+    return ""
+
+
+def _explain(conn, statement: str, parameters) -> Optional[Any]:
+    """План запроса на PostgreSQL; None, если снять не удалось"""
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            cursor.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+            plan = cursor.fetchone()[0]
+            cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+            return plan
+        except Exception as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            logger.info(f"Не удалось получить план медленного запроса: {e}")
+            return None
+    except Exception as e:
+        logger.info(f"Не удалось получить план медленного запроса: {e}")
+        return None
+    finally:
+        cursor.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if settings.SLOW_QUERY_LOG_ENABLED:
+        conn.info.setdefault(_START_KEY, []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get(_START_KEY)
+    if not starts:
+        return
+    duration_ms = (time.perf_counter() - starts.pop()) * 1000
+    if duration_ms < settings.SLOW_QUERY_THRESHOLD_MS:
+        return
+
+    normalized = normalize(statement)
+    key = fingerprint(normalized)
+    sample = SlowQuery(
+        key,
+        normalized,
+        _parameter_shape(parameters, executemany),
+        duration_ms,
+        query_stats.current_route(),
+        datetime.utcnow()
+    )
+    with _lock:
+        _samples.append(sample)
+        need_plan = key not in _plans
+
+    if (
+        need_plan
+        and settings.SLOW_QUERY_EXPLAIN
+        and not executemany
+        and conn.dialect.name == "postgresql"
+        and normalized.lstrip("( ").upper().startswith(_EXPLAINABLE)
+    ):
+        plan = _explain(conn, statement, parameters)
+        with _lock:
+            _plans[key] = plan
+            while len(_plans) > _samples.maxlen:
+                _plans.popitem(last=False)
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute не вызывается для упавшего запроса
+    connection = exception_context.connection
+    if connection is not None and connection.info.get(_START_KEY):
+        connection.info[_START_KEY].pop()
+
+
+def instrument(engine: Engine) -> None:
+    """Подключить журнал к синхронному движку (для AsyncEngine - к .sync_engine)"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def top(limit: int = 20) -> List[dict]:
+    """Отпечатки из буфера, отсортированные по суммарному времени"""
+    with _lock:
+        samples = list(_samples)
+        plans = dict(_plans)
+
+    groups = {}
+    for sample in samples:
+        group = groups.get(sample.fingerprint)
+        if group is None:
+            group = groups[sample.fingerprint] = {
+                "fingerprint": sample.fingerprint,
+                "statement": sample.statement,
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "routes": [],
+                "parameters": [],
+                "last_seen": sample.at,
+                "plan": plans.get(sample.fingerprint),
+            }
+        group["count"] += 1
+        group["total_ms"] += sample.duration_ms
+        group["max_ms"] = max(group["max_ms"], sample.duration_ms)
+        group["last_seen"] = max(group["last_seen"], sample.at)
+        if sample.route and sample.route not in group["routes"]:
+            group["routes"].append(sample.route)
+        if sample.parameters not in group["parameters"] and len(group["parameters"]) < 5:
+            group["parameters"].append(sample.parameters)
+
+    result = sorted(groups.values(), key=lambda group: group["total_ms"], reverse=True)[:limit]
+    for group in result:
+        group["avg_ms"] = group["total_ms"] / group["count"]
+    return result
+
+
+def clear() -> None:
+    """Очистить журнал"""
+    with _lock:
+        _samples.clear()
+        _plans.clear()
@@ -1,10 +1,15 @@
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from app.core.config import settings
 from app.api.v1 import api_router
+from app.core.database import async_engine
+from app.core.pagination import NEXT_CURSOR_HEADER, PREV_CURSOR_HEADER
+from app.core import metrics
+from app.core.query_stats import QueryStatsMiddleware
+from app.services import credential_service, metrics_service, realtime_service
 import traceback
 import subprocess
 import os
@@ -23,9 +28,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["*"],
+    # "*" браузеры не применяют к запросам с credentials - перечисляем заголовки
+    # явно, иначе фронтенд не прочитает курсоры пагинации
+    expose_headers=[NEXT_CURSOR_HEADER, PREV_CURSOR_HEADER, "X-DB-Queries", "Server-Timing"],
 )
 
+# Учет SQL запросов на HTTP запрос: заголовки Server-Timing/X-DB-Queries и предупреждения о N+1
+app.add_middleware(QueryStatsMiddleware)
+
+# Число и время HTTP запросов по маршрутам для GET /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+metrics_service.register_web()
+
 # Обработчик исключений для правильной отправки CORS заголовков
 @app.exception_handler(StarletteHTTPException)
 async def http_exception_handler(request: Request, exc: StarletteHTTPException):
@@ -78,6 +92,20 @@ if not os.getenv("MIGRATIONS_APPLIED"):
 app.include_router(api_router, prefix="/api/v1")
 
 
+@app.on_event("startup")
+async def start_resources():
+    await realtime_service.start()
+    await metrics.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_resources():
+    await realtime_service.stop()
+    await metrics.stop()
+    credential_service.shutdown()
+    await async_engine.dispose()
+
+
 @app.get("/")
 async def root():
     return {"message": "Wholesale Aggregator API", "version": "1.0.0"}
@@ -87,3 +115,9 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Метрики в текстовом формате Prometheus (всех процессов при METRICS_DIR)"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
@@ -3,6 +3,13 @@ from app.models.supplier import Supplier
 from app.models.order import Order
 from app.models.product import Product
 from app.models.message import Message
+from app.models.conversation import Conversation
+from app.models.notification import NotificationOutbox
+from app.models.interest import SupplierInterest, SupplierInterestTerm
+from app.models.read_cursor import MessageReadCursor
 
-__all__ = ["User", "Supplier", "Order", "Product", "Message"]
+__all__ = [
+    "User", "Supplier", "Order", "Product", "Message", "Conversation", "NotificationOutbox",
+    "SupplierInterest", "SupplierInterestTerm", "MessageReadCursor"
+]
 
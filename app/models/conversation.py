@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.core.database import Base
+
+# Максимальная длина превью последнего сообщения
+PREVIEW_LENGTH = 200
+
+
+class Conversation(Base):
+    """Денормализованная сводка переписки по заказу (одна строка на заказ)"""
+    __tablename__ = "conversations"
+
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), primary_key=True)
+    last_message_id = Column(Integer, ForeignKey("messages.id"), nullable=True)
+    last_message_at = Column(DateTime, nullable=True, index=True)
+    last_message_preview = Column(String(PREVIEW_LENGTH), nullable=True)
+    buyer_unread_count = Column(Integer, default=0, nullable=False)  # Непрочитанные у покупателя
+    supplier_unread_count = Column(Integer, default=0, nullable=False)  # Непрочитанные у поставщика
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    order = relationship("Order")
+    last_message = relationship("Message", foreign_keys=[last_message_id])
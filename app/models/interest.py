@@ -0,0 +1,49 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
+from sqlalchemy.orm import relationship
+import enum
+from datetime import datetime
+from app.core.database import Base
+
+# Максимальная длина подписки и термина
+VALUE_LENGTH = 100
+
+
+class InterestKind(str, enum.Enum):
+    CATEGORY = "category"  # Категория товаров (Product.category)
+    KEYWORD = "keyword"  # Ключевое слово (например, наименование товара)
+
+
+class SupplierInterest(Base):
+    """Подписка поставщика на заказы: категория или ключевое слово в исходном виде"""
+    __tablename__ = "supplier_interests"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    kind = Column(String, nullable=False)
+    value = Column(String(VALUE_LENGTH), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    # Relationships
+    terms = relationship(
+        "SupplierInterestTerm",
+        cascade="all, delete-orphan",
+        passive_deletes=True
+    )
+
+
+class SupplierInterestTerm(Base):
+    """
+    Инвертированный индекс подписок: нормализованный термин -> пользователь
+    
+    Подбор получателей заказа - это поиск по (term, user_id) для терминов заказа.
+    """
+    __tablename__ = "supplier_interest_terms"
+    __table_args__ = (
+        Index("ix_supplier_interest_terms_term_user_id", "term", "user_id"),
+    )
+
+    interest_id = Column(
+        Integer, ForeignKey("supplier_interests.id", ondelete="CASCADE"), primary_key=True
+    )
+    term = Column(String(VALUE_LENGTH), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
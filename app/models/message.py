@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -6,6 +6,15 @@ from app.core.database import Base
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_order_id_created_at_id", "order_id", "created_at", "id"),  # Лента чата
+        # Синхронизация: новые сообщения после водяного знака (after_id, /messages/updates)
+        Index("ix_messages_order_id_id", "order_id", "id"),
+        Index("ix_messages_receiver_id_id", "receiver_id", "id"),
+        Index("ix_messages_sender_id_id", "sender_id", "id"),
+        # Непрочитанные получателя: id > курсора прочтения
+        Index("ix_messages_order_id_receiver_id_id", "order_id", "receiver_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
@@ -13,7 +22,8 @@ class Message(Base):
     receiver_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     content = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    read_at = Column(DateTime, nullable=True)  # Когда сообщение было прочитано
+    # Когда сообщение было прочитано (до курсоров прочтения; новые отметки - в message_read_cursors)
+    read_at = Column(DateTime, nullable=True)
 
     # Relationships
     order = relationship("Order", back_populates="messages")
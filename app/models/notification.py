@@ -0,0 +1,42 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Enum, Index
+import enum
+from datetime import datetime
+from app.core.database import Base
+from app.models.user import EmailDeliveryMode
+
+
+class NotificationStatus(str, enum.Enum):
+    PENDING = "pending"  # Ожидает отправки (в том числе повторной)
+    PROCESSING = "processing"  # Забрано воркером
+    SENT = "sent"
+    DEAD = "dead"  # Исчерпаны попытки отправки
+
+
+class NotificationKind(str, enum.Enum):
+    NEW_ORDER = "new_order"
+
+
+class NotificationOutbox(Base):
+    """Транзакционный outbox email уведомлений: пишется вместе с заказом, отправляется воркером"""
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        # Выборка воркером: status = PENDING AND next_attempt_at <= now
+        Index("ix_notification_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, default=NotificationKind.NEW_ORDER.value, nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    recipient_email = Column(String, nullable=False)
+    # Режим доставки получателя на момент постановки: сразу или в сводке
+    delivery_mode = Column(
+        Enum(EmailDeliveryMode), default=EmailDeliveryMode.IMMEDIATE, nullable=False
+    )
+    status = Column(Enum(NotificationStatus), default=NotificationStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    locked_at = Column(DateTime, nullable=True)  # Когда воркер забрал запись
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = Column(DateTime, nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Text, Enum
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Text, Enum, Index, text
 from sqlalchemy.orm import relationship
 import enum
 from datetime import datetime
@@ -13,6 +13,17 @@ class OrderStatus(str, enum.Enum):
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        Index("ix_orders_created_at_id", "created_at", "id"),  # Курсорная пагинация
+        Index("ix_orders_buyer_id_status", "buyer_id", "status"),  # Заказы покупателя
+        Index("ix_orders_supplier_id_created_at", "supplier_id", "created_at"),  # Заказы поставщика
+        # Свободные заказы (лента поставщиков)
+        Index(
+            "ix_orders_unassigned_created_at_id", "created_at", "id",
+            postgresql_where=text("supplier_id IS NULL"),
+            sqlite_where=text("supplier_id IS NULL")
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False, index=True)
@@ -27,7 +38,7 @@ class Order(Base):
     cost = Column(Float, nullable=False)
     note = Column(Text)
     status = Column(Enum(OrderStatus), default=OrderStatus.IN_PROGRESS, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, UniqueConstraint
+from datetime import datetime
+from app.core.database import Base
+
+
+class MessageReadCursor(Base):
+    """
+    Курсор прочтения переписки: все сообщения заказа, адресованные пользователю,
+    с id <= last_read_message_id считаются прочитанными
+    
+    Отметка о прочтении - один upsert вместо обновления каждой строки messages.
+    """
+    __tablename__ = "message_read_cursors"
+    __table_args__ = (
+        UniqueConstraint("order_id", "user_id", name="uq_message_read_cursors_order_id_user_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    last_read_message_id = Column(Integer, nullable=False)
+    # Когда курсор последний раз сдвинулся (время прочтения для MessageResponse.read_at)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float
+from sqlalchemy import Column, Integer, String, DateTime, Float, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -6,6 +6,9 @@ from app.core.database import Base
 
 class Supplier(Base):
     __tablename__ = "suppliers"
+    __table_args__ = (
+        Index("ix_suppliers_created_at_id", "created_at", "id"),  # Курсорная пагинация
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False, index=True)
@@ -13,7 +16,7 @@ class Supplier(Base):
     contact_info = Column(String)
     country = Column(String, default="China")
     rating = Column(Float, default=0.0)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     # Relationships
     orders = relationship("Order", back_populates="supplier")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Enum, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Enum, Boolean, Index
 from sqlalchemy.orm import relationship
 import enum
 from datetime import datetime
@@ -11,8 +11,17 @@ class UserRole(str, enum.Enum):
     SUPPLIER = "supplier"
 
 
+class EmailDeliveryMode(str, enum.Enum):
+    IMMEDIATE = "immediate"  # Письмо на каждое уведомление
+    HOURLY = "hourly"  # Сводка раз в час
+    DAILY = "daily"  # Сводка раз в день
+
+
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_created_at_id", "created_at", "id"),  # Курсорная пагинация
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True, nullable=True)  # Обязателен только для поставщиков
@@ -22,7 +31,10 @@ class User(Base):
     organization_name = Column(String, nullable=True)  # Название организации или ФИО для ИП
     inn = Column(String, nullable=True)  # ИНН
     email_notifications = Column(Boolean, default=True, nullable=False)  # Получать уведомления на email
-    created_at = Column(DateTime, default=datetime.utcnow)
+    email_delivery_mode = Column(
+        Enum(EmailDeliveryMode), default=EmailDeliveryMode.IMMEDIATE, nullable=False
+    )  # Сразу или сводкой
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
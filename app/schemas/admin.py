@@ -0,0 +1,39 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Any, List, Optional
+
+
+class SlowQueryResponse(BaseModel):
+    """Медленный запрос, агрегированный по отпечатку нормализованного текста"""
+    fingerprint: str
+    statement: str
+    count: int
+    total_ms: float
+    avg_ms: float
+    max_ms: float
+    routes: List[str]
+    parameters: List[str]  # Типы связанных параметров
+    last_seen: datetime
+    plan: Optional[Any] = None  # EXPLAIN (FORMAT JSON), только PostgreSQL
+
+
+class PoolConnectionResponse(BaseModel):
+    """Открытое соединение пула"""
+    age_seconds: float
+    checked_out: bool
+    checked_out_seconds: Optional[float] = None
+
+
+class PoolStatusResponse(BaseModel):
+    """Пул соединений движка (счетчики пустые для пулов без них, например NullPool)"""
+    engine: str
+    dialect: str
+    pool_class: str
+    size: Optional[int] = None
+    checked_in: Optional[int] = None
+    checked_out: Optional[int] = None
+    overflow: Optional[int] = None
+    max_overflow: Optional[int] = None
+    timeout_seconds: Optional[float] = None
+    recycle_seconds: Optional[int] = None
+    connections: List[PoolConnectionResponse]
@@ -0,0 +1,14 @@
+from pydantic import BaseModel, Field, constr
+from typing import List
+from app.models.interest import VALUE_LENGTH
+
+MAX_CATEGORIES = 100
+MAX_KEYWORDS = 200
+
+InterestValue = constr(strip_whitespace=True, min_length=1, max_length=VALUE_LENGTH)
+
+
+class SupplierInterests(BaseModel):
+    """Подписки поставщика на заказы"""
+    categories: List[InterestValue] = Field(default_factory=list, max_length=MAX_CATEGORIES)  # Категории товаров
+    keywords: List[InterestValue] = Field(default_factory=list, max_length=MAX_KEYWORDS)  # Ключевые слова
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 
 class MessageBase(BaseModel):
@@ -60,3 +60,19 @@ class ChatInfo(BaseModel):
         from_attributes = True
 
 
+
+
+class MessageReadState(BaseModel):
+    """Курсор прочтения: сообщения заказа пользователю с id <= last_read_message_id прочитаны"""
+    order_id: int
+    user_id: int
+    last_read_message_id: int
+    read_at: datetime
+
+
+class MessageUpdates(BaseModel):
+    """Изменения в переписках после водяного знака"""
+    messages: List[MessageResponse]
+    reads: List[MessageReadState]
+    cursor: str  # Передать в since при следующей синхронизации
+    has_more: bool  # Изменений больше limit - запросить еще раз сразу
@@ -1,7 +1,7 @@
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
 from typing import Optional
-from app.models.user import UserRole
+from app.models.user import UserRole, EmailDeliveryMode
 
 
 class UserBase(BaseModel):
@@ -11,6 +11,7 @@ class UserBase(BaseModel):
     organization_name: Optional[str] = None  # Название организации или ФИО для ИП
     inn: Optional[str] = None  # ИНН
     email_notifications: bool = True  # Получать уведомления на email
+    email_delivery_mode: EmailDeliveryMode = EmailDeliveryMode.IMMEDIATE  # Сразу или сводкой
 
 
 class UserCreate(UserBase):
@@ -43,6 +44,7 @@ class User(UserResponse):
 
 class UserNotificationSettings(BaseModel):
     email_notifications: bool
+    email_delivery_mode: Optional[EmailDeliveryMode] = None  # Не передан - не меняется
 
 
 class UserUpdate(BaseModel):
@@ -0,0 +1,3 @@
+from app.services.aio import user_service, supplier_service, order_service, message_service
+
+__all__ = ["user_service", "supplier_service", "order_service", "message_service"]
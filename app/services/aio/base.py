@@ -0,0 +1,36 @@
+import functools
+import inspect
+from types import ModuleType
+from typing import Dict
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def to_async(func):
+    """
+    Асинхронная версия функции синхронного сервиса
+    
+    Функция выполняется через AsyncSession.run_sync: SQLAlchemy исполняет
+    синхронный код сервиса поверх асинхронного драйвера без потоков.
+    Логика сервисов остается в одном месте для обоих путей.
+    """
+    @functools.wraps(func)
+    async def wrapper(db: AsyncSession, *args, **kwargs):
+        return await db.run_sync(func, *args, **kwargs)
+    return wrapper
+
+
+def mirror(module: ModuleType) -> Dict[str, object]:
+    """
+    Асинхронные версии всех публичных функций модуля сервиса
+
+    Функции, первый параметр которых - сессия db, оборачиваются to_async,
+    остальные (без обращения к БД) отдаются как есть. Новая функция
+    синхронного сервиса сразу появляется и в асинхронном слое.
+    """
+    functions = {}
+    for name, func in vars(module).items():
+        if name.startswith("_") or not inspect.isfunction(func) or func.__module__ != module.__name__:
+            continue
+        parameters = list(inspect.signature(func).parameters)
+        functions[name] = to_async(func) if parameters[:1] == ["db"] else func
+    return functions
@@ -0,0 +1,5 @@
+"""Асинхронные версии функций message_service для AsyncSession"""
+from app.services import message_service as _message_service
+from app.services.aio.base import mirror
+
+globals().update(mirror(_message_service))
@@ -0,0 +1,5 @@
+"""Асинхронные версии функций order_service для AsyncSession"""
+from app.services import order_service as _order_service
+from app.services.aio.base import mirror
+
+globals().update(mirror(_order_service))
@@ -0,0 +1,5 @@
+"""Асинхронные версии функций supplier_service для AsyncSession"""
+from app.services import supplier_service as _supplier_service
+from app.services.aio.base import mirror
+
+globals().update(mirror(_supplier_service))
@@ -0,0 +1,5 @@
+"""Асинхронные версии функций user_service для AsyncSession"""
+from app.services import user_service as _user_service
+from app.services.aio.base import mirror
+
+globals().update(mirror(_user_service))
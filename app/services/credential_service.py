@@ -0,0 +1,114 @@
+"""
+Асинхронная работа с паролями
+
+bcrypt намеренно медленный (~250 мс CPU на вызов), поэтому хеширование и проверка
+выполняются в отдельном пуле процессов, а не в пуле потоков обработчиков запросов.
+Число одновременных операций ограничено; время ожидания в очереди учитывается.
+"""
+import asyncio
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from app.core import security
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_semaphore: Optional[asyncio.Semaphore] = None
+
+# Метрика ожидания в очереди перед хешированием
+_stats_lock = threading.Lock()
+_stats = {
+    "operations": 0,
+    "in_flight": 0,
+    "queue_wait_total_seconds": 0.0,
+    "queue_wait_max_seconds": 0.0,
+}
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Ленивое создание пула процессов"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: не форкаем процесс с запущенными потоками и открытыми соединениями
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    """Ограничение одновременных операций с паролями"""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(settings.PASSWORD_HASH_MAX_CONCURRENCY)
+    return _semaphore
+
+
+def _record_wait(wait_seconds: float) -> None:
+    with _stats_lock:
+        _stats["operations"] += 1
+        _stats["queue_wait_total_seconds"] += wait_seconds
+        _stats["queue_wait_max_seconds"] = max(_stats["queue_wait_max_seconds"], wait_seconds)
+
+
+async def _run(func, *args):
+    """Выполнить функцию в пуле процессов с учетом лимита параллельности"""
+    global _executor
+    queued_at = time.perf_counter()
+    async with _get_semaphore():
+        _record_wait(time.perf_counter() - queued_at)
+        with _stats_lock:
+            _stats["in_flight"] += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(_get_executor(), func, *args)
+        except BrokenProcessPool:
+            # Процесс пула упал - пересоздадим пул при следующем вызове
+            logger.error("Пул процессов хеширования паролей поврежден, будет пересоздан")
+            with _executor_lock:
+                _executor = None
+            raise
+        finally:
+            with _stats_lock:
+                _stats["in_flight"] -= 1
+
+
+async def hash_password(password: str) -> str:
+    """Хеширование пароля"""
+    return await _run(security.get_password_hash, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Проверка пароля"""
+    return await _run(security.verify_password, plain_password, hashed_password)
+
+
+def get_stats() -> dict:
+    """Статистика пула хеширования"""
+    with _stats_lock:
+        stats = dict(_stats)
+    operations = stats["operations"]
+    stats["queue_wait_avg_seconds"] = (
+        stats["queue_wait_total_seconds"] / operations if operations else 0.0
+    )
+    stats["max_concurrency"] = settings.PASSWORD_HASH_MAX_CONCURRENCY
+    stats["workers"] = settings.PASSWORD_HASH_WORKERS
+    return stats
+
+
+def shutdown() -> None:
+    """Остановить пул процессов"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
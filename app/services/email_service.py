@@ -1,119 +1,488 @@
 import aiosmtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from email.policy import SMTP as SMTP_POLICY
+from email.utils import formatdate, make_msgid
+from datetime import datetime
+from pathlib import Path
 from typing import List, Optional
+from jinja2 import Environment, FileSystemLoader, select_autoescape
 from app.core.config import settings
-import logging
+from app.core import metrics
 import asyncio
+import logging
+import ssl
+import time
+from collections import deque
 
 logger = logging.getLogger(__name__)
 
+# Шаблоны писем загружаются и компилируются один раз при импорте модуля
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / "templates" / "email"
+_templates = Environment(
+    loader=FileSystemLoader(str(TEMPLATES_DIR)),
+    autoescape=select_autoescape(["html"]),
+    trim_blocks=True,
+    lstrip_blocks=True
+)
+_order_notification_html = _templates.get_template("order_notification.html")
+_order_notification_text = _templates.get_template("order_notification.txt")
+_order_digest_html = _templates.get_template("order_digest.html")
+_order_digest_text = _templates.get_template("order_digest.txt")
 
-async def send_email(
-    to_email: str,
-    subject: str,
-    html_body: str,
-    text_body: Optional[str] = None
-) -> bool:
+_send_seconds = metrics.Histogram(
+    "email_send_duration_seconds", "Время отправки письма SMTP серверу (успешные попытки)",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+
+def is_configured() -> bool:
+    """Настроен ли SMTP сервер для отправки"""
+    return bool(settings.SMTP_USER and settings.SMTP_PASSWORD)
+
+
+class _PooledConnection:
+    """Авторизованная SMTP сессия и число отправленных через нее писем"""
+
+    def __init__(self, client: aiosmtplib.SMTP):
+        self.client = client
+        self.messages_sent = 0
+
+
+class SMTPConnectionPool:
     """
-    Отправка email через SMTP
+    Пул долгоживущих авторизованных SMTP сессий
     
-    Args:
-        to_email: Email получателя
-        subject: Тема письма
-        html_body: HTML тело письма
-        text_body: Текстовое тело письма (опционально)
+    TCP + TLS + AUTH выполняются один раз на соединение, дальше через сессию
+    последовательно уходят письма. Соединение закрывается после
+    max_messages_per_connection писем или при ошибке; при обрыве письмо
+    повторяется через новое соединение.
+    """
+
+    def __init__(self, size: int, max_messages_per_connection: int):
+        self.size = size
+        self.max_messages_per_connection = max_messages_per_connection
+        self._idle: "asyncio.LifoQueue[_PooledConnection]" = asyncio.LifoQueue()
+        self._slots = asyncio.Semaphore(size)
+        self.connections_opened = 0
+
+    async def _connect(self) -> _PooledConnection:
+        """Открыть и авторизовать новое SMTP соединение"""
+        # Для Gmail: порт 587 использует STARTTLS, порт 465 использует SSL
+        if settings.SMTP_PORT == 465:
+            client = aiosmtplib.SMTP(
+                hostname=settings.SMTP_HOST,
+                port=settings.SMTP_PORT,
+                use_tls=True,
+                tls_context=ssl.create_default_context()
+            )
+        else:
+            client = aiosmtplib.SMTP(
+                hostname=settings.SMTP_HOST,
+                port=settings.SMTP_PORT,
+                start_tls=settings.SMTP_USE_TLS
+            )
+        await client.connect()
+        if settings.SMTP_USER and settings.SMTP_PASSWORD:
+            await client.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+        self.connections_opened += 1
+        return _PooledConnection(client)
+
+    async def _acquire(self) -> _PooledConnection:
+        """Взять свободное соединение или открыть новое"""
+        while not self._idle.empty():
+            connection = self._idle.get_nowait()
+            if connection.client.is_connected:
+                return connection
+        return await self._connect()
+
+    async def _discard(self, connection: _PooledConnection) -> None:
+        """Закрыть соединение, не возвращая его в пул"""
+        try:
+            if connection.client.is_connected:
+                await connection.client.quit()
+        except Exception:
+            connection.client.close()
+
+    async def _release(self, connection: _PooledConnection) -> None:
+        """Вернуть соединение в пул или закрыть, если исчерпан лимит писем"""
+        if connection.messages_sent >= self.max_messages_per_connection:
+            await self._discard(connection)
+        else:
+            self._idle.put_nowait(connection)
+
+    async def send_raw(self, sender: str, recipients: List[str], data: bytes) -> None:
+        """Отправить готовое (закодированное) письмо через одну из сессий пула"""
+        async with self._slots:
+            for attempt in range(2):
+                connection = await self._acquire()
+                try:
+                    await connection.client.sendmail(sender, recipients, data)
+                except (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError, ConnectionError) as e:
+                    # Сервер закрыл простаивающую сессию - повторяем через новое соединение
+                    await self._discard(connection)
+                    if attempt:
+                        raise
+                    logger.info(f"SMTP соединение разорвано ({e}), переподключаемся")
+                    continue
+                except Exception:
+                    await self._discard(connection)
+                    raise
+                connection.messages_sent += 1
+                await self._release(connection)
+                return
+
+    async def close(self) -> None:
+        """Закрыть все свободные соединения"""
+        while not self._idle.empty():
+            await self._discard(self._idle.get_nowait())
+
+
+_pool: Optional[SMTPConnectionPool] = None
+_pool_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_pool() -> SMTPConnectionPool:
+    """Пул SMTP соединений текущего event loop"""
+    global _pool, _pool_loop
+    loop = asyncio.get_running_loop()
+    if _pool is None or _pool_loop is not loop:
+        _pool = SMTPConnectionPool(
+            size=settings.SMTP_POOL_SIZE,
+            max_messages_per_connection=settings.SMTP_MAX_MESSAGES_PER_CONNECTION
+        )
+        _pool_loop = loop
+    return _pool
+
+
+async def close_pool() -> None:
+    """Закрыть пул SMTP соединений"""
+    global _pool, _pool_loop
+    if _pool is not None:
+        await _pool.close()
+    _pool = None
+    _pool_loop = None
+
+
+# Ответы SMTP сервера "временно, повторите позже" (превышен лимит провайдера)
+THROTTLE_CODES = (421, 451)
+
+
+def _throttle_code(error: Exception) -> Optional[int]:
+    """Код ответа 421/451 из ошибки отправки, иначе None"""
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        codes = [refused.code for refused in error.recipients]
+    else:
+        codes = [getattr(error, "code", None)]
+    for code in codes:
+        if code in THROTTLE_CODES:
+            return code
+    return None
+
+
+class TokenBucket:
+    """
+    Ведро токенов: не больше rate писем в секунду с всплеском до capacity
     
-    Returns:
-        True если отправка успешна, False в противном случае
+    Токены резервируются заранее (баланс может уйти в минус), поэтому
+    ожидающие отправители обслуживаются по очереди без блокировок.
     """
-    # Если SMTP не настроен, просто логируем
-    if not settings.SMTP_USER or not settings.SMTP_PASSWORD:
-        logger.warning(f"SMTP не настроен. Письмо было бы отправлено на {to_email}: {subject}")
-        return False
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+
+    def reserve(self, now: float) -> float:
+        """Зарезервировать токен; возвращает, сколько секунд ждать до отправки"""
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens / self.rate
+
+    def release(self) -> None:
+        """Вернуть зарезервированный, но не использованный токен"""
+        self._tokens += 1
+
+
+class SendRateLimiter:
+    """
+    Планировщик исходящей почты: ведра токенов на секунду и минуту и
+    адаптивная пауза после ответов 421/451
     
-    try:
-        # Создаем сообщение
-        message = MIMEMultipart("alternative")
+    При ответе "превышен лимит" отправка приостанавливается с экспоненциально
+    растущей паузой, а скорость посекундного ведра уменьшается вдвое; после
+    успешных отправок скорость постепенно возвращается к настроенной (AIMD).
+    """
+
+    MIN_RATE_FACTOR = 0.05
+    RECOVERY_STEP = 0.005
+    LATENCY_WINDOW = 1000
+
+    def __init__(self, per_second: float, per_minute: int):
+        self.per_second = per_second
+        # Посекундный лимит - равномерный темп без всплесков: провайдеры обычно
+        # считают письма в скользящем окне
+        self._second = TokenBucket(per_second, 1) if per_second > 0 else None
+        self._minute = TokenBucket(per_minute / 60, per_minute) if per_minute > 0 else None
+        self._rate_factor = 1.0
+        self._paused_until = 0.0
+        self._backoff = 0.0
+        self._latencies = deque(maxlen=self.LATENCY_WINDOW)
+        self.stats = {
+            "queued": 0,
+            "in_flight": 0,
+            "sent": 0,
+            "failed": 0,
+            "throttled": 0,
+            "retries": 0,
+            "queue_wait_total_seconds": 0.0,
+            "send_latency_total_seconds": 0.0,
+        }
+
+    async def acquire(self) -> None:
+        """Дождаться разрешения на отправку одного письма"""
+        queued_at = time.monotonic()
+        self.stats["queued"] += 1
+        try:
+            while True:
+                now = time.monotonic()
+                if self._paused_until > now:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                delay = max(
+                    self._second.reserve(now) if self._second else 0.0,
+                    self._minute.reserve(now) if self._minute else 0.0
+                )
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                # За время ожидания могли получить 421/451 - проверяем паузу еще раз
+                if self._paused_until <= time.monotonic():
+                    break
+                # Резерв возвращается в ведра, после паузы токен берется заново
+                for bucket in (self._second, self._minute):
+                    if bucket:
+                        bucket.release()
+        finally:
+            self.stats["queued"] -= 1
+        self.stats["in_flight"] += 1
+        self.stats["queue_wait_total_seconds"] += time.monotonic() - queued_at
+
+    def record_success(self, latency: float) -> None:
+        """Письмо принято сервером"""
+        self.stats["in_flight"] -= 1
+        self.stats["sent"] += 1
+        self.stats["send_latency_total_seconds"] += latency
+        self._latencies.append(latency)
+        self._backoff = 0.0
+        if self._rate_factor < 1.0:
+            self._rate_factor = min(1.0, self._rate_factor + self.RECOVERY_STEP)
+            self._apply_rate()
+
+    def record_failure(self, throttle_code: Optional[int] = None) -> None:
+        """Попытка отправки не удалась; при 421/451 - пауза и снижение скорости"""
+        self.stats["in_flight"] -= 1
+        if throttle_code is None:
+            return
+        self.stats["throttled"] += 1
+        now = time.monotonic()
+        if self._paused_until > now:
+            # Ответ на письмо, ушедшее до начала паузы: этот всплеск уже учтен
+            return
+        self._backoff = min(
+            max(self._backoff * 2, settings.SMTP_BACKOFF_BASE_SECONDS),
+            settings.SMTP_BACKOFF_MAX_SECONDS
+        )
+        self._paused_until = now + self._backoff
+        self._rate_factor = max(self.MIN_RATE_FACTOR, self._rate_factor / 2)
+        self._apply_rate()
+        rate = self.current_rate()
+        logger.warning(
+            f"SMTP сервер ответил {throttle_code}: пауза {self._backoff:.1f} с, "
+            f"скорость {f'{rate:.2f} писем/с' if rate is not None else 'без посекундного лимита'}"
+        )
+
+    def _apply_rate(self) -> None:
+        if self._second:
+            self._second.rate = self.per_second * self._rate_factor
+
+    def current_rate(self) -> Optional[float]:
+        """Текущий посекундный лимит (None - без лимита)"""
+        return self._second.rate if self._second else None
+
+    def get_stats(self) -> dict:
+        """Глубина очереди, задержки отправки и текущая скорость"""
+        stats = dict(self.stats)
+        latencies = sorted(self._latencies)
+        completed = stats["sent"]
+        stats["queue_depth"] = stats["queued"] + stats["in_flight"]
+        stats["send_latency_avg_seconds"] = (
+            stats["send_latency_total_seconds"] / completed if completed else 0.0
+        )
+        stats["send_latency_p95_seconds"] = (
+            latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0
+        )
+        stats["rate_per_second"] = self.current_rate()
+        stats["paused_seconds"] = max(0.0, self._paused_until - time.monotonic())
+        return stats
+
+
+_limiter: Optional[SendRateLimiter] = None
+_limiter_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_rate_limiter() -> SendRateLimiter:
+    """Планировщик отправки текущего event loop"""
+    global _limiter, _limiter_loop
+    loop = asyncio.get_running_loop()
+    if _limiter is None or _limiter_loop is not loop:
+        _limiter = SendRateLimiter(
+            per_second=settings.SMTP_RATE_PER_SECOND,
+            per_minute=settings.SMTP_RATE_PER_MINUTE
+        )
+        _limiter_loop = loop
+    return _limiter
+
+
+def get_stats() -> dict:
+    """Статистика отправки почты (пустая, если в процессе ничего не отправлялось)"""
+    if _limiter is None:
+        return {}
+    stats = _limiter.get_stats()
+    if _pool is not None:
+        stats["connections_opened"] = _pool.connections_opened
+    return stats
+
+
+class PreparedEmail:
+    """
+    Письмо, отрисованное и закодированное в MIME один раз
+    
+    Тело и общие заголовки кодируются при создании; для каждого получателя
+    дописываются только заголовки To, Date и Message-ID.
+    """
+
+    def __init__(self, subject: str, html_body: str, text_body: Optional[str] = None):
+        # Тема собирается из названия заказа, а переводы строк в заголовке
+        # политика SMTP отвергает (ValueError) - заменяем их пробелами
+        subject = " ".join(subject.split())
+        self.subject = subject
+        # Политика SMTP кодирует не-ASCII заголовки (RFC 2047) и переводы строк CRLF
+        message = MIMEMultipart("alternative", policy=SMTP_POLICY)
         message["Subject"] = subject
         message["From"] = f"{settings.SMTP_FROM_NAME} <{settings.SMTP_FROM_EMAIL}>"
-        message["To"] = to_email
         
         # Добавляем текстовую версию (если есть)
         if text_body:
-            text_part = MIMEText(text_body, "plain", "utf-8")
-            message.attach(text_part)
+            message.attach(MIMEText(text_body, "plain", "utf-8", policy=SMTP_POLICY))
         
         # Добавляем HTML версию
-        html_part = MIMEText(html_body, "html", "utf-8")
-        message.attach(html_part)
+        message.attach(MIMEText(html_body, "html", "utf-8", policy=SMTP_POLICY))
         
-        # Отправляем через SMTP
-        # Для Gmail: порт 587 использует STARTTLS, порт 465 использует SSL
-        if settings.SMTP_PORT == 465:
-            # SSL соединение (порт 465)
-            import ssl
-            context = ssl.create_default_context()
-            await aiosmtplib.send(
-                message,
-                hostname=settings.SMTP_HOST,
-                port=settings.SMTP_PORT,
-                username=settings.SMTP_USER,
-                password=settings.SMTP_PASSWORD,
-                tls_context=context,
-                use_tls=True
-            )
-        else:
-            # STARTTLS соединение (порт 587)
-            await aiosmtplib.send(
-                message,
-                hostname=settings.SMTP_HOST,
-                port=settings.SMTP_PORT,
-                username=settings.SMTP_USER,
-                password=settings.SMTP_PASSWORD,
-                start_tls=True
+        self.payload = message.as_bytes()
+
+    def for_recipient(self, to_email: str) -> bytes:
+        """Письмо для конкретного получателя"""
+        headers = (
+            f"To: {to_email}\r\n"
+            f"Date: {formatdate()}\r\n"
+            f"Message-ID: {make_msgid()}\r\n"
+        )
+        return headers.encode("utf-8") + self.payload
+
+
+async def send_prepared(
+    prepared: PreparedEmail,
+    to_email: str,
+    raise_on_error: bool = False
+) -> bool:
+    """
+    Отправка подготовленного письма одному получателю
+    
+    Returns:
+        True если отправка успешна, False в противном случае
+    """
+    # Если SMTP не настроен, просто логируем
+    if not is_configured():
+        logger.warning(f"SMTP не настроен. Письмо было бы отправлено на {to_email}: {prepared.subject}")
+        return False
+    
+    limiter = get_rate_limiter()
+    for attempt in range(settings.SMTP_THROTTLE_RETRIES + 1):
+        await limiter.acquire()
+        started_at = time.monotonic()
+        try:
+            # Отправляем через пул долгоживущих SMTP сессий
+            await get_pool().send_raw(
+                settings.SMTP_FROM_EMAIL,
+                [to_email],
+                prepared.for_recipient(to_email)
             )
+        except Exception as e:
+            code = _throttle_code(e)
+            limiter.record_failure(code)
+            if code is not None and attempt < settings.SMTP_THROTTLE_RETRIES:
+                # Провайдер просит подождать - повторим после паузы планировщика
+                limiter.stats["retries"] += 1
+                continue
+            limiter.stats["failed"] += 1
+            logger.error(f"Ошибка при отправке email на {to_email}: {str(e)}")
+            if raise_on_error:
+                raise
+            return False
         
-        logger.info(f"Email успешно отправлен на {to_email}: {subject}")
+        latency = time.monotonic() - started_at
+        limiter.record_success(latency)
+        _send_seconds.observe(latency)
+        logger.info(f"Email успешно отправлен на {to_email}: {prepared.subject}")
         return True
-        
-    except Exception as e:
-        logger.error(f"Ошибка при отправке email на {to_email}: {str(e)}")
-        return False
 
 
-async def send_order_notification(
-    supplier_email: str,
-    order_title: str,
-    product_name: str,
-    delivery_volume: Optional[str],
-    purchase_budget: Optional[float],
-    deadline_at: str,
-    product_description: Optional[str],
-    buyer_name: str
+async def send_email(
+    to_email: str,
+    subject: str,
+    html_body: str,
+    text_body: Optional[str] = None,
+    raise_on_error: bool = False
 ) -> bool:
     """
-    Отправка уведомления поставщику о новом заказе
+    Отправка email через SMTP
     
     Args:
-        supplier_email: Email поставщика
-        order_title: Название заказа
-        product_name: Наименование товара
-        delivery_volume: Объем поставки
-        purchase_budget: Бюджет закупки
-        deadline_at: Сроки доставки
-        product_description: Описание товара
-        buyer_name: Имя покупателя
+        to_email: Email получателя
+        subject: Тема письма
+        html_body: HTML тело письма
+        text_body: Текстовое тело письма (опционально)
+        raise_on_error: Пробрасывать ошибку отправки вместо возврата False
     
     Returns:
         True если отправка успешна, False в противном случае
     """
+    return await send_prepared(
+        PreparedEmail(subject, html_body, text_body),
+        to_email,
+        raise_on_error=raise_on_error
+    )
+
+
+def _order_context(
+    order_title: str,
+    product_name: str,
+    delivery_volume: Optional[str],
+    purchase_budget: Optional[float],
+    deadline_at: str,
+    product_description: Optional[str],
+    buyer_name: str
+) -> dict:
+    """Данные заказа для шаблонов писем"""
     # Форматируем дату
-    from datetime import datetime
     try:
         deadline = datetime.fromisoformat(deadline_at.replace('Z', '+00:00'))
         deadline_str = deadline.strftime("%d.%m.%Y %H:%M")
-    except:
+    except ValueError:
         deadline_str = deadline_at
     
     # Форматируем бюджет
@@ -121,100 +490,72 @@ async def send_order_notification(
     if purchase_budget:
         budget_str = f"{purchase_budget:,.2f} ₽".replace(',', ' ')
     
-    # HTML шаблон письма
-    html_body = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <style>
-            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-            .header {{ background-color: #4CAF50; color: white; padding: 20px; text-align: center; border-radius: 5px 5px 0 0; }}
-            .content {{ background-color: #f9f9f9; padding: 20px; border: 1px solid #ddd; }}
-            .info-row {{ margin-bottom: 15px; }}
-            .label {{ font-weight: bold; color: #555; }}
-            .value {{ color: #333; margin-top: 5px; }}
-            .button {{ display: inline-block; background-color: #4CAF50; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; margin-top: 20px; }}
-            .footer {{ text-align: center; margin-top: 20px; color: #777; font-size: 12px; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>Новый заказ на поставку товаров</h1>
-            </div>
-            <div class="content">
-                <p>Здравствуйте!</p>
-                <p>Поступил новый заказ на поставку товаров из Китая.</p>
-                
-                <div class="info-row">
-                    <div class="label">Название заказа:</div>
-                    <div class="value">{order_title}</div>
-                </div>
-                
-                <div class="info-row">
-                    <div class="label">Наименование товара:</div>
-                    <div class="value">{product_name}</div>
-                </div>
-                
-                {f'<div class="info-row"><div class="label">Объем поставки:</div><div class="value">{delivery_volume}</div></div>' if delivery_volume else ''}
-                
-                {f'<div class="info-row"><div class="label">Бюджет закупки:</div><div class="value">{budget_str}</div></div>' if budget_str else ''}
-                
-                <div class="info-row">
-                    <div class="label">Сроки доставки:</div>
-                    <div class="value">{deadline_str}</div>
-                </div>
-                
-                {f'<div class="info-row"><div class="label">Описание товара:</div><div class="value">{product_description}</div></div>' if product_description else ''}
-                
-                <div class="info-row">
-                    <div class="label">Заказчик:</div>
-                    <div class="value">{buyer_name}</div>
-                </div>
-                
-                <p style="margin-top: 20px;">
-                    <a href="http://localhost:5173" class="button">Перейти к заказу</a>
-                </p>
-            </div>
-            <div class="footer">
-                <p>Это автоматическое уведомление от системы Wholesale Aggregator</p>
-                <p>Если вы не хотите получать такие уведомления, вы можете отключить их в настройках личного кабинета.</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    
-    # Текстовая версия
-    text_body = f"""
-Новый заказ на поставку товаров
-
-Здравствуйте!
+    return {
+        "order_title": order_title,
+        "product_name": product_name,
+        "delivery_volume": delivery_volume,
+        "budget": budget_str,
+        "deadline": deadline_str,
+        "product_description": product_description,
+        "buyer_name": buyer_name,
+    }
 
-Поступил новый заказ на поставку товаров из Китая.
 
-Название заказа: {order_title}
-Наименование товара: {product_name}
-{f'Объем поставки: {delivery_volume}' if delivery_volume else ''}
-{f'Бюджет закупки: {budget_str}' if budget_str else ''}
-Сроки доставки: {deadline_str}
-{f'Описание товара: {product_description}' if product_description else ''}
-Заказчик: {buyer_name}
+def render_order_notification(
+    order_title: str,
+    product_name: str,
+    delivery_volume: Optional[str],
+    purchase_budget: Optional[float],
+    deadline_at: str,
+    product_description: Optional[str],
+    buyer_name: str
+) -> PreparedEmail:
+    """
+    Подготовить уведомление о новом заказе (одно на все получатели заказа)
+    
+    Args:
+        order_title: Название заказа
+        product_name: Наименование товара
+        delivery_volume: Объем поставки
+        purchase_budget: Бюджет закупки
+        deadline_at: Сроки доставки (ISO формат)
+        product_description: Описание товара
+        buyer_name: Имя покупателя
+    """
+    context = _order_context(
+        order_title, product_name, delivery_volume, purchase_budget,
+        deadline_at, product_description, buyer_name
+    )
+    return PreparedEmail(
+        subject=f"Новый заказ: {order_title}",
+        html_body=_order_notification_html.render(context),
+        text_body=_order_notification_text.render(context)
+    )
 
-Перейдите в личный кабинет для просмотра деталей заказа.
 
-Это автоматическое уведомление от системы Wholesale Aggregator.
-Если вы не хотите получать такие уведомления, вы можете отключить их в настройках личного кабинета.
+def render_order_digest(orders: List[dict], period: str) -> PreparedEmail:
     """
+    Подготовить сводку новых заказов для одного получателя
     
-    subject = f"Новый заказ: {order_title}"
-    
-    return await send_email(supplier_email, subject, html_body, text_body)
+    Args:
+        orders: Данные заказов (аргументы render_order_notification), от новых к старым
+        period: Период сводки для текста письма ("за час", "за день")
+    """
+    shown = orders[:settings.DIGEST_MAX_ORDERS]
+    context = {
+        "orders": [_order_context(**order) for order in shown],
+        "total": len(orders),
+        "hidden": len(orders) - len(shown),
+        "period": period,
+    }
+    return PreparedEmail(
+        subject=f"Новые заказы {period}: {len(orders)}",
+        html_body=_order_digest_html.render(context),
+        text_body=_order_digest_text.render(context)
+    )
 
 
-def send_order_notification_sync(
+async def send_order_notification(
     supplier_email: str,
     order_title: str,
     product_name: str,
@@ -222,20 +563,20 @@ def send_order_notification_sync(
     purchase_budget: Optional[float],
     deadline_at: str,
     product_description: Optional[str],
-    buyer_name: str
-) -> None:
+    buyer_name: str,
+    raise_on_error: bool = False
+) -> bool:
     """
-    Синхронная обёртка для отправки уведомления поставщику
-    Используется с BackgroundTasks
+    Отправка уведомления поставщику о новом заказе
+    
+    Для рассылки одного заказа многим поставщикам используйте
+    render_order_notification + send_prepared, чтобы не отрисовывать письмо заново.
+    
+    Returns:
+        True если отправка успешна, False в противном случае
     """
-    try:
-        # Для BackgroundTasks создаем новый event loop
-        # так как они работают в отдельном потоке
-        asyncio.run(
-            send_order_notification(
-                supplier_email, order_title, product_name, delivery_volume,
-                purchase_budget, deadline_at, product_description, buyer_name
-            )
-        )
-    except Exception as e:
-        logger.error(f"Ошибка при отправке email уведомления: {str(e)}")
\ No newline at end of file
+    prepared = render_order_notification(
+        order_title, product_name, delivery_volume, purchase_budget,
+        deadline_at, product_description, buyer_name
+    )
+    return await send_prepared(prepared, supplier_email, raise_on_error=raise_on_error)
@@ -0,0 +1,131 @@
+"""
+Подписки поставщиков на заказы по категориям и ключевым словам
+
+Подписка хранится в исходном виде (SupplierInterest) и разворачивается
+в нормализованные термины (SupplierInterestTerm) - инвертированный индекс
+"термин -> поставщик". Текст заказа нормализуется тем же способом, поэтому
+подбор получателей сводится к поиску по индексу (term, user_id).
+"""
+import re
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import select, exists
+from sqlalchemy.orm import Session
+from app.models.interest import SupplierInterest, SupplierInterestTerm, InterestKind, VALUE_LENGTH
+from app.models.product import Product
+from app.models.supplier import Supplier
+from app.schemas.interest import MAX_CATEGORIES, MAX_KEYWORDS
+
+MIN_TERM_LENGTH = 3
+MAX_ORDER_TERMS = 256  # Описание заказа может быть длинным, термины дальше не учитываются
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Типовые окончания: "мука", "муки", "муку" сводятся к одной основе "мук".
+# Длинные окончания проверяются первыми.
+_ENDINGS = tuple(sorted(
+    [
+        "ями", "ами", "ого", "ему", "ому", "ыми", "ими", "ией", "иях", "иям",
+        "ая", "яя", "ое", "ее", "ые", "ие", "ый", "ий", "ой", "ей", "ом", "ем",
+        "ам", "ям", "ах", "ях", "ов", "ев", "ью", "ия", "ию", "ии", "ую", "юю",
+        "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "s",
+    ],
+    key=len,
+    reverse=True
+))
+
+
+def _stem(word: str) -> str:
+    """Отбросить типовое окончание, если основа остается достаточно длинной"""
+    for ending in _ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_TERM_LENGTH:
+            return word[:-len(ending)]
+    return word
+
+
+def extract_terms(*texts: Optional[str], limit: int = MAX_ORDER_TERMS) -> List[str]:
+    """Нормализованные термины текста (без повторов, в порядке появления)"""
+    terms: Dict[str, None] = {}
+    for text in texts:
+        if not text:
+            continue
+        for word in _WORD_RE.findall(text.lower().replace("ё", "е")):
+            if len(word) < MIN_TERM_LENGTH or word.isdigit():
+                continue
+            # Термин не длиннее колонки; текст заказа обрезается так же, как подписка
+            terms.setdefault(_stem(word)[:VALUE_LENGTH], None)
+            if len(terms) >= limit:
+                return list(terms)
+    return list(terms)
+
+
+def get_interests(db: Session, user_id: int) -> Dict[str, List[str]]:
+    """Подписки пользователя, сгруппированные по видам"""
+    interests = db.query(SupplierInterest).filter(
+        SupplierInterest.user_id == user_id
+    ).order_by(SupplierInterest.id).all()
+    return {
+        "categories": [i.value for i in interests if i.kind == InterestKind.CATEGORY.value],
+        "keywords": [i.value for i in interests if i.kind == InterestKind.KEYWORD.value],
+    }
+
+
+def _add_interests(db: Session, user_id: int, kind: InterestKind, values: Iterable[str]) -> None:
+    """Добавить подписки вместе с их терминами (без commit)"""
+    seen = set()
+    for value in values:
+        value = value.strip()
+        key = value.lower()
+        terms = extract_terms(value)
+        if not terms or key in seen:
+            continue
+        seen.add(key)
+        interest = SupplierInterest(user_id=user_id, kind=kind.value, value=value)
+        interest.terms = [SupplierInterestTerm(term=term, user_id=user_id) for term in terms]
+        db.add(interest)
+
+
+def replace_interests(
+    db: Session,
+    user_id: int,
+    categories: List[str],
+    keywords: List[str]
+) -> Dict[str, List[str]]:
+    """Заменить подписки пользователя целиком"""
+    db.query(SupplierInterestTerm).filter(
+        SupplierInterestTerm.user_id == user_id
+    ).delete(synchronize_session=False)
+    db.query(SupplierInterest).filter(
+        SupplierInterest.user_id == user_id
+    ).delete(synchronize_session=False)
+
+    _add_interests(db, user_id, InterestKind.CATEGORY, categories)
+    _add_interests(db, user_id, InterestKind.KEYWORD, keywords)
+    db.commit()
+    return get_interests(db, user_id)
+
+
+def suggest_from_products(db: Session, user_id: int) -> Dict[str, List[str]]:
+    """Подписки по каталогу поставщика: категории и наименования его товаров"""
+    rows = db.query(Product.category, Product.name).join(
+        Supplier, Supplier.id == Product.supplier_id
+    ).filter(Supplier.user_id == user_id).all()
+    # Предложения проходят те же ограничения, что и сохраняемые подписки
+    categories = sorted({category.strip()[:VALUE_LENGTH] for category, _ in rows if category and category.strip()})
+    keywords = sorted({name.strip()[:VALUE_LENGTH] for _, name in rows if name and name.strip()})
+    return {"categories": categories[:MAX_CATEGORIES], "keywords": keywords[:MAX_KEYWORDS]}
+
+
+def recipient_filter(user_id_column, terms: List[str]):
+    """
+    Условие отбора получателей уведомления о заказе с данными терминами
+    
+    Подходят поставщики, у которых есть подписка с одним из терминов заказа,
+    и поставщики без подписок (получают все заказы, как раньше).
+    """
+    has_interests = exists().where(SupplierInterest.user_id == user_id_column)
+    if not terms:
+        return ~has_interests
+    matched = select(SupplierInterestTerm.user_id).where(
+        SupplierInterestTerm.term.in_(terms)
+    )
+    return user_id_column.in_(matched) | ~has_interests
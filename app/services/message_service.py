@@ -1,10 +1,188 @@
+from sqlalchemy import and_
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime
+from typing import List, Optional, Tuple
+from datetime import datetime, timedelta
 from app.models.message import Message
+from app.models.read_cursor import MessageReadCursor
 from app.models.order import Order
+from app.models.conversation import Conversation, PREVIEW_LENGTH
 from app.models.user import User
 from app.schemas.message import MessageCreate
+from app.core.pagination import CursorKey, SyncCursor, keyset_condition
+from app.services import participant_service, realtime_service
+from app.services.participant_service import OrderParticipants
+
+# Изменения моложе этого возраста отдаются синхронизацией повторно: транзакция
+# с меньшим id или более ранним read_at может зафиксироваться позже соседней
+SYNC_SETTLE_DELAY = timedelta(seconds=5)
+
+
+def _touch_conversation(db: Session, participants: OrderParticipants, db_message: Message) -> None:
+    """Обновить сводку переписки по заказу новым сообщением (в текущей транзакции)"""
+    from sqlalchemy import case, or_
+    from sqlalchemy.exc import IntegrityError
+    
+    for_buyer = db_message.receiver_id == participants.buyer_id
+    preview = db_message.content[:PREVIEW_LENGTH]
+    
+    # Атомарный UPDATE: счетчики увеличиваются в БД, последнее сообщение
+    # меняется только если новое сообщение действительно новее
+    is_newer = or_(
+        Conversation.last_message_id.is_(None),
+        Conversation.last_message_id < db_message.id
+    )
+    values = {
+        Conversation.last_message_id: case((is_newer, db_message.id), else_=Conversation.last_message_id),
+        Conversation.last_message_at: case((is_newer, db_message.created_at), else_=Conversation.last_message_at),
+        Conversation.last_message_preview: case((is_newer, preview), else_=Conversation.last_message_preview),
+        Conversation.updated_at: datetime.utcnow()
+    }
+    if for_buyer:
+        values[Conversation.buyer_unread_count] = Conversation.buyer_unread_count + 1
+    else:
+        values[Conversation.supplier_unread_count] = Conversation.supplier_unread_count + 1
+    
+    updated = db.query(Conversation).filter(
+        Conversation.order_id == participants.order_id
+    ).update(values, synchronize_session=False)
+    if updated:
+        return
+    
+    # Первое сообщение в заказе - создаем сводку. Если параллельный запрос
+    # успел создать ее раньше, повторяем UPDATE
+    try:
+        with db.begin_nested():
+            db.add(Conversation(
+                order_id=participants.order_id,
+                last_message_id=db_message.id,
+                last_message_at=db_message.created_at,
+                last_message_preview=preview,
+                buyer_unread_count=1 if for_buyer else 0,
+                supplier_unread_count=0 if for_buyer else 1
+            ))
+    except IntegrityError:
+        db.query(Conversation).filter(
+            Conversation.order_id == participants.order_id
+        ).update(values, synchronize_session=False)
+
+
+def _unread_filter(order_id: int, user_id: int):
+    """
+    Условие "сообщение не прочитано пользователем": id больше курсора прочтения
+    (индекс (order_id, receiver_id, id)) и нет отметки read_at со времен до курсоров
+    """
+    from sqlalchemy import func, select
+    
+    last_read = select(MessageReadCursor.last_read_message_id).where(
+        MessageReadCursor.order_id == order_id,
+        MessageReadCursor.user_id == user_id
+    ).scalar_subquery()
+    return and_(
+        Message.order_id == order_id,
+        Message.receiver_id == user_id,
+        Message.id > func.coalesce(last_read, 0),
+        Message.read_at.is_(None)
+    )
+
+
+def _advance_read_cursor(db: Session, order_id: int, user_id: int, message_id: int) -> Tuple[int, datetime, bool]:
+    """
+    Сдвинуть курсор прочтения пользователя до message_id одним upsert
+    
+    Курсор только растет: отметка более старого сообщения его не откатывает.
+    Возвращает (last_read_message_id, время прочтения, сдвинулся ли курсор).
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    
+    statement = insert(MessageReadCursor).values(
+        order_id=order_id,
+        user_id=user_id,
+        last_read_message_id=message_id,
+        updated_at=datetime.utcnow()
+    )
+    # Строку курсора, который уже дальше, upsert не меняет и не возвращает:
+    # "курсор сдвинулся" - это наличие строки в RETURNING
+    statement = statement.on_conflict_do_update(
+        index_elements=[MessageReadCursor.order_id, MessageReadCursor.user_id],
+        set_={
+            "last_read_message_id": statement.excluded.last_read_message_id,
+            "updated_at": statement.excluded.updated_at,
+        },
+        where=statement.excluded.last_read_message_id > MessageReadCursor.last_read_message_id
+    ).returning(MessageReadCursor.last_read_message_id, MessageReadCursor.updated_at)
+    advanced = db.execute(statement).first()
+    if advanced is not None:
+        return advanced.last_read_message_id, advanced.updated_at, True
+    
+    current = db.query(MessageReadCursor.last_read_message_id, MessageReadCursor.updated_at).filter(
+        MessageReadCursor.order_id == order_id,
+        MessageReadCursor.user_id == user_id
+    ).one()
+    return current.last_read_message_id, current.updated_at, False
+
+
+def _recount_unread(db: Session, participants: OrderParticipants, user_id: int) -> None:
+    """Пересчитать счетчик непрочитанных участника в сводке переписки по курсору"""
+    from sqlalchemy import func, select
+    
+    column = (
+        Conversation.buyer_unread_count
+        if participants.buyer_id == user_id
+        else Conversation.supplier_unread_count
+    )
+    unread = select(func.count(Message.id)).where(_unread_filter(participants.order_id, user_id)).scalar_subquery()
+    db.query(Conversation).filter(
+        Conversation.order_id == participants.order_id
+    ).update({column: unread}, synchronize_session=False)
+
+
+def _apply_read_cursors(db: Session, messages: List[Message]) -> List[Message]:
+    """
+    Вычислить read_at сообщений по курсорам прочтения получателей
+    
+    Сообщение прочитано, если его id не больше курсора получателя; временем
+    прочтения считается последний сдвиг курсора. Значение выставляется без
+    пометки объекта измененным, в БД read_at не пишется.
+    """
+    from sqlalchemy import tuple_
+    from sqlalchemy.orm.attributes import set_committed_value
+    
+    keys = {(msg.order_id, msg.receiver_id) for msg in messages if msg.read_at is None}
+    if not keys:
+        return messages
+    
+    cursors = {
+        (cursor.order_id, cursor.user_id): cursor
+        for cursor in db.query(
+            MessageReadCursor.order_id,
+            MessageReadCursor.user_id,
+            MessageReadCursor.last_read_message_id,
+            MessageReadCursor.updated_at
+        ).filter(tuple_(MessageReadCursor.order_id, MessageReadCursor.user_id).in_(keys))
+    }
+    for msg in messages:
+        cursor = cursors.get((msg.order_id, msg.receiver_id))
+        if msg.read_at is None and cursor and msg.id <= cursor.last_read_message_id:
+            set_committed_value(msg, "read_at", cursor.updated_at)
+    return messages
+
+
+def _message_payload(db_message: Message, sender: User, receiver: User) -> dict:
+    """Сообщение в виде события (как MessageResponse)"""
+    return {
+        "id": db_message.id,
+        "order_id": db_message.order_id,
+        "sender_id": db_message.sender_id,
+        "receiver_id": db_message.receiver_id,
+        "content": db_message.content,
+        "created_at": db_message.created_at,
+        "read_at": db_message.read_at,
+        "sender": {"id": sender.id, "username": sender.username},
+        "receiver": {"id": receiver.id, "username": receiver.username},
+    }
 
 
 def get_messages_by_order(
@@ -12,48 +190,145 @@ def get_messages_by_order(
     order_id: int,
     current_user_id: int,
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    cursor: Optional[CursorKey] = None,
+    before: Optional[CursorKey] = None,
+    latest: bool = False,
+    after_id: Optional[int] = None
 ) -> List[Message]:
-    """Получить сообщения по заказу (только для участников заказа)"""
-    from app.models.user import UserRole
-    from app.models.supplier import Supplier
+    """
+    Получить сообщения по заказу (только для участников заказа)
     
-    # Проверяем, что пользователь является участником заказа
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if not order:
-        return []
+    Сообщения возвращаются в хронологическом порядке:
+    - after_id: сообщения с id больше after_id (дозагрузка после переподключения);
+    - cursor: страница сообщений после курсора (более новые);
+    - before: страница сообщений перед курсором ("загрузить старые");
+    - latest: последние limit сообщений чата;
+    - иначе устаревшая пагинация по смещению skip.
+    """
+    from sqlalchemy.orm import joinedload
     
-    user = db.query(User).filter(User.id == current_user_id).first()
-    if not user:
+    # Проверяем, что пользователь является участником заказа (одним запросом,
+    # текущий пользователь уже загружен аутентификацией)
+    participants = participant_service.get_participants(db, order_id)
+    user = db.get(User, current_user_id)
+    if not participants or not user or not participants.can_access(user):
         return []
     
-    # Проверяем права доступа
-    is_buyer = order.buyer_id == current_user_id
-    is_supplier = False
-    
-    # Если пользователь - поставщик, разрешаем просмотр даже если заказ еще не взят
-    if user.role == UserRole.SUPPLIER:
-        supplier = db.query(Supplier).filter(Supplier.user_id == current_user_id).first()
-        if supplier:
-            # Заказ взят этим поставщиком или еще свободен
-            if order.supplier_id == supplier.id or order.supplier_id is None:
-                is_supplier = True
-        else:
-            # Нет Supplier записи, но роль поставщик - разрешаем
-            is_supplier = True
-    elif order.supplier_id:
-        # Для не-поставщиков проверяем только если заказ уже взят
-        supplier = db.query(Supplier).filter(Supplier.id == order.supplier_id).first()
-        if supplier and supplier.user_id == current_user_id:
-            is_supplier = True
-    
-    if not (is_buyer or is_supplier):
-        return []
+    # Получаем сообщения вместе с отправителем и получателем
+    query = db.query(Message).options(
+        joinedload(Message.sender),
+        joinedload(Message.receiver)
+    ).filter(Message.order_id == order_id)
+    
+    if after_id is not None:
+        # Индекс (order_id, id)
+        messages = query.filter(Message.id > after_id).order_by(Message.id.asc()).limit(limit).all()
+        return _apply_read_cursors(db, messages)
+    
+    if before is not None or latest:
+        # Обратная пагинация: берем limit сообщений с конца по индексу и разворачиваем
+        if before is not None:
+            query = query.filter(
+                keyset_condition(Message.created_at, Message.id, before, descending=True)
+            )
+        messages = query.order_by(
+            Message.created_at.desc(), Message.id.desc()
+        ).limit(limit).all()
+        messages.reverse()
+        return _apply_read_cursors(db, messages)
+    
+    query = query.order_by(Message.created_at.asc(), Message.id.asc())
+    if cursor is not None:
+        query = query.filter(keyset_condition(Message.created_at, Message.id, cursor))
+    else:
+        query = query.offset(skip)
+    return _apply_read_cursors(db, query.limit(limit).all())
+
+
+def get_message_updates(
+    db: Session,
+    user_id: int,
+    since: Optional[SyncCursor],
+    limit: int = 100
+) -> dict:
+    """
+    Изменения в переписках пользователя после водяного знака
+    
+    Возвращает новые сообщения, где пользователь отправитель или получатель
+    (индексы (sender_id, id) и (receiver_id, id)), и сдвиги курсоров прочтения
+    в его заказах (индекс по updated_at). Без since возвращается только текущий
+    водяной знак - историю клиент загружает постранично по заказам.
+    """
+    from sqlalchemy import exists, func, or_
+    from sqlalchemy.orm import joinedload
+    
+    settled_at = datetime.utcnow() - SYNC_SETTLE_DELAY
+    participant = or_(Message.sender_id == user_id, Message.receiver_id == user_id)
+    
+    if since is None:
+        last_id = db.query(func.max(Message.id)).filter(
+            participant,
+            Message.created_at <= settled_at
+        ).scalar()
+        return {
+            "messages": [],
+            "reads": [],
+            "cursor": SyncCursor(last_id or 0, settled_at, 0),
+            "has_more": False,
+        }
+    
+    messages = db.query(Message).options(
+        joinedload(Message.sender),
+        joinedload(Message.receiver)
+    ).filter(
+        participant,
+        Message.id > since.message_id
+    ).order_by(Message.id.asc()).limit(limit).all()
+    _apply_read_cursors(db, messages)
+    
+    # Водяной знак сдвигается только по "устоявшимся" сообщениям
+    next_message_id = since.message_id
+    for db_message in messages:
+        if db_message.created_at > settled_at:
+            break
+        next_message_id = db_message.id
+    
+    # Курсоры самого пользователя (прочтение с другого устройства) и собеседников
+    # в заказах, где у него есть переписка
+    reads = db.query(MessageReadCursor).filter(
+        or_(
+            MessageReadCursor.user_id == user_id,
+            exists().where(Message.order_id == MessageReadCursor.order_id, participant)
+        ),
+        MessageReadCursor.updated_at <= settled_at,
+        keyset_condition(MessageReadCursor.updated_at, MessageReadCursor.id, (since.read_at, since.read_id))
+    ).order_by(MessageReadCursor.updated_at.asc(), MessageReadCursor.id.asc()).limit(limit).all()
+    
+    # Полная страница сообщений, но водяной знак не сдвинулся (все они моложе
+    # SYNC_SETTLE_DELAY) - повторный запрос вернул бы ту же страницу
+    messages_more = len(messages) >= limit and next_message_id > since.message_id
     
-    # Получаем сообщения
-    return db.query(Message).filter(
-        Message.order_id == order_id
-    ).order_by(Message.created_at.asc()).offset(skip).limit(limit).all()
+    if len(reads) >= limit:
+        next_read = (reads[-1].updated_at, reads[-1].id)
+    else:
+        # Все прочтения до settled_at отданы
+        next_read = (max(since.read_at, settled_at), 0)
+    
+    return {
+        "messages": messages,
+        "reads": [
+            {
+                "order_id": read.order_id,
+                "user_id": read.user_id,
+                "last_read_message_id": read.last_read_message_id,
+                "read_at": read.updated_at,
+            }
+            for read in reads
+        ],
+        "cursor": SyncCursor(next_message_id, *next_read),
+        "has_more": messages_more or len(reads) >= limit,
+    }
 
 
 def create_message(
@@ -62,83 +337,46 @@ def create_message(
     sender_id: int
 ) -> Message:
     """Создать новое сообщение"""
-    from app.models.user import UserRole
-    from app.models.supplier import Supplier
-    
-    # Проверяем, что заказ существует и пользователь имеет доступ
-    order = db.query(Order).filter(Order.id == message.order_id).first()
-    if not order:
+    participants = participant_service.get_participants(db, message.order_id)
+    if not participants:
         raise ValueError("Заказ не найден")
     
-    sender = db.query(User).filter(User.id == sender_id).first()
+    # Отправитель уже загружен аутентификацией (берется из identity map сессии)
+    sender = db.get(User, sender_id)
     if not sender:
         raise ValueError("Отправитель не найден")
     
-    # Проверяем, что sender является участником заказа
-    is_sender_buyer = order.buyer_id == sender_id
-    is_sender_supplier = False
-    
-    # Если отправитель - поставщик по роли, разрешаем отправку даже если заказ еще не взят
-    if sender.role == UserRole.SUPPLIER:
-        # Проверяем, есть ли у поставщика Supplier запись
-        supplier = db.query(Supplier).filter(Supplier.user_id == sender_id).first()
-        if supplier:
-            # Если заказ уже взят этим поставщиком
-            if order.supplier_id == supplier.id:
-                is_sender_supplier = True
-            # Или если заказ еще свободен - тоже разрешаем (будет отклик при первой отправке)
-            elif order.supplier_id is None:
-                is_sender_supplier = True
-        # Если нет Supplier записи, но роль поставщик - разрешаем (будет создана при отклике)
-        else:
-            is_sender_supplier = True
-    elif order.supplier_id:
-        # Для не-поставщиков проверяем только если заказ уже взят
-        supplier = db.query(Supplier).filter(Supplier.id == order.supplier_id).first()
-        if supplier and supplier.user_id == sender_id:
-            is_sender_supplier = True
-    
-    if not (is_sender_buyer or is_sender_supplier):
+    # Отправитель - участник заказа; поставщик может написать и по свободному заказу
+    if not participants.can_access(sender):
         raise ValueError("Нет доступа к этому заказу")
     
-    # Проверяем, что receiver тоже участник
-    receiver = db.query(User).filter(User.id == message.receiver_id).first()
+    receiver = db.get(User, message.receiver_id)
     if not receiver:
         raise ValueError("Получатель не найден")
     
-    # Определяем, является ли receiver участником заказа
-    is_receiver_buyer = order.buyer_id == message.receiver_id
-    is_receiver_supplier = False
-    
-    # Если получатель - поставщик по роли и заказ еще свободен, разрешаем
-    if receiver.role == UserRole.SUPPLIER:
-        supplier = db.query(Supplier).filter(Supplier.user_id == message.receiver_id).first()
-        if supplier:
-            if order.supplier_id == supplier.id or order.supplier_id is None:
-                is_receiver_supplier = True
-        else:
-            is_receiver_supplier = True
-    elif order.supplier_id:
-        supplier = db.query(Supplier).filter(Supplier.id == order.supplier_id).first()
-        if supplier and supplier.user_id == message.receiver_id:
-            is_receiver_supplier = True
-    
-    if not (is_receiver_buyer or is_receiver_supplier):
+    if not participants.can_access(receiver):
         raise ValueError("Получатель не является участником этого заказа")
     
     # Проверяем, что sender и receiver разные пользователи
     if sender_id == message.receiver_id:
         raise ValueError("Нельзя отправить сообщение самому себе")
     
+    # Отправитель и получатель привязываются к сообщению: ответ строится
+    # без повторной загрузки (identity map хранит объекты по слабым ссылкам)
     db_message = Message(
         order_id=message.order_id,
-        sender_id=sender_id,
-        receiver_id=message.receiver_id,
+        sender=sender,
+        receiver=receiver,
         content=message.content
     )
     db.add(db_message)
+    db.flush()
+    _touch_conversation(db, participants, db_message)
+    realtime_service.publish(
+        db, [sender_id, message.receiver_id], realtime_service.MESSAGE_CREATED,
+        {"message": _message_payload(db_message, sender, receiver)}
+    )
     db.commit()
-    db.refresh(db_message)
     return db_message
 
 
@@ -147,8 +385,18 @@ def mark_message_as_read(
     message_id: int,
     user_id: int
 ) -> Optional[Message]:
-    """Отметить сообщение как прочитанное"""
-    message = db.query(Message).filter(Message.id == message_id).first()
+    """
+    Отметить сообщение как прочитанное
+    
+    Сдвигает курсор прочтения пользователя в заказе до этого сообщения:
+    все более ранние адресованные ему сообщения тоже считаются прочитанными.
+    """
+    from sqlalchemy.orm import joinedload
+    
+    message = db.query(Message).options(
+        joinedload(Message.sender),
+        joinedload(Message.receiver)
+    ).filter(Message.id == message_id).first()
     if not message:
         return None
     
@@ -157,79 +405,72 @@ def mark_message_as_read(
         return None
     
     if not message.read_at:
-        from datetime import datetime
-        message.read_at = datetime.utcnow()
+        last_read_message_id, read_at, advanced = _advance_read_cursor(
+            db, message.order_id, user_id, message.id
+        )
+        if advanced:
+            _recount_unread(db, participant_service.get_participants(db, message.order_id), user_id)
+            realtime_service.publish(
+                db, [message.sender_id, user_id], realtime_service.MESSAGE_READ,
+                {
+                    "order_id": message.order_id,
+                    "reader_id": user_id,
+                    "last_read_message_id": last_read_message_id,
+                    "read_at": read_at,
+                }
+            )
         db.commit()
-        db.refresh(message)
+        _apply_read_cursors(db, [message])
     
     return message
 
 
 def get_user_chats(db: Session, user_id: int) -> List[dict]:
     """Получить все чаты пользователя (заказы с сообщениями)"""
-    from sqlalchemy import func, or_, and_
+    from sqlalchemy import case, or_
+    from sqlalchemy.orm import aliased
     from app.models.supplier import Supplier
     
-    # Получаем все заказы, где пользователь является участником (buyer или supplier)
-    # и есть хотя бы одно сообщение
-    orders_with_messages = db.query(Order).join(Message, Order.id == Message.order_id).distinct().all()
-    
-    chats = []
-    for order in orders_with_messages:
-        # Проверяем, является ли пользователь участником
-        is_buyer = order.buyer_id == user_id
-        is_supplier = False
-        other_user_id = None
-        other_user_name = None
-        
-        if order.supplier_id:
-            supplier = db.query(Supplier).filter(Supplier.id == order.supplier_id).first()
-            if supplier and supplier.user_id == user_id:
-                is_supplier = True
-                other_user_id = order.buyer_id
-                other_user_name = order.buyer.username if order.buyer else "Неизвестно"
-        
-        if is_buyer:
-            if order.supplier_id:
-                supplier = db.query(Supplier).filter(Supplier.id == order.supplier_id).first()
-                if supplier and supplier.user_id:
-                    other_user_id = supplier.user_id
-                    other_user = db.query(User).filter(User.id == supplier.user_id).first()
-                    other_user_name = other_user.username if other_user else "Неизвестно"
-            else:
-                continue  # Пропускаем заказы без поставщика
-        
-        if not (is_buyer or is_supplier) or not other_user_id:
-            continue
-        
-        # Получаем последнее сообщение
-        last_message = db.query(Message).filter(
-            Message.order_id == order.id
-        ).order_by(Message.created_at.desc()).first()
-        
-        # Считаем непрочитанные сообщения (где пользователь получатель и read_at = None)
-        unread_count = db.query(func.count(Message.id)).filter(
-            and_(
-                Message.order_id == order.id,
-                Message.receiver_id == user_id,
-                Message.read_at.is_(None)
-            )
-        ).scalar() or 0
-        
-        chats.append({
-            "order_id": order.id,
-            "order_title": order.title,
-            "other_user_id": other_user_id,
-            "other_user_name": other_user_name,
-            "last_message": last_message.content if last_message else None,
-            "last_message_time": last_message.created_at if last_message else None,
-            "unread_count": unread_count
-        })
-    
-    # Сортируем по времени последнего сообщения (новые сверху)
-    chats.sort(key=lambda x: x["last_message_time"] or datetime.min, reverse=True)
-    
-    return chats
+    # Чаты читаются из денормализованной сводки conversations: только заказы,
+    # где пользователь покупатель (с назначенным поставщиком) или назначенный поставщик
+    is_buyer = Order.buyer_id == user_id
+    other_user = aliased(User)
+    rows = db.query(
+        Order.id.label("order_id"),
+        Order.title.label("order_title"),
+        case((is_buyer, Supplier.user_id), else_=Order.buyer_id).label("other_user_id"),
+        other_user.username,
+        Conversation.last_message_preview,
+        Conversation.last_message_at,
+        case(
+            (is_buyer, Conversation.buyer_unread_count),
+            else_=Conversation.supplier_unread_count
+        ).label("unread_count")
+    ).join(
+        Conversation, Conversation.order_id == Order.id
+    ).join(
+        Supplier, Supplier.id == Order.supplier_id
+    ).outerjoin(
+        other_user,
+        other_user.id == case((is_buyer, Supplier.user_id), else_=Order.buyer_id)
+    ).filter(
+        Supplier.user_id.isnot(None),
+        or_(is_buyer, Supplier.user_id == user_id)
+    ).order_by(Conversation.last_message_at.desc()).all()
+    
+    # Сортировка по времени последнего сообщения (новые сверху) выполнена в запросе
+    return [
+        {
+            "order_id": row.order_id,
+            "order_title": row.order_title,
+            "other_user_id": row.other_user_id,
+            "other_user_name": row.username or "Неизвестно",
+            "last_message": row.last_message_preview,
+            "last_message_time": row.last_message_at,
+            "unread_count": row.unread_count or 0
+        }
+        for row in rows
+    ]
 
 
 def mark_all_messages_as_read_in_order(
@@ -238,34 +479,32 @@ def mark_all_messages_as_read_in_order(
     user_id: int
 ) -> int:
     """Пометить все непрочитанные сообщения в заказе как прочитанные для пользователя"""
-    from datetime import datetime
-    
     # Проверяем, что пользователь является участником заказа
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if not order:
-        return 0
-    
-    # Проверяем права доступа
-    is_buyer = order.buyer_id == user_id
-    is_supplier = False
-    if order.supplier_id:
-        from app.models.supplier import Supplier
-        supplier = db.query(Supplier).filter(Supplier.id == order.supplier_id).first()
-        if supplier and supplier.user_id == user_id:
-            is_supplier = True
-    
-    if not (is_buyer or is_supplier):
+    participants = participant_service.get_participants(db, order_id)
+    if not participants or not participants.is_member(user_id):
         return 0
     
-    # Помечаем все непрочитанные сообщения, где пользователь получатель
-    updated = db.query(Message).filter(
-        Message.order_id == order_id,
-        Message.receiver_id == user_id,
-        Message.read_at.is_(None)
-    ).update(
-        {"read_at": datetime.utcnow()},
-        synchronize_session=False
-    )
+    # Непрочитанные по отправителям: сколько отметить, до какого id сдвинуть
+    # курсор и кого уведомить о прочтении
+    from sqlalchemy import func
+    rows = db.query(
+        Message.sender_id, func.count(Message.id), func.max(Message.id)
+    ).filter(_unread_filter(order_id, user_id)).group_by(Message.sender_id).all()
+    updated = sum(count for _, count, _ in rows)
+    if rows:
+        last_read_message_id, read_at, _ = _advance_read_cursor(
+            db, order_id, user_id, max(last_id for _, _, last_id in rows)
+        )
+        _recount_unread(db, participants, user_id)
+        realtime_service.publish(
+            db, [sender_id for sender_id, _, _ in rows] + [user_id], realtime_service.MESSAGE_READ,
+            {
+                "order_id": order_id,
+                "reader_id": user_id,
+                "last_read_message_id": last_read_message_id,
+                "read_at": read_at,
+            }
+        )
     
     db.commit()
     return updated
@@ -0,0 +1,96 @@
+"""
+Коллекторы метрик сервисов для GET /metrics
+
+Кеши, пул хеширования паролей, лента заказов, пул потоков обработчиков и
+отправка почты уже ведут собственную статистику - коллекторы переводят ее в
+метрики Prometheus в момент выгрузки (app/core/metrics.py). Накопительные
+значения выгружаются как counter, текущие - как gauge.
+"""
+from typing import Iterable
+from anyio import to_thread
+from app.core import metrics
+from app.core.metrics import COUNTER, GAUGE, Sample
+from app.services import (
+    credential_service,
+    email_service,
+    order_feed_service,
+    participant_service,
+    supplier_service,
+    user_service,
+)
+
+# Кеши процесса по имени метки cache
+CACHES = {
+    "principal": user_service.principal_cache,
+    "order_participants": participant_service.participants_cache,
+    "supplier_id": supplier_service.supplier_id_cache,
+}
+
+
+def collect_caches() -> Iterable[Sample]:
+    for name, cache in CACHES.items():
+        stats = cache.stats()
+        labels = {"cache": name}
+        yield "cache_hits_total", COUNTER, "Попадания в кеш", labels, stats["hits"]
+        yield "cache_misses_total", COUNTER, "Промахи кеша", labels, stats["misses"]
+        yield "cache_evictions_total", COUNTER, "Вытеснения из кеша по размеру", labels, stats["evictions"]
+        yield "cache_entries", GAUGE, "Записей в кеше", labels, stats["size"]
+
+
+def collect_threadpool() -> Iterable[Sample]:
+    """Заполненность пула потоков, в котором выполняются синхронные эндпоинты"""
+    try:
+        limiter = to_thread.current_default_thread_limiter()
+    except RuntimeError:
+        # Вне event loop (снимок из синхронного кода) пул недоступен
+        return
+    yield "threadpool_busy_threads", GAUGE, "Занятых потоков пула обработчиков", {}, limiter.borrowed_tokens
+    yield "threadpool_max_threads", GAUGE, "Размер пула потоков обработчиков", {}, limiter.total_tokens
+    yield (
+        "threadpool_waiting_tasks", GAUGE, "Задач в ожидании свободного потока", {},
+        limiter.statistics().tasks_waiting
+    )
+
+
+def collect_password_hashing() -> Iterable[Sample]:
+    stats = credential_service.get_stats()
+    yield "password_hash_operations_total", COUNTER, "Операций хеширования и проверки паролей", {}, stats["operations"]
+    yield (
+        "password_hash_queue_wait_seconds_total", COUNTER,
+        "Суммарное ожидание очереди хеширования", {}, stats["queue_wait_total_seconds"]
+    )
+    yield "password_hash_in_flight", GAUGE, "Операций с паролями в работе", {}, stats["in_flight"]
+
+
+def collect_order_feed() -> Iterable[Sample]:
+    for event, value in order_feed_service.get_stats().items():
+        yield (
+            "order_feed_events_total", COUNTER,
+            "Обращения к снимку ленты свободных заказов", {"event": event}, value
+        )
+
+
+def collect_email() -> Iterable[Sample]:
+    stats = email_service.get_stats()
+    if not stats:
+        return
+    for key, help in (
+        ("sent", "Писем принято SMTP сервером"),
+        ("failed", "Писем не отправлено после всех попыток"),
+        ("throttled", "Ответов SMTP 421/451 (превышен лимит отправки)"),
+        ("retries", "Повторов отправки после 421/451"),
+    ):
+        yield f"email_{key}_total", COUNTER, help, {}, stats[key]
+    yield "email_queue_depth", GAUGE, "Писем в очереди и в отправке", {}, stats["queue_depth"]
+    yield "email_smtp_connections_opened_total", COUNTER, "Открытых SMTP соединений", {}, stats.get("connections_opened", 0)
+
+
+def register_web() -> None:
+    """Коллекторы процесса API"""
+    for collector in (collect_caches, collect_threadpool, collect_password_hashing, collect_order_feed, collect_email):
+        metrics.register_collector(collector)
+
+
+def register_worker() -> None:
+    """Коллекторы воркера outbox"""
+    metrics.register_collector(collect_email)
@@ -0,0 +1,229 @@
+from datetime import datetime, timedelta
+from typing import List
+from sqlalchemy import insert, select, literal, or_, and_
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.notification import NotificationOutbox, NotificationStatus, NotificationKind
+from app.models.order import Order
+from app.models.supplier import Supplier
+from app.models.user import User, UserRole, EmailDeliveryMode
+from app.services import interest_service
+
+
+def enqueue_order_notifications(db: Session, order: Order) -> None:
+    """
+    Поставить в outbox уведомления поставщикам о новом заказе
+
+    Выполняется одним INSERT ... SELECT в текущей транзакции (без commit),
+    поэтому уведомления появляются атомарно вместе с заказом. Свободный заказ
+    получают только поставщики, чьи подписки совпали с текстом заказа,
+    и поставщики без подписок.
+    """
+    recipients = select(
+        literal(NotificationKind.NEW_ORDER.value),
+        literal(order.id),
+        User.id,
+        User.email,
+        User.email_delivery_mode
+    ).where(
+        User.role == UserRole.SUPPLIER,
+        User.email_notifications == True,
+        User.email.isnot(None)
+    )
+
+    if order.supplier_id:
+        # Заказ адресован конкретному поставщику
+        recipients = recipients.join(Supplier, Supplier.user_id == User.id).where(
+            Supplier.id == order.supplier_id
+        )
+    else:
+        terms = interest_service.extract_terms(
+            order.title, order.product_name, order.product_description
+        )
+        recipients = recipients.where(interest_service.recipient_filter(User.id, terms))
+
+    db.execute(
+        insert(NotificationOutbox).from_select(
+            ["kind", "order_id", "user_id", "recipient_email", "delivery_mode"],
+            recipients
+        )
+    )
+
+
+def _claimable(now: datetime):
+    """Условие "запись можно забрать": пора отправлять или истекла аренда упавшего воркера"""
+    lease_expired_at = now - timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+    return or_(
+        and_(
+            NotificationOutbox.status == NotificationStatus.PENDING,
+            NotificationOutbox.next_attempt_at <= now
+        ),
+        and_(
+            NotificationOutbox.status == NotificationStatus.PROCESSING,
+            NotificationOutbox.locked_at < lease_expired_at
+        )
+    )
+
+
+def _lock_entries(db: Session, entries: List[NotificationOutbox], now: datetime) -> List[dict]:
+    """Перевести забранные записи в PROCESSING и вернуть их данные (с commit)"""
+    claimed = []
+    for entry in entries:
+        entry.status = NotificationStatus.PROCESSING
+        entry.locked_at = now
+        claimed.append({
+            "id": entry.id,
+            "kind": entry.kind,
+            "order_id": entry.order_id,
+            "user_id": entry.user_id,
+            "recipient_email": entry.recipient_email,
+            "attempts": entry.attempts,
+            "locked_at": now,
+        })
+    db.commit()
+    return claimed
+
+
+def claim_batch(db: Session, batch_size: int) -> List[dict]:
+    """
+    Забрать пачку уведомлений на немедленную отправку
+    
+    SELECT ... FOR UPDATE SKIP LOCKED позволяет нескольким воркерам разбирать
+    outbox параллельно без пересечений. Записи, зависшие в PROCESSING дольше
+    OUTBOX_LEASE_SECONDS (воркер упал), забираются повторно.
+    """
+    now = datetime.utcnow()
+    entries = db.query(NotificationOutbox).filter(
+        NotificationOutbox.delivery_mode == EmailDeliveryMode.IMMEDIATE,
+        _claimable(now)
+    ).order_by(NotificationOutbox.id).limit(batch_size).with_for_update(skip_locked=True).all()
+    return _lock_entries(db, entries, now)
+
+
+def digest_cutoff(mode: EmailDeliveryMode, now: datetime) -> datetime:
+    """
+    Начало текущего периода сводки
+    
+    В сводку попадают уведомления, поставленные до этого момента: для часовой
+    сводки - до начала текущего часа, для ежедневной - до последнего
+    наступившего DIGEST_DAILY_HOUR (UTC).
+    """
+    if mode == EmailDeliveryMode.HOURLY:
+        return now.replace(minute=0, second=0, microsecond=0)
+    cutoff = now.replace(hour=settings.DIGEST_DAILY_HOUR, minute=0, second=0, microsecond=0)
+    if cutoff > now:
+        cutoff -= timedelta(days=1)
+    return cutoff
+
+
+def claim_digest_batch(db: Session, mode: EmailDeliveryMode, max_recipients: int) -> List[dict]:
+    """
+    Забрать накопленные уведомления для сводок
+    
+    Выбирает до max_recipients получателей, у которых есть уведомления
+    за завершившийся период, и забирает все их уведомления разом, чтобы
+    каждый получил одно письмо. Возвращает группы по получателям.
+    """
+    now = datetime.utcnow()
+    due = and_(
+        NotificationOutbox.delivery_mode == mode,
+        NotificationOutbox.created_at < digest_cutoff(mode, now),
+        _claimable(now)
+    )
+    user_ids = [
+        row[0] for row in db.query(NotificationOutbox.user_id).filter(due).distinct().limit(max_recipients)
+    ]
+    if not user_ids:
+        return []
+
+    entries = db.query(NotificationOutbox).filter(
+        NotificationOutbox.user_id.in_(user_ids),
+        due
+    ).order_by(NotificationOutbox.id).with_for_update(skip_locked=True).all()
+
+    groups = {}
+    for entry in _lock_entries(db, entries, now):
+        group = groups.setdefault(entry["user_id"], {
+            "user_id": entry["user_id"],
+            "recipient_email": entry["recipient_email"],
+            "entries": [],
+        })
+        group["entries"].append(entry)
+    return list(groups.values())
+
+
+def _held(locked_at: datetime):
+    """
+    Условие "аренда записи все еще наша"
+
+    Если воркер не успел за OUTBOX_LEASE_SECONDS, запись забирает другой
+    воркер с новым locked_at - результат первого ее уже не меняет.
+    """
+    return and_(
+        NotificationOutbox.status == NotificationStatus.PROCESSING,
+        NotificationOutbox.locked_at == locked_at
+    )
+
+
+def renew_lease(db: Session, entry_ids: List[int], locked_at: datetime) -> datetime:
+    """
+    Продлить аренду забранных записей на время отправки (с commit)
+
+    Возвращает новое значение locked_at; записи, которые уже забрал другой
+    воркер, не продлеваются.
+    """
+    renewed_at = datetime.utcnow()
+    if entry_ids:
+        db.query(NotificationOutbox).filter(
+            NotificationOutbox.id.in_(entry_ids),
+            _held(locked_at)
+        ).update({"locked_at": renewed_at}, synchronize_session=False)
+        db.commit()
+    return renewed_at
+
+
+def mark_sent(db: Session, entry_ids: List[int], locked_at: datetime) -> None:
+    """Отметить уведомления как отправленные"""
+    if not entry_ids:
+        return
+    db.query(NotificationOutbox).filter(
+        NotificationOutbox.id.in_(entry_ids),
+        _held(locked_at)
+    ).update(
+        {
+            "status": NotificationStatus.SENT,
+            "sent_at": datetime.utcnow(),
+            "locked_at": None,
+            "last_error": None,
+        },
+        synchronize_session=False
+    )
+    db.commit()
+
+
+def mark_failed(db: Session, entry_id: int, attempts: int, error: str, locked_at: datetime) -> None:
+    """
+    Зафиксировать неудачную попытку отправки
+
+    Следующая попытка откладывается с экспоненциальной задержкой; после
+    OUTBOX_MAX_ATTEMPTS попыток уведомление переводится в DEAD.
+    """
+    attempts += 1
+    if attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        values = {"status": NotificationStatus.DEAD}
+    else:
+        delay = min(
+            settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1),
+            settings.OUTBOX_RETRY_MAX_SECONDS
+        )
+        values = {
+            "status": NotificationStatus.PENDING,
+            "next_attempt_at": datetime.utcnow() + timedelta(seconds=delay),
+        }
+    values.update({"attempts": attempts, "locked_at": None, "last_error": error[:1000]})
+
+    db.query(NotificationOutbox).filter(
+        NotificationOutbox.id == entry_id,
+        _held(locked_at)
+    ).update(values, synchronize_session=False)
+    db.commit()
@@ -0,0 +1,154 @@
+"""
+Общая лента свободных заказов для поставщиков
+
+Свободные заказы (supplier_id IS NULL) одинаковы для всех поставщиков, поэтому
+они загружаются и сериализуются один раз в снимок, который живет
+ORDER_FEED_TTL_SECONDS и сбрасывается при создании, отклике, смене статуса,
+изменении и удалении заказа. Снимок перестраивает один запрос; остальные
+на время перестройки не ждут ее (и не держат соединение с БД), а получают
+прежний снимок, если он только истек по времени, или читают страницу из БД.
+Собственные заказы поставщика запрашиваются отдельно и вливаются в страницу
+при запросе. Сброс действует в пределах процесса: в других воркерах снимок
+устаревает не дольше чем через ORDER_FEED_TTL_SECONDS.
+"""
+import bisect
+import heapq
+import threading
+import time
+from itertools import islice
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+from sqlalchemy.orm import Session, joinedload
+from app.core.config import settings
+from app.core.pagination import CursorKey
+from app.models.order import Order, OrderStatus
+
+
+class _Snapshot(NamedTuple):
+    generation: int
+    built_at: float
+    keys: Tuple[CursorKey, ...]  # (created_at, id) элементов, по возрастанию
+    items: Optional[tuple]  # None - свободных заказов больше ORDER_FEED_MAX_SIZE
+
+
+_snapshot: Optional[_Snapshot] = None
+_generation = 0
+_state_lock = threading.Lock()
+_rebuild_lock = threading.Lock()
+
+# Счетчики меняются под _state_lock: обработчики выполняются в пуле потоков
+stats = {"hits": 0, "rebuilds": 0, "stale": 0, "bypassed": 0, "invalidations": 0}
+
+
+def _count(event: str) -> None:
+    with _state_lock:
+        stats[event] += 1
+
+
+def get_stats() -> dict:
+    """Копия счетчиков обращений к снимку"""
+    with _state_lock:
+        return dict(stats)
+
+
+def _fresh(snapshot: Optional[_Snapshot]) -> bool:
+    return (
+        snapshot is not None
+        and snapshot.generation == _generation
+        and time.monotonic() - snapshot.built_at < settings.ORDER_FEED_TTL_SECONDS
+    )
+
+
+def invalidate() -> None:
+    """Сбросить снимок (после изменения набора или содержимого свободных заказов)"""
+    global _generation, _snapshot
+    with _state_lock:
+        _generation += 1
+        _snapshot = None
+        stats["invalidations"] += 1
+
+
+def get_unassigned(db: Session, serialize: Callable[[Order], object]) -> Optional[_Snapshot]:
+    """
+    Снимок свободных заказов, сериализованных serialize, в порядке (created_at, id)
+
+    Возвращает None, если лента отключена (ORDER_FEED_TTL_SECONDS = 0) или
+    свободных заказов слишком много для снимка - тогда страница читается из БД.
+    """
+    global _snapshot
+    if settings.ORDER_FEED_TTL_SECONDS <= 0:
+        return None
+
+    snapshot = _snapshot
+    if _fresh(snapshot):
+        _count("hits")
+        return snapshot if snapshot.items is not None else None
+
+    if not _rebuild_lock.acquire(blocking=False):
+        # Снимок перестраивает другой запрос. Истекший только по времени снимок
+        # еще можно отдать; сброшенный (заказ изменился) - нет, читаем из БД
+        snapshot = _snapshot
+        if snapshot is not None and snapshot.generation == _generation and snapshot.items is not None:
+            _count("stale")
+            return snapshot
+        _count("bypassed")
+        return None
+
+    try:
+        # Снимок мог перестроить другой поток между проверкой и блокировкой
+        snapshot = _snapshot
+        if _fresh(snapshot):
+            _count("hits")
+            return snapshot if snapshot.items is not None else None
+
+        generation = _generation
+        orders = db.query(Order).options(
+            joinedload(Order.buyer)
+        ).filter(
+            Order.supplier_id.is_(None)
+        ).order_by(
+            Order.created_at.asc(), Order.id.asc()
+        ).limit(settings.ORDER_FEED_MAX_SIZE + 1).all()
+
+        if len(orders) > settings.ORDER_FEED_MAX_SIZE:
+            snapshot = _Snapshot(generation, time.monotonic(), (), None)
+        else:
+            snapshot = _Snapshot(
+                generation,
+                time.monotonic(),
+                tuple((order.created_at, order.id) for order in orders),
+                tuple(serialize(order) for order in orders)
+            )
+
+        # Снимок, собранный до сброса, уже устарел - отдаем его только этому запросу
+        with _state_lock:
+            stats["rebuilds"] += 1
+            if generation == _generation:
+                _snapshot = snapshot
+        return snapshot if snapshot.items is not None else None
+    finally:
+        _rebuild_lock.release()
+
+
+def merge_page(
+    snapshot: _Snapshot,
+    own: Sequence,
+    status: Optional[OrderStatus],
+    cursor: Optional[CursorKey],
+    skip: int,
+    limit: int
+) -> List:
+    """
+    Страница ленты поставщика: свободные заказы из снимка и его собственные
+    заказы (own, отсортированы по (created_at, id) и уже отфильтрованы по
+    статусу и курсору). Заказ, который поставщик уже взял, а снимок еще
+    считает свободным, берется из own.
+    """
+    own_ids = {item.id for item in own}
+    start = bisect.bisect_right(snapshot.keys, cursor) if cursor is not None else 0
+    shared = (
+        item for item in islice(snapshot.items, start, None)
+        if item.id not in own_ids and (status is None or item.status == status)
+    )
+    merged = heapq.merge(shared, own, key=lambda item: (item.created_at, item.id))
+    offset = 0 if cursor is not None else skip
+    return list(islice(merged, offset, offset + limit))
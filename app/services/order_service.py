@@ -4,7 +4,7 @@ from sqlalchemy import and_, or_
 from typing import Optional, List
 from app.models.order import Order, OrderStatus
 from app.schemas.order import OrderCreate, OrderUpdate
-from app.services import supplier_service, user_service
+from app.services import supplier_service, user_service, notification_service, participant_service, order_feed_service
 
 
 def calculate_remaining_time(deadline: datetime) -> Optional[str]:
@@ -27,8 +27,8 @@ def calculate_remaining_time(deadline: datetime) -> Optional[str]:
 
 
 def get_order(db: Session, order_id: int) -> Optional[Order]:
-    """Получить заказ по ID"""
-    return db.query(Order).filter(Order.id == order_id).first()
+    """Получить заказ по ID (из identity map сессии, если уже загружен)"""
+    return db.get(Order, order_id)
 
 
 def get_orders(
@@ -63,12 +63,14 @@ def create_order(db: Session, order: OrderCreate, buyer_id: int) -> Order:
         buyer_id=buyer_id
     )
     db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
+    db.flush()
     
-    # Email уведомления теперь отправляются в endpoint через BackgroundTasks
-    # Это позволяет не блокировать создание заказа
+    # Email уведомления пишутся в outbox в той же транзакции, что и заказ,
+    # и отправляются отдельным воркером (app/workers/outbox_worker.py)
+    notification_service.enqueue_order_notifications(db, db_order)
     
+    db.commit()
+    order_feed_service.invalidate()
     return db_order
 
 
@@ -93,10 +95,36 @@ def update_order(db: Session, order_id: int, order_update: OrderUpdate) -> Optio
     
     db_order.updated_at = datetime.utcnow()
     db.commit()
-    db.refresh(db_order)
+    order_feed_service.invalidate()
+    if "supplier_id" in update_data:
+        participant_service.invalidate(db, order_id)
     return db_order
 
 
+def claim_order(db: Session, order_id: int, supplier_id: int):
+    """
+    Атомарно закрепить свободный заказ за поставщиком
+    
+    Один UPDATE ... WHERE supplier_id IS NULL RETURNING: из параллельных откликов
+    заказ достается ровно одному поставщику. Возвращает строку заказа (колонки)
+    или None, если заказ уже взят или не существует.
+    """
+    from sqlalchemy import update
+    
+    claimed = db.execute(
+        update(Order)
+        .where(Order.id == order_id, Order.supplier_id.is_(None))
+        .values(supplier_id=supplier_id, updated_at=datetime.utcnow())
+        .returning(*Order.__table__.columns)
+        .execution_options(synchronize_session=False)
+    ).first()
+    db.commit()
+    if claimed is not None:
+        participant_service.invalidate(db, order_id)
+        order_feed_service.invalidate()
+    return claimed
+
+
 def delete_order(db: Session, order_id: int) -> bool:
     """Удалить заказ"""
     db_order = get_order(db, order_id)
@@ -105,6 +133,8 @@ def delete_order(db: Session, order_id: int) -> bool:
     
     db.delete(db_order)
     db.commit()
+    participant_service.invalidate(db, order_id)
+    order_feed_service.invalidate()
     return True
 
 
@@ -117,6 +147,6 @@ def update_order_status(db: Session, order_id: int, status: OrderStatus) -> Opti
     db_order.status = status
     db_order.updated_at = datetime.utcnow()
     db.commit()
-    db.refresh(db_order)
+    order_feed_service.invalidate()
     return db_order
 
@@ -0,0 +1,93 @@
+"""
+Участники заказа: покупатель и назначенный поставщик
+
+Проверка "является ли пользователь участником заказа" нужна заказам и
+переписке. Участники загружаются одним запросом (заказ + user_id поставщика),
+запоминаются в сессии на время запроса и кешируются между запросами.
+Кеш сбрасывается при смене поставщика заказа (claim_order, update_order)
+и удалении заказа; в других воркерах запись живет не дольше
+ORDER_PARTICIPANTS_CACHE_TTL_SECONDS.
+"""
+from typing import NamedTuple, Optional
+from sqlalchemy.orm import Session
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.order import Order
+from app.models.supplier import Supplier
+from app.models.user import User, UserRole
+
+# Ключ словаря Session.info с участниками, уже загруженными в этом запросе
+SESSION_KEY = "order_participants"
+
+participants_cache = TTLCache(
+    max_size=settings.ORDER_PARTICIPANTS_CACHE_MAX_SIZE if settings.ORDER_PARTICIPANTS_CACHE_TTL_SECONDS > 0 else 0,
+    ttl_seconds=settings.ORDER_PARTICIPANTS_CACHE_TTL_SECONDS
+)
+
+
+class OrderParticipants(NamedTuple):
+    """Покупатель и назначенный поставщик заказа (supplier_id - id записи suppliers)"""
+    order_id: int
+    buyer_id: int
+    supplier_id: Optional[int]
+    supplier_user_id: Optional[int]
+
+    @classmethod
+    def from_order(cls, order: Order) -> "OrderParticipants":
+        """Участники уже загруженного заказа (с отношением supplier)"""
+        return cls(
+            order.id,
+            order.buyer_id,
+            order.supplier_id,
+            order.supplier.user_id if order.supplier else None
+        )
+
+    def is_member(self, user_id: int) -> bool:
+        """Пользователь - покупатель или назначенный поставщик"""
+        return user_id == self.buyer_id or (
+            self.supplier_user_id is not None and user_id == self.supplier_user_id
+        )
+
+    def can_access(self, user: User) -> bool:
+        """
+        Доступ к заказу и его переписке: участники заказа, а пока заказ
+        свободен - любой поставщик (чтобы обсудить заказ до отклика)
+        """
+        if self.is_member(user.id):
+            return True
+        return self.supplier_id is None and user.role == UserRole.SUPPLIER
+
+
+def get_participants(db: Session, order_id: int) -> Optional[OrderParticipants]:
+    """Участники заказа или None, если заказа нет"""
+    memo = db.info.setdefault(SESSION_KEY, {})
+    if order_id in memo:
+        return memo[order_id]
+
+    participants = participants_cache.get(order_id)
+    if participants is None:
+        row = db.query(
+            Order.id, Order.buyer_id, Order.supplier_id, Supplier.user_id
+        ).outerjoin(
+            Supplier, Supplier.id == Order.supplier_id
+        ).filter(Order.id == order_id).first()
+        if row is not None:
+            participants = OrderParticipants(*row)
+            participants_cache.set(order_id, participants)
+
+    memo[order_id] = participants
+    return participants
+
+
+def invalidate(db: Optional[Session], order_id: int) -> None:
+    """Сбросить участников заказа (после смены поставщика или удаления заказа)"""
+    participants_cache.invalidate(order_id)
+    if db is not None:
+        db.info.get(SESSION_KEY, {}).pop(order_id, None)
+
+
+def invalidate_all(db: Optional[Session] = None) -> None:
+    """Сбросить всех участников (после удаления или изменения поставщика)"""
+    participants_cache.clear()
+    if db is not None:
+        db.info.pop(SESSION_KEY, None)
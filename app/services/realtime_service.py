@@ -0,0 +1,216 @@
+"""
+Доставка событий чата в реальном времени
+
+Сервисы публикуют события (новое сообщение, прочтение) в текущей транзакции;
+после commit событие попадает в хаб процесса, который раздает его открытым
+WebSocket соединениям участников переписки.
+
+Брокеры:
+- memory: события копятся в Session.info и отдаются хабу в after_commit -
+  работает в пределах одного процесса (разработка, тесты, SQLite);
+- postgres: событие отправляется через pg_notify в той же транзакции, и
+  PostgreSQL доставляет его после commit всем процессам, слушающим канал
+  (LISTEN), включая текущий.
+"""
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+from sqlalchemy import event, func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import async_engine
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "chat_events"
+PENDING_EVENTS_KEY = "realtime_events"
+# Лимит размера payload NOTIFY - 8000 байт; длинный текст сообщения не передается
+MAX_NOTIFY_PAYLOAD = 7500
+
+MESSAGE_CREATED = "message.created"
+MESSAGE_READ = "message.read"
+
+
+def _broker() -> str:
+    if settings.REALTIME_BROKER != "auto":
+        return settings.REALTIME_BROKER
+    backend = make_url(settings.DATABASE_URL).get_backend_name()
+    return "postgres" if backend == "postgresql" else "memory"
+
+
+class Subscription:
+    """Очередь событий одного WebSocket соединения"""
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.queue: "asyncio.Queue[Optional[dict]]" = asyncio.Queue()
+        self.overflowed = False
+
+
+class Hub:
+    """
+    Подписки соединений текущего процесса
+    
+    Работает в event loop приложения; из потоков синхронных обработчиков
+    события передаются через call_soon_threadsafe.
+    """
+
+    def __init__(self):
+        self._subscriptions: Dict[int, Set[Subscription]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(user_id)
+        self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.user_id]
+
+    def connections(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def dispatch(self, payload: dict) -> None:
+        """Раздать событие подписчикам (в event loop приложения)"""
+        for user_id in payload.get("user_ids", []):
+            for subscription in list(self._subscriptions.get(user_id, ())):
+                if subscription.queue.qsize() >= settings.REALTIME_QUEUE_SIZE:
+                    # Клиент не успевает читать: закрываем соединение, после
+                    # переподключения он догрузит пропущенное обычными запросами
+                    subscription.overflowed = True
+                    subscription.queue.put_nowait(None)
+                    self.unsubscribe(subscription)
+                    continue
+                subscription.queue.put_nowait(payload["event"])
+
+    def dispatch_threadsafe(self, payload: dict) -> None:
+        """Раздать событие из любого потока"""
+        if self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self.dispatch, payload)
+
+
+hub = Hub()
+
+
+def _serialize(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def publish(db: Session, user_ids: List[int], event_type: str, data: dict) -> None:
+    """
+    Опубликовать событие для пользователей в текущей транзакции
+    
+    Событие будет доставлено только после успешного commit; при откате
+    транзакции оно отбрасывается.
+    """
+    payload = {
+        "user_ids": sorted(set(user_ids)),
+        "event": {"type": event_type, **data},
+    }
+    if _broker() == "postgres":
+        raw = json.dumps(payload, default=_serialize, ensure_ascii=False)
+        if len(raw.encode("utf-8")) > MAX_NOTIFY_PAYLOAD and "content" in data.get("message", {}):
+            # Клиент загрузит полный текст по id сообщения
+            payload["event"]["message"] = {**data["message"], "content": None, "truncated": True}
+            raw = json.dumps(payload, default=_serialize, ensure_ascii=False)
+        db.execute(select(func.pg_notify(CHANNEL, raw)))
+    else:
+        # Сериализуем сразу: объекты сессии после commit могут быть expired
+        db.info.setdefault(PENDING_EVENTS_KEY, []).append(
+            json.loads(json.dumps(payload, default=_serialize))
+        )
+
+
+@event.listens_for(Session, "after_commit")
+def _deliver_pending(session: Session) -> None:
+    for payload in session.info.pop(PENDING_EVENTS_KEY, ()):
+        hub.dispatch_threadsafe(payload)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(session: Session) -> None:
+    # Откат SAVEPOINT сюда не попадает - только откат всей транзакции
+    session.info.pop(PENDING_EVENTS_KEY, None)
+
+
+class _PostgresListener:
+    """LISTEN на канал событий через отдельное соединение asyncpg с переподключением"""
+
+    RECONNECT_DELAY_SECONDS = 5.0
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    @staticmethod
+    def _on_notify(connection, pid, channel, raw: str) -> None:
+        try:
+            hub.dispatch(json.loads(raw))
+        except ValueError:
+            logger.warning("Некорректное событие в канале %s", channel)
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                async with async_engine.connect() as connection:
+                    raw_connection = await connection.get_raw_connection()
+                    driver_connection = raw_connection.driver_connection
+                    closed = asyncio.Event()
+                    driver_connection.add_termination_listener(lambda _: closed.set())
+                    await driver_connection.add_listener(CHANNEL, self._on_notify)
+                    logger.info("Подписка на канал %s установлена", CHANNEL)
+                    await closed.wait()
+                    logger.warning("Соединение LISTEN разорвано")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ошибка соединения LISTEN, переподключение")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.RECONNECT_DELAY_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+
+_listener: Optional[_PostgresListener] = None
+
+
+async def start() -> None:
+    """Запуск при старте приложения: привязать хаб к event loop и слушать PostgreSQL"""
+    global _listener
+    hub.bind(asyncio.get_running_loop())
+    if _broker() == "postgres" and _listener is None:
+        _listener = _PostgresListener()
+        _listener.start()
+
+
+async def stop() -> None:
+    """Остановка при завершении приложения"""
+    global _listener
+    if _listener is not None:
+        await _listener.stop()
+        _listener = None
@@ -1,7 +1,23 @@
+from datetime import datetime
 from sqlalchemy.orm import Session
 from typing import Optional, List
 from app.models.supplier import Supplier
 from app.schemas.supplier import SupplierCreate
+from app.models.user import User
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.pagination import CursorKey, keyset_condition
+from app.services import participant_service
+
+# Кеш user_id -> supplier_id: связь задается при регистрации и почти не меняется.
+# Кешируются только найденные записи. delete_supplier сбрасывает запись только
+# в своем воркере; в других она живет не дольше SUPPLIER_ID_CACHE_TTL_SECONDS
+# (отклик с удаленным supplier_id нарушает внешний ключ, и respond_to_order
+# находит запись поставщика заново)
+supplier_id_cache = TTLCache(
+    max_size=settings.SUPPLIER_ID_CACHE_MAX_SIZE if settings.SUPPLIER_ID_CACHE_TTL_SECONDS > 0 else 0,
+    ttl_seconds=settings.SUPPLIER_ID_CACHE_TTL_SECONDS
+)
 
 
 def get_supplier(db: Session, supplier_id: int) -> Optional[Supplier]:
@@ -9,9 +25,54 @@ def get_supplier(db: Session, supplier_id: int) -> Optional[Supplier]:
     return db.query(Supplier).filter(Supplier.id == supplier_id).first()
 
 
-def get_suppliers(db: Session, skip: int = 0, limit: int = 100) -> List[Supplier]:
-    """Получить список поставщиков"""
-    return db.query(Supplier).offset(skip).limit(limit).all()
+def get_supplier_id_by_user(db: Session, user_id: int) -> Optional[int]:
+    """ID записи поставщика пользователя через кеш (без записи в БД)"""
+    supplier_id = supplier_id_cache.get(user_id)
+    if supplier_id is None:
+        supplier_id = db.query(Supplier.id).filter(Supplier.user_id == user_id).scalar()
+        if supplier_id is not None:
+            supplier_id_cache.set(user_id, supplier_id)
+    return supplier_id
+
+
+def ensure_supplier_for_user(db: Session, user: User) -> int:
+    """
+    Создать запись поставщика для пользователя, если ее еще нет (без commit)
+    
+    INSERT ... ON CONFLICT (user_id) DO NOTHING идемпотентен и не падает
+    при параллельных вызовах. Возвращает ID записи поставщика.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    
+    db.execute(
+        insert(Supplier).values(
+            name=user.organization_name or user.username,
+            user_id=user.id,
+            contact_info=user.email or "",
+            country="China",
+            rating=0.0,
+            created_at=datetime.utcnow()
+        ).on_conflict_do_nothing(index_elements=[Supplier.user_id])
+    )
+    return db.query(Supplier.id).filter(Supplier.user_id == user.id).scalar()
+
+
+def get_suppliers(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[CursorKey] = None
+) -> List[Supplier]:
+    """Получить список поставщиков (по курсору или, устаревший вариант, по смещению)"""
+    query = db.query(Supplier).order_by(Supplier.created_at.asc(), Supplier.id.asc())
+    if cursor is not None:
+        query = query.filter(keyset_condition(Supplier.created_at, Supplier.id, cursor))
+    else:
+        query = query.offset(skip)
+    return query.limit(limit).all()
 
 
 def create_supplier(db: Session, supplier: SupplierCreate) -> Supplier:
@@ -19,7 +80,6 @@ def create_supplier(db: Session, supplier: SupplierCreate) -> Supplier:
     db_supplier = Supplier(**supplier.dict())
     db.add(db_supplier)
     db.commit()
-    db.refresh(db_supplier)
     return db_supplier
 
 
@@ -29,7 +89,12 @@ def delete_supplier(db: Session, supplier_id: int) -> bool:
     if not db_supplier:
         return False
     
+    user_id = db_supplier.user_id
     db.delete(db_supplier)
     db.commit()
+    if user_id is not None:
+        supplier_id_cache.invalidate(user_id)
+    # Заказы поставщика закешированы вместе с его user_id
+    participant_service.invalidate_all(db)
     return True
 
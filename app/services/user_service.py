@@ -1,9 +1,22 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
 from typing import Optional
 from app.models.user import User
 from app.schemas.user import UserCreate
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.pagination import CursorKey, keyset_condition
 from app.core.security import get_password_hash, verify_password
 
+# Кеш аутентифицированных пользователей по id (uid JWT токена). Ключ - не
+# username: username меняется и после переименования может достаться другому
+# пользователю, а сброс кеша действует только в текущем процессе.
+# Хранятся значения колонок, а не ORM объекты, чтобы не делить их между сессиями
+principal_cache = TTLCache(
+    max_size=settings.AUTH_CACHE_MAX_SIZE if settings.AUTH_CACHE_TTL_SECONDS > 0 else 0,
+    ttl_seconds=settings.AUTH_CACHE_TTL_SECONDS
+)
+
 
 def get_user(db: Session, user_id: int) -> Optional[User]:
     """Получить пользователя по ID"""
@@ -20,14 +33,63 @@ def get_user_by_username(db: Session, username: str) -> Optional[User]:
     return db.query(User).filter(User.username == username).first()
 
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
-    """Получить список пользователей"""
-    return db.query(User).offset(skip).limit(limit).all()
+def get_principal(db: Session, user_id: Optional[int], username: str) -> Optional[User]:
+    """
+    Получить аутентифицированного пользователя по uid и username из токена
+
+    Пользователь берется из кеша по id, username токена должен совпадать с
+    текущим: токен, выданный до переименования, перестает действовать. Снимок
+    с другим username (переименование в другом процессе) перечитывается из БД.
+    Токены без uid (выданные до его появления) проверяются по username без кеша.
+    """
+    if user_id is None:
+        return get_user_by_username(db, username)
+
+    snapshot = principal_cache.get(user_id)
+    if snapshot is None or snapshot["username"] != username:
+        user = db.get(User, user_id)
+        if user is None:
+            principal_cache.invalidate(user_id)
+            return None
+        principal_cache.set(user_id, {
+            attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs
+        })
+        return user if user.username == username else None
+    
+    # Восстанавливаем пользователя из снимка и присоединяем к сессии без запроса в БД
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+
+def invalidate_principal(user_id: int) -> None:
+    """Сбросить закешированного пользователя (после изменения его данных)"""
+    principal_cache.invalidate(user_id)
+
 
+def get_users(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[CursorKey] = None
+):
+    """Получить список пользователей (по курсору или, устаревший вариант, по смещению)"""
+    query = db.query(User).order_by(User.created_at.asc(), User.id.asc())
+    if cursor is not None:
+        query = query.filter(keyset_condition(User.created_at, User.id, cursor))
+    else:
+        query = query.offset(skip)
+    return query.limit(limit).all()
 
-def create_user(db: Session, user: UserCreate) -> User:
-    """Создать нового пользователя"""
-    # Проверка на существование
+
+def validate_new_user(db: Session, user: UserCreate) -> None:
+    """
+    Проверить данные регистрации до хеширования пароля (ValueError при ошибке)
+
+    Дешевые проверки идут раньше дорогого хеша: повторная регистрация не
+    занимает слот пула хеширования. Окончательно уникальность гарантируют
+    ограничения БД (create_user).
+    """
     if user.email and get_user_by_email(db, user.email):
         raise ValueError("Пользователь с таким email уже существует")
     if get_user_by_username(db, user.username):
@@ -37,8 +99,15 @@ def create_user(db: Session, user: UserCreate) -> User:
     from app.models.user import UserRole
     if user.role == UserRole.SUPPLIER and not user.email:
         raise ValueError("Email обязателен для поставщиков")
+
+
+def create_user(db: Session, user: UserCreate, password_hash: Optional[str] = None) -> User:
+    """Создать нового пользователя (password_hash - заранее вычисленный хеш пароля)"""
+    from sqlalchemy.exc import IntegrityError
+    from app.models.user import UserRole
     
-    hashed_password = get_password_hash(user.password)
+    validate_new_user(db, user)
+    hashed_password = password_hash or get_password_hash(user.password)
     db_user = User(
         email=user.email,
         username=user.username,
@@ -46,23 +115,23 @@ def create_user(db: Session, user: UserCreate) -> User:
         role=user.role,
         organization_name=user.organization_name,
         inn=user.inn,
-        email_notifications=user.email_notifications if hasattr(user, 'email_notifications') else True
+        email_notifications=user.email_notifications if hasattr(user, 'email_notifications') else True,
+        email_delivery_mode=user.email_delivery_mode
     )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    
-    # Если поставщик, создаем запись в suppliers
-    if user.role == UserRole.SUPPLIER:
-        from app.models.supplier import Supplier
-        supplier = Supplier(
-            name=user.organization_name or user.username,
-            user_id=db_user.id,
-            contact_info=user.email
-        )
-        db.add(supplier)
+    try:
+        db.add(db_user)
+        db.flush()
+        
+        # Если поставщик, создаем запись в suppliers в той же транзакции
+        if user.role == UserRole.SUPPLIER:
+            from app.services import supplier_service
+            supplier_service.ensure_supplier_for_user(db, db_user)
+        
         db.commit()
-        db.refresh(supplier)
+    except IntegrityError:
+        # Параллельная регистрация с тем же username или email прошла проверку раньше
+        db.rollback()
+        raise ValueError("Пользователь с таким username или email уже существует")
     
     return db_user
 
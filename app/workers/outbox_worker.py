@@ -0,0 +1,327 @@
+"""
+Воркер outbox email уведомлений
+
+Запуск: python -m app.workers.outbox_worker
+
+Забирает пачки уведомлений из notification_outbox (FOR UPDATE SKIP LOCKED,
+поэтому можно запускать несколько экземпляров), отправляет их с ограничением
+параллельности и фиксирует результат: отправлено, повтор с задержкой или DEAD.
+
+Уведомления получателей с режимом доставки "сводка" копятся в outbox;
+раз в DIGEST_POLL_INTERVAL_SECONDS воркер собирает уведомления за
+завершившийся час или день и отправляет каждому получателю одно письмо.
+"""
+import asyncio
+import logging
+import signal
+import time
+from typing import Callable, Dict, List, Optional, Union
+from sqlalchemy.orm import Session, joinedload
+from app.core.config import settings
+from app.core import metrics
+from app.core.database import AsyncSessionLocal, async_engine
+from app.models.order import Order
+from app.models.user import EmailDeliveryMode
+from app.services import email_service, metrics_service, notification_service
+
+logger = logging.getLogger(__name__)
+
+
+def _load_order_payloads(db: Session, order_ids) -> Dict[int, dict]:
+    """Данные заказов для писем (одним запросом вместе с покупателями)"""
+    orders = db.query(Order).options(
+        joinedload(Order.buyer)
+    ).filter(Order.id.in_(order_ids)).all()
+    
+    return {
+        order.id: {
+            "order_title": order.title,
+            "product_name": order.product_name,
+            "delivery_volume": order.delivery_volume,
+            "purchase_budget": order.purchase_budget,
+            "deadline_at": order.deadline_at.isoformat(),
+            "product_description": order.product_description,
+            "buyer_name": (
+                order.buyer.organization_name or order.buyer.username
+            ) if order.buyer else "Неизвестно",
+        }
+        for order in orders
+    }
+
+
+DIGEST_PERIODS = {
+    EmailDeliveryMode.HOURLY: "за час",
+    EmailDeliveryMode.DAILY: "за день",
+}
+
+
+def _render(
+    render: Callable[..., Optional[email_service.PreparedEmail]],
+    *args,
+    **kwargs
+) -> Union[email_service.PreparedEmail, str, None]:
+    """
+    Отрисовать письмо; при ошибке - ее текст
+
+    Ошибка отрисовки (например, недопустимые данные заказа) относится только
+    к этому письму и фиксируется как неудачная попытка его уведомлений.
+    """
+    try:
+        return render(*args, **kwargs)
+    except Exception as e:
+        logger.exception("Не удалось подготовить письмо")
+        return f"Не удалось подготовить письмо: {_error_text(e)}"
+
+
+async def _deliver(
+    recipient_email: str,
+    prepared: Union[email_service.PreparedEmail, str, None],
+    semaphore: asyncio.Semaphore
+) -> Optional[str]:
+    """
+    Отправить одно письмо; возвращает текст ошибки или None при успехе
+
+    prepared - письмо, текст ошибки его отрисовки (_render) или None, если
+    заказ не найден.
+    """
+    if prepared is None:
+        return "Заказ не найден"
+    if isinstance(prepared, str):
+        return prepared
+    
+    async with semaphore:
+        try:
+            await email_service.send_prepared(prepared, recipient_email, raise_on_error=True)
+            return None
+        except Exception as e:
+            return _error_text(e)
+
+
+def _error_text(error: Exception) -> str:
+    return str(error) or error.__class__.__name__
+
+
+async def _wait(stop_event: asyncio.Event, timeout: float) -> None:
+    """Пауза, прерываемая сигналом остановки"""
+    try:
+        await asyncio.wait_for(stop_event.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+
+
+class _Lease:
+    """Аренда забранных записей: id и текущее значение locked_at"""
+
+    def __init__(self, entry_ids: List[int], locked_at):
+        self.entry_ids = entry_ids
+        self.locked_at = locked_at
+
+
+async def _renew_lease(lease: _Lease, done: asyncio.Event) -> None:
+    """
+    Продлевать аренду, пока идет отправка
+
+    С ограничением скорости SMTP пачка может отправляться дольше
+    OUTBOX_LEASE_SECONDS, и без продления ее забрал бы другой воркер и
+    разослал письма повторно. Продление выполняется в отдельной короткой
+    сессии и не прерывается на середине, чтобы lease.locked_at совпадал
+    с базой.
+    """
+    while True:
+        await _wait(done, settings.OUTBOX_LEASE_SECONDS / 3)
+        if done.is_set():
+            return
+        try:
+            async with AsyncSessionLocal() as db:
+                lease.locked_at = await db.run_sync(
+                    notification_service.renew_lease, lease.entry_ids, lease.locked_at
+                )
+        except Exception:
+            logger.exception("Не удалось продлить аренду уведомлений outbox")
+
+
+async def _send_all(lease: _Lease, sends) -> List[Optional[str]]:
+    """Отправить письма, продлевая аренду записей до окончания отправки"""
+    done = asyncio.Event()
+    renewal = asyncio.create_task(_renew_lease(lease, done))
+    try:
+        return await asyncio.gather(*sends)
+    finally:
+        done.set()
+        await renewal
+
+
+async def _record_results(lease: _Lease, entry_groups: List[List[dict]], errors: List[Optional[str]]) -> List[int]:
+    """
+    Зафиксировать результаты отправки писем (письмо покрывает группу уведомлений)
+
+    Результат записывается только в записи, аренда которых еще наша.
+    """
+    sent_ids = []
+    async with AsyncSessionLocal() as db:
+        for group, error in zip(entry_groups, errors):
+            for entry in group:
+                if error is None:
+                    sent_ids.append(entry["id"])
+                else:
+                    await db.run_sync(
+                        notification_service.mark_failed, entry["id"], entry["attempts"], error, lease.locked_at
+                    )
+        await db.run_sync(notification_service.mark_sent, sent_ids, lease.locked_at)
+    return sent_ids
+
+
+async def _send_batch(lease: _Lease, entries: List[dict]) -> List[Optional[str]]:
+    """Загрузить заказы и отправить письма пачки; ошибки по записям"""
+    # Сессия закрывается до отправки: иначе транзакция чтения заказов простаивала
+    # бы все время отправки писем, держала соединение и обрывалась бы по
+    # DB_IDLE_IN_TRANSACTION_TIMEOUT_MS
+    async with AsyncSessionLocal() as db:
+        payloads = await db.run_sync(_load_order_payloads, {entry["order_id"] for entry in entries})
+    
+    # Письмо отрисовывается один раз на заказ и рассылается всем его получателям
+    prepared = {
+        order_id: _render(email_service.render_order_notification, **payload)
+        for order_id, payload in payloads.items()
+    }
+    semaphore = asyncio.Semaphore(settings.OUTBOX_SEND_CONCURRENCY)
+    return await _send_all(lease, [
+        _deliver(entry["recipient_email"], prepared.get(entry["order_id"]), semaphore)
+        for entry in entries
+    ])
+
+
+async def process_batch() -> int:
+    """Обработать одну пачку уведомлений; возвращает число забранных записей"""
+    async with AsyncSessionLocal() as db:
+        entries = await db.run_sync(notification_service.claim_batch, settings.OUTBOX_BATCH_SIZE)
+    if not entries:
+        return 0
+    
+    # Все записи пачки забраны с одним locked_at
+    lease = _Lease([entry["id"] for entry in entries], entries[0]["locked_at"])
+    try:
+        errors = await _send_batch(lease, entries)
+    except Exception as e:
+        # Попытка засчитывается, и повторяющаяся ошибка приводит записи в DEAD;
+        # истечение аренды остается только для упавшего воркера
+        logger.exception("Ошибка при отправке пачки outbox")
+        errors = [_error_text(e)] * len(entries)
+    
+    sent_ids = await _record_results(lease, [[entry] for entry in entries], errors)
+    stats = email_service.get_stats()
+    logger.info(
+        f"Outbox: отправлено {len(sent_ids)} из {len(entries)}; "
+        f"очередь SMTP {stats.get('queue_depth', 0)}, "
+        f"средняя отправка {stats.get('send_latency_avg_seconds', 0.0) * 1000:.0f} мс"
+    )
+    return len(entries)
+
+
+def _render_digest(group: dict, payloads: Dict[int, dict], period: str) -> Optional[email_service.PreparedEmail]:
+    """Сводка для получателя: его заказы от новых к старым"""
+    orders = [
+        payloads[entry["order_id"]]
+        for entry in reversed(group["entries"])
+        if entry["order_id"] in payloads
+    ]
+    if not orders:
+        return None
+    return email_service.render_order_digest(orders, period)
+
+
+async def _send_digests(lease: _Lease, groups: List[dict], mode: EmailDeliveryMode) -> List[Optional[str]]:
+    """Загрузить заказы и отправить сводки; ошибки по получателям"""
+    # Как и в _send_batch, сессия закрывается до отправки
+    async with AsyncSessionLocal() as db:
+        order_ids = {entry["order_id"] for group in groups for entry in group["entries"]}
+        payloads = await db.run_sync(_load_order_payloads, order_ids)
+    
+    semaphore = asyncio.Semaphore(settings.OUTBOX_SEND_CONCURRENCY)
+    return await _send_all(lease, [
+        _deliver(group["recipient_email"], _render(_render_digest, group, payloads, DIGEST_PERIODS[mode]), semaphore)
+        for group in groups
+    ])
+
+
+async def process_digests(mode: EmailDeliveryMode) -> int:
+    """Отправить готовые сводки одного режима; возвращает число получателей"""
+    async with AsyncSessionLocal() as db:
+        groups = await db.run_sync(
+            notification_service.claim_digest_batch, mode, settings.DIGEST_BATCH_SIZE
+        )
+    if not groups:
+        return 0
+    
+    lease = _Lease(
+        [entry["id"] for group in groups for entry in group["entries"]],
+        groups[0]["entries"][0]["locked_at"]
+    )
+    try:
+        errors = await _send_digests(lease, groups, mode)
+    except Exception as e:
+        # Как и в process_batch: попытка засчитывается всем забранным записям
+        logger.exception(f"Ошибка при отправке сводок {mode.value}")
+        errors = [_error_text(e)] * len(groups)
+    
+    sent_ids = await _record_results(lease, [group["entries"] for group in groups], errors)
+    logger.info(
+        f"Outbox: сводок {mode.value} отправлено {errors.count(None)} из {len(groups)} "
+        f"({len(sent_ids)} уведомлений)"
+    )
+    return len(groups)
+
+
+async def run_worker(stop_event: asyncio.Event) -> None:
+    """Основной цикл воркера"""
+    logger.info("Воркер outbox запущен")
+    digests_checked_at = None
+    while not stop_event.is_set():
+        if not email_service.is_configured():
+            # Без SMTP уведомления остаются в outbox до настройки
+            logger.warning("SMTP не настроен, уведомления остаются в outbox")
+            await _wait(stop_event, settings.OUTBOX_POLL_INTERVAL_SECONDS * 30)
+            continue
+        
+        try:
+            processed = await process_batch()
+        except Exception:
+            logger.exception("Ошибка при обработке outbox")
+            processed = 0
+        
+        now = time.monotonic()
+        if digests_checked_at is None or now - digests_checked_at >= settings.DIGEST_POLL_INTERVAL_SECONDS:
+            digests_checked_at = now
+            for mode in DIGEST_PERIODS:
+                try:
+                    # Сводки отправляются пачками, пока готовые не закончатся
+                    while not stop_event.is_set() and await process_digests(mode) >= settings.DIGEST_BATCH_SIZE:
+                        pass
+                except Exception:
+                    logger.exception(f"Ошибка при отправке сводок {mode.value}")
+        
+        # Полная пачка - сразу берем следующую, иначе ждем новых уведомлений
+        if processed < settings.OUTBOX_BATCH_SIZE:
+            await _wait(stop_event, settings.OUTBOX_POLL_INTERVAL_SECONDS)
+    logger.info("Воркер outbox остановлен")
+
+
+async def _main() -> None:
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+    # Статистика отправки попадает в GET /metrics API через METRICS_DIR
+    metrics_service.register_worker()
+    await metrics.start()
+    try:
+        await run_worker(stop_event)
+    finally:
+        await metrics.stop()
+        await email_service.close_pool()
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(_main())
@@ -0,0 +1,63 @@
+"""
+Бенчмарк подготовки писем о новом заказе при рассылке 5000 поставщикам
+
+Сравнивает отрисовку и MIME кодирование письма заново для каждого получателя
+с однократной отрисовкой (render_order_notification) и дописыванием
+только заголовков получателя (PreparedEmail.for_recipient).
+
+Запуск: python scripts/bench_email_render.py
+"""
+import sys
+import time
+from pathlib import Path
+
+# Добавляем путь к корню проекта
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services import email_service
+
+RECIPIENTS = 5000
+
+ORDER = dict(
+    order_title="Поставка муки высшего сорта",
+    product_name="Мука пшеничная",
+    delivery_volume="20 тонн",
+    purchase_budget=1250000.0,
+    deadline_at="2026-12-01T12:00:00Z",
+    product_description="Мука пшеничная высшего сорта, фасовка по 50 кг. " * 10,
+    buyer_name="ООО Хлебозавод"
+)
+
+
+def render_per_recipient(recipients) -> int:
+    """Прежний способ: письмо отрисовывается заново для каждого получателя"""
+    total = 0
+    for recipient in recipients:
+        prepared = email_service.render_order_notification(**ORDER)
+        total += len(prepared.for_recipient(recipient))
+    return total
+
+
+def render_once(recipients) -> int:
+    """Письмо отрисовывается один раз, на получателя - только заголовки"""
+    prepared = email_service.render_order_notification(**ORDER)
+    total = 0
+    for recipient in recipients:
+        total += len(prepared.for_recipient(recipient))
+    return total
+
+
+def main():
+    recipients = [f"supplier{i}@example.com" for i in range(RECIPIENTS)]
+    for label, render in [
+        ("отрисовка на получателя", render_per_recipient),
+        ("отрисовка на заказ", render_once),
+    ]:
+        start = time.perf_counter()
+        total_bytes = render(recipients)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"{label:<26} {elapsed_ms:>9.1f} мс  {total_bytes / RECIPIENTS:>7.0f} байт/письмо")
+
+
+if __name__ == "__main__":
+    main()
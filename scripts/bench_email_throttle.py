@@ -0,0 +1,103 @@
+"""
+Проверка планировщика отправки при лимите провайдера
+
+Локальный SMTP сервер-заглушка (pip install aiosmtpd) принимает не больше
+SERVER_LIMIT писем в секунду и отвечает 421 сверх лимита. Приложение настроено
+на большую скорость, поэтому планировщик должен снизить ее по ответам 421
+и доставить все письма без потерь.
+
+Запуск: python scripts/bench_email_throttle.py
+"""
+import asyncio
+import sys
+import time
+from collections import deque
+from pathlib import Path
+
+# Добавляем путь к корню проекта
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+from app.core.config import settings
+from app.services import email_service
+
+HOST = "127.0.0.1"
+PORT = 8026
+RECIPIENTS = 300
+SERVER_LIMIT = 50  # писем в секунду
+CONCURRENCY = 10
+
+
+class ThrottlingHandler:
+    """Заглушка SMTP сервера с лимитом писем в секунду"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.accepted = deque()
+        self.received = 0
+        self.rejected = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        now = time.monotonic()
+        while self.accepted and self.accepted[0] <= now - 1:
+            self.accepted.popleft()
+        if len(self.accepted) >= self.limit:
+            self.rejected += 1
+            return "421 4.7.0 Try again later"
+        self.accepted.append(now)
+        self.received += 1
+        return "250 OK"
+
+
+def configure_settings() -> None:
+    settings.SMTP_HOST = HOST
+    settings.SMTP_PORT = PORT
+    settings.SMTP_USE_TLS = False
+    settings.SMTP_USER = "bench"
+    settings.SMTP_PASSWORD = "bench"
+    settings.SMTP_POOL_SIZE = CONCURRENCY
+    settings.SMTP_RATE_PER_SECOND = SERVER_LIMIT * 4
+    settings.SMTP_RATE_PER_MINUTE = 0
+    settings.SMTP_BACKOFF_BASE_SECONDS = 0.5
+    settings.SMTP_BACKOFF_MAX_SECONDS = 4
+
+
+async def main():
+    configure_settings()
+    handler = ThrottlingHandler(SERVER_LIMIT)
+    controller = Controller(
+        handler,
+        hostname=HOST,
+        port=PORT,
+        auth_require_tls=False,
+        authenticator=lambda *args: AuthResult(success=True)
+    )
+    controller.start()
+    try:
+        prepared = email_service.PreparedEmail("Новый заказ", "<p>Новый заказ</p>")
+        semaphore = asyncio.Semaphore(CONCURRENCY)
+
+        async def send(recipient: str) -> bool:
+            async with semaphore:
+                return await email_service.send_prepared(prepared, recipient)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*[
+            send(f"supplier{i}@example.com") for i in range(RECIPIENTS)
+        ])
+        elapsed = time.perf_counter() - start
+        stats = email_service.get_stats()
+        await email_service.close_pool()
+    finally:
+        controller.stop()
+
+    print(f"Доставлено: {sum(results)} из {RECIPIENTS} за {elapsed:.1f} с ({RECIPIENTS / elapsed:.0f} писем/с)")
+    print(f"Ответов 421 от сервера: {handler.rejected}, повторов: {stats['retries']}, потеряно: {stats['failed']}")
+    print(f"Скорость планировщика в конце: {stats['rate_per_second']:.1f} писем/с (лимит сервера {SERVER_LIMIT})")
+    print(f"Задержка отправки: средняя {stats['send_latency_avg_seconds'] * 1000:.1f} мс, "
+          f"p95 {stats['send_latency_p95_seconds'] * 1000:.1f} мс")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
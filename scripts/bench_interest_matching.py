@@ -0,0 +1,125 @@
+"""
+Бенчмарк подбора получателей уведомления о заказе по подпискам поставщиков
+
+Засевает десятки тысяч подписок и измеряет время выборки получателей
+свободного заказа (тот же SELECT, что в INSERT ... SELECT outbox).
+Использует отдельную SQLite базу в памяти.
+
+Запуск: python scripts/bench_interest_matching.py
+"""
+import random
+import sys
+import time
+from pathlib import Path
+
+# Добавляем путь к корню проекта
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine, select, insert
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.models import User, SupplierInterest, SupplierInterestTerm
+from app.models.interest import InterestKind
+from app.models.user import UserRole
+from app.services import interest_service
+
+SUPPLIERS = 10000
+INTERESTS_PER_SUPPLIER = 4
+REPEATS = 200
+
+WORDS = [
+    "мука", "сахар", "кирпич", "цемент", "арматура", "доска", "брус", "краска",
+    "кабель", "провод", "труба", "фитинг", "плитка", "ламинат", "обои", "гвозди",
+    "саморезы", "перчатки", "упаковка", "коробка", "пленка", "поддон", "масло",
+    "зерно", "крупа", "чай", "кофе", "ткань", "нитки", "пряжа", "бумага", "картон",
+]
+# Редкие слова: большинство подписок не совпадают с типичным заказом
+WORDS += [f"артикул{i}" for i in range(5000)]
+
+ORDER = dict(
+    title="Поставка муки высшего сорта",
+    product_name="Мука пшеничная",
+    product_description="Мука пшеничная высшего сорта в мешках по 50 кг, поддоны, упаковка в пленку"
+)
+
+engine = create_engine("sqlite://")
+Base.metadata.create_all(bind=engine)
+SessionBench = sessionmaker(bind=engine)
+
+
+def seed(db) -> None:
+    """Поставщики с подписками, термины пишутся пачкой"""
+    random.seed(42)
+    db.execute(insert(User), [
+        {
+            "username": f"supplier{i}",
+            "email": f"supplier{i}@example.com",
+            "password_hash": "x",
+            "role": UserRole.SUPPLIER,
+            "email_notifications": True,
+        }
+        for i in range(SUPPLIERS)
+    ])
+    user_ids = [row[0] for row in db.execute(select(User.id))]
+    interests = []
+    for user_id in user_ids[:int(SUPPLIERS * 0.9)]:  # 10% поставщиков без подписок
+        for word in random.sample(WORDS, INTERESTS_PER_SUPPLIER):
+            interests.append((user_id, word))
+    db.execute(insert(SupplierInterest), [
+        {"user_id": user_id, "kind": InterestKind.KEYWORD.value, "value": word}
+        for user_id, word in interests
+    ])
+    rows = db.execute(select(SupplierInterest.id, SupplierInterest.user_id, SupplierInterest.value)).all()
+    db.execute(insert(SupplierInterestTerm), [
+        {"interest_id": interest_id, "user_id": user_id, "term": term}
+        for interest_id, user_id, value in rows
+        for term in interest_service.extract_terms(value)
+    ])
+    db.commit()
+    return len(rows)
+
+
+def measure(db, query) -> tuple:
+    """Среднее время выполнения запроса (мс) и число строк"""
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        rows = db.execute(query()).all()
+    return (time.perf_counter() - start) * 1000 / REPEATS, len(rows)
+
+
+def main():
+    db = SessionBench()
+    subscriptions = seed(db)
+
+    def terms():
+        return interest_service.extract_terms(
+            ORDER["title"], ORDER["product_name"], ORDER["product_description"]
+        )
+
+    suppliers = select(User.id).where(
+        User.role == UserRole.SUPPLIER,
+        User.email_notifications == True
+    )
+    cases = [
+        ("все поставщики (как раньше)", lambda: suppliers),
+        (
+            "совпадения по индексу",
+            lambda: select(SupplierInterestTerm.user_id).where(
+                SupplierInterestTerm.term.in_(terms())
+            ).distinct()
+        ),
+        (
+            "получатели заказа",
+            lambda: suppliers.where(interest_service.recipient_filter(User.id, terms()))
+        ),
+    ]
+
+    print(f"Подписок: {subscriptions}, поставщиков: {SUPPLIERS}")
+    for label, query in cases:
+        elapsed_ms, count = measure(db, query)
+        print(f"{label:<28} {elapsed_ms:>8.2f} мс  {count:>6} строк")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
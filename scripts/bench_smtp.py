@@ -0,0 +1,104 @@
+"""
+Бенчмарк отправки email: отдельное SMTP соединение на письмо против пула сессий
+
+Поднимает локальный SMTP сервер-заглушку на aiosmtpd (pip install aiosmtpd)
+и измеряет, сколько писем в секунду уходит при рассылке одного заказа.
+
+Запуск: python scripts/bench_smtp.py
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Добавляем путь к корню проекта
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import aiosmtplib
+from email.mime.text import MIMEText
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+from app.core.config import settings
+from app.services import email_service
+
+HOST = "127.0.0.1"
+PORT = 8025
+RECIPIENTS = 500
+CONCURRENCY = 10
+
+
+class CountingHandler:
+    """Заглушка SMTP сервера: принимает и считает письма"""
+
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+def configure_settings() -> None:
+    settings.SMTP_HOST = HOST
+    settings.SMTP_PORT = PORT
+    settings.SMTP_USE_TLS = False
+    settings.SMTP_USER = "bench"
+    settings.SMTP_PASSWORD = "bench"
+    settings.SMTP_POOL_SIZE = CONCURRENCY
+    # Меряем пропускную способность соединений, а не лимиты провайдера
+    settings.SMTP_RATE_PER_SECOND = 0
+    settings.SMTP_RATE_PER_MINUTE = 0
+
+
+async def send_per_connection(recipient: str, semaphore: asyncio.Semaphore) -> None:
+    """Прежний способ: новое соединение и авторизация на каждое письмо"""
+    message = MIMEText("Новый заказ", "plain", "utf-8")
+    message["Subject"] = "Новый заказ"
+    message["From"] = settings.SMTP_FROM_EMAIL
+    message["To"] = recipient
+    async with semaphore:
+        await aiosmtplib.send(
+            message,
+            hostname=HOST,
+            port=PORT,
+            username=settings.SMTP_USER,
+            password=settings.SMTP_PASSWORD,
+            start_tls=False
+        )
+
+
+async def run(label: str, send) -> None:
+    recipients = [f"supplier{i}@example.com" for i in range(RECIPIENTS)]
+    start = time.perf_counter()
+    await asyncio.gather(*[send(recipient) for recipient in recipients])
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {RECIPIENTS / elapsed:>8.0f} писем/с")
+
+
+async def main():
+    configure_settings()
+    handler = CountingHandler()
+    controller = Controller(
+        handler,
+        hostname=HOST,
+        port=PORT,
+        auth_require_tls=False,
+        authenticator=lambda *args: AuthResult(success=True)
+    )
+    controller.start()
+    try:
+        semaphore = asyncio.Semaphore(CONCURRENCY)
+        await run("соединение на письмо", lambda r: send_per_connection(r, semaphore))
+        await run(
+            "пул SMTP сессий",
+            lambda r: email_service.send_email(r, "Новый заказ", "<p>Новый заказ</p>", raise_on_error=True)
+        )
+        print(f"SMTP сессий открыто пулом: {email_service.get_pool().connections_opened}")
+        await email_service.close_pool()
+    finally:
+        controller.stop()
+    print(f"Принято сервером: {handler.received}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
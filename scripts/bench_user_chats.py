@@ -0,0 +1,107 @@
+"""
+Бенчмарк message_service.get_user_chats
+
+Показывает, что время построения списка чатов пользователя не зависит
+от количества чужих переписок в базе. Использует отдельную SQLite базу в памяти.
+
+Запуск: python scripts/bench_user_chats.py
+"""
+import sys
+import time
+from pathlib import Path
+from datetime import datetime, timedelta
+
+# Добавляем путь к корню проекта
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.models import User, Supplier, Order, Message, Conversation
+from app.models.user import UserRole
+from app.services import message_service
+
+USER_CHATS = 20
+MESSAGES_PER_CHAT = 10
+UNRELATED_STEPS = [0, 500, 2000, 8000]
+REPEATS = 20
+
+engine = create_engine("sqlite://")
+Base.metadata.create_all(bind=engine)
+SessionBench = sessionmaker(bind=engine)
+
+
+def seed_chats(db, buyer: User, supplier_user: User, supplier: Supplier, count: int) -> None:
+    """Создать count заказов между покупателем и поставщиком с перепиской"""
+    now = datetime.utcnow()
+    for i in range(count):
+        order = Order(
+            title=f"Заказ {buyer.username} #{i}",
+            product_name="Товар",
+            buyer_id=buyer.id,
+            supplier_id=supplier.id,
+            deadline_at=now + timedelta(days=30),
+            cost=1000.0
+        )
+        db.add(order)
+        db.flush()
+        messages = [
+            Message(
+                order_id=order.id,
+                sender_id=buyer.id if j % 2 == 0 else supplier_user.id,
+                receiver_id=supplier_user.id if j % 2 == 0 else buyer.id,
+                content=f"Сообщение {j}",
+                created_at=now + timedelta(seconds=j)
+            )
+            for j in range(MESSAGES_PER_CHAT)
+        ]
+        db.add_all(messages)
+        db.flush()
+        db.add(Conversation(
+            order_id=order.id,
+            last_message_id=messages[-1].id,
+            last_message_at=messages[-1].created_at,
+            last_message_preview=messages[-1].content,
+            buyer_unread_count=MESSAGES_PER_CHAT // 2,
+            supplier_unread_count=MESSAGES_PER_CHAT // 2
+        ))
+    db.commit()
+
+
+def create_pair(db, suffix: str):
+    """Создать покупателя и поставщика"""
+    buyer = User(username=f"buyer_{suffix}", password_hash="x", role=UserRole.BUYER)
+    supplier_user = User(username=f"supplier_{suffix}", password_hash="x", role=UserRole.SUPPLIER)
+    db.add_all([buyer, supplier_user])
+    db.flush()
+    supplier = Supplier(name=f"Поставщик {suffix}", user_id=supplier_user.id)
+    db.add(supplier)
+    db.commit()
+    return buyer, supplier_user, supplier
+
+
+def main():
+    db = SessionBench()
+    buyer, supplier_user, supplier = create_pair(db, "main")
+    seed_chats(db, buyer, supplier_user, supplier, USER_CHATS)
+
+    seeded = 0
+    print(f"{'чужих чатов':>12} | {'мс на запрос':>12}")
+    for target in UNRELATED_STEPS:
+        while seeded < target:
+            other_buyer, other_supplier_user, other_supplier = create_pair(db, str(seeded))
+            seed_chats(db, other_buyer, other_supplier_user, other_supplier, 100)
+            seeded += 100
+
+        start = time.perf_counter()
+        for _ in range(REPEATS):
+            chats = message_service.get_user_chats(db, buyer.id)
+        elapsed_ms = (time.perf_counter() - start) * 1000 / REPEATS
+        assert len(chats) == USER_CHATS
+        print(f"{seeded:>12} | {elapsed_ms:>12.2f}")
+
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
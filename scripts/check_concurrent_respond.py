@@ -0,0 +1,102 @@
+"""
+Проверка одновременных откликов на один заказ
+
+POST /orders/{id}/respond закрепляет заказ одним UPDATE ... WHERE
+supplier_id IS NULL RETURNING. Скрипт регистрирует RESPONDERS поставщиков,
+одновременно (через барьер) отправляет их отклики на один заказ через
+TestClient и проверяет, что ровно один получил 200, остальные - 409, а в
+базе у заказа поставщик победителя. Повторяется ROUNDS раз на новых заказах.
+
+По умолчанию используется временная SQLite база. Для проверки на PostgreSQL
+задайте DATABASE_URL отдельной (тестовой) базы - скрипт создаст в ней
+пользователей и заказы.
+
+Запуск: python scripts/check_concurrent_respond.py
+"""
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Отдельная база и без автоприменения миграций - до импорта приложения
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/concurrent_respond.db"
+os.environ["MIGRATIONS_APPLIED"] = "1"
+
+# Добавляем путь к корню проекта
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.testclient import TestClient
+from app.core.database import Base, SessionLocal, engine
+from app.main import app
+from app.models import Order, Supplier
+
+RESPONDERS = 16
+ROUNDS = 5
+
+
+def main() -> int:
+    Base.metadata.create_all(bind=engine)
+    suffix = os.urandom(3).hex()
+    failed = False
+    with TestClient(app) as client:
+        def register(username: str, role: str) -> dict:
+            response = client.post("/api/v1/auth/register", json={
+                "username": username, "password": "secret", "role": role,
+                "email": f"{username}@example.com"
+            })
+            if response.status_code >= 400:
+                raise SystemExit(f"Регистрация {username}: HTTP {response.status_code} {response.text}")
+            token = client.post(
+                "/api/v1/auth/login", data={"username": username, "password": "secret"}
+            ).json()["access_token"]
+            return {"Authorization": f"Bearer {token}"}
+
+        buyer = register(f"respond_buyer_{suffix}", "buyer")
+        suppliers = [register(f"respond_supplier_{suffix}_{i}", "supplier") for i in range(RESPONDERS)]
+        supplier_ids = {}
+        with SessionLocal() as db:
+            for headers in suppliers:
+                user_id = client.get("/api/v1/auth/me", headers=headers).json()["id"]
+                supplier_ids[user_id] = db.query(Supplier.id).filter(Supplier.user_id == user_id).scalar()
+
+        for round_number in range(1, ROUNDS + 1):
+            order_id = client.post("/api/v1/orders/", headers=buyer, json={
+                "title": f"Конкурентный отклик {round_number}", "product_name": "кабель",
+                "deadline_at": "2030-01-01T00:00:00", "cost": 100
+            }).json()["id"]
+            barrier = threading.Barrier(RESPONDERS)
+
+            def respond(headers: dict):
+                barrier.wait()
+                return client.post(f"/api/v1/orders/{order_id}/respond", headers=headers)
+
+            with ThreadPoolExecutor(max_workers=RESPONDERS) as executor:
+                responses = list(executor.map(respond, suppliers))
+
+            codes = sorted(response.status_code for response in responses)
+            winners = [response.json() for response in responses if response.status_code == 200]
+            with SessionLocal() as db:
+                stored_supplier_id = db.query(Order.supplier_id).filter(Order.id == order_id).scalar()
+
+            problems = []
+            if codes.count(200) != 1 or codes.count(409) != RESPONDERS - 1:
+                problems.append(f"коды ответов {codes}")
+            if winners and winners[0]["supplier_id"] != stored_supplier_id:
+                problems.append(
+                    f"в ответе поставщик {winners[0]['supplier_id']}, в базе {stored_supplier_id}"
+                )
+            if stored_supplier_id not in supplier_ids.values():
+                problems.append(f"в базе поставщик {stored_supplier_id}")
+            failed = failed or bool(problems)
+            print(
+                f"Раунд {round_number}: {RESPONDERS} откликов, 200: {codes.count(200)}, "
+                f"409: {codes.count(409)}  {'; '.join(problems) if problems else 'ok'}"
+            )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
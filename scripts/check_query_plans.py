@@ -0,0 +1,236 @@
+"""
+Проверка планов горячих запросов: без последовательного чтения orders и messages
+
+Скрипт заполняет базу DATABASE_URL тестовыми заказами и перепиской, прогоняет
+через TestClient ленту заказов (покупателя и поставщика, из снимка и из БД),
+список чатов, страницы переписки и отметки о прочтении (пересчет
+непрочитанных), перехватывает их SQL и выполняет EXPLAIN для каждого запроса.
+Если в плане есть Seq Scan таблицы orders или messages, скрипт завершается
+с ошибкой.
+
+На PostgreSQL перед EXPLAIN выключается enable_seqscan: на маленьких
+тестовых таблицах планировщик и так выбрал бы полный просмотр, а без
+подходящего индекса Seq Scan остается в плане и с этой настройкой. На
+SQLite используется EXPLAIN QUERY PLAN (SCAN таблицы без индекса) -
+приближенная проверка для локального запуска.
+
+Все изменения выполняются в одной транзакции, которая откатывается в конце
+(commit сервисов становятся SAVEPOINT), поэтому скрипт можно запускать на
+базе с примененными миграциями (alembic upgrade head), не оставляя данных.
+
+Запуск: DATABASE_URL=postgresql://... python scripts/check_query_plans.py
+"""
+import json
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Без автоприменения миграций и без LISTEN/NOTIFY - до импорта приложения
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/query_plans.db"
+os.environ["MIGRATIONS_APPLIED"] = "1"
+os.environ.setdefault("REALTIME_BROKER", "memory")
+
+# Добавляем путь к корню проекта
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import Base, engine, get_db
+from app.core.security import create_access_token
+from app.main import app
+from app.models import Message, Order, Supplier, User
+from app.models.order import OrderStatus
+from app.models.user import UserRole
+from app.services import order_feed_service
+
+# Таблицы, которые не должны читаться целиком
+CHECKED_TABLES = {"orders", "messages"}
+# Объем тестовых данных
+ORDERS = 300
+MESSAGES_PER_ORDER = 10
+
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+)$")
+_TABLE_ALIAS = re.compile(r"\b(\w+) AS (\w+)\b")
+
+
+def seed(db: Session):
+    """Покупатели, поставщик, заказы (свободные и взятые) и переписка"""
+    buyers = [
+        User(username=f"plan_buyer_{i}", password_hash="-", role=UserRole.BUYER)
+        for i in range(3)
+    ]
+    supplier_user = User(
+        username="plan_supplier", password_hash="-", role=UserRole.SUPPLIER,
+        email="plan_supplier@example.com"
+    )
+    db.add_all(buyers + [supplier_user])
+    db.flush()
+    supplier = Supplier(name="plan_supplier", user_id=supplier_user.id, contact_info="")
+    db.add(supplier)
+    db.flush()
+
+    now = datetime.utcnow()
+    statuses = list(OrderStatus)
+    orders = []
+    for i in range(ORDERS):
+        buyer = buyers[i % len(buyers)]
+        orders.append(Order(
+            title=f"Заказ {i}", product_name="Товар", buyer_id=buyer.id,
+            supplier_id=supplier.id if i % 3 == 0 else None,
+            status=statuses[i % len(statuses)],
+            deadline_at=now + timedelta(days=30), cost=100,
+            created_at=now - timedelta(minutes=ORDERS - i)
+        ))
+    db.add_all(orders)
+    db.flush()
+
+    messages = []
+    for order in orders:
+        if order.supplier_id is None:
+            continue
+        for j in range(MESSAGES_PER_ORDER):
+            from_buyer = j % 2 == 0
+            messages.append(Message(
+                order_id=order.id,
+                sender_id=order.buyer_id if from_buyer else supplier_user.id,
+                receiver_id=supplier_user.id if from_buyer else order.buyer_id,
+                content=f"Сообщение {j}",
+                created_at=order.created_at + timedelta(seconds=j)
+            ))
+    db.add_all(messages)
+    db.commit()
+    return buyers[0], supplier_user, next(order for order in orders if order.buyer_id == buyers[0].id and order.supplier_id)
+
+
+def _headers(user: User) -> dict:
+    token = create_access_token({"sub": user.username, "uid": user.id})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _plan_seq_scans_postgres(connection, statement, parameters):
+    plan = connection.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    scans = []
+    nodes = [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        if node.get("Node Type") == "Seq Scan" and node.get("Relation Name") in CHECKED_TABLES:
+            scans.append(node["Relation Name"])
+        nodes.extend(node.get("Plans", []))
+    return scans
+
+
+def _plan_seq_scans_sqlite(connection, statement, parameters):
+    # SQLite называет в плане псевдоним таблицы (orders_1), а не ее имя
+    tables = {alias: table for table, alias in _TABLE_ALIAS.findall(statement)}
+    scans = []
+    for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters):
+        match = _SQLITE_SCAN.match(row[-1])
+        table = match and tables.get(match.group(1), match.group(1))
+        if table in CHECKED_TABLES:
+            scans.append(table)
+    return scans
+
+
+def main() -> int:
+    connection = engine.connect()
+    transaction = connection.begin()
+    postgres = connection.dialect.name == "postgresql"
+    if postgres:
+        connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    else:
+        Base.metadata.create_all(bind=connection)
+    db = Session(bind=connection, join_transaction_mode="create_savepoint", expire_on_commit=False)
+
+    def override_get_db():
+        yield db
+
+    captured = []
+
+    @event.listens_for(connection, "before_cursor_execute")
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(("SELECT", "WITH", "UPDATE", "DELETE")):
+            captured.append((statement, parameters))
+
+    failed = False
+    try:
+        buyer, supplier, chat_order = seed(db)
+        app.dependency_overrides[get_db] = override_get_db
+        feed_ttl = settings.ORDER_FEED_TTL_SECONDS
+        with TestClient(app) as client:
+            HB, HS = _headers(buyer), _headers(supplier)
+            last_message_id = db.query(Message.id).filter(
+                Message.order_id == chat_order.id, Message.receiver_id == supplier.id
+            ).order_by(Message.id.desc()).limit(1).scalar()
+
+            def supplier_feed_from_db():
+                settings.ORDER_FEED_TTL_SECONDS = 0
+                try:
+                    return client.get("/api/v1/orders/?limit=20", headers=HS)
+                finally:
+                    settings.ORDER_FEED_TTL_SECONDS = feed_ttl
+
+            def supplier_feed_snapshot():
+                order_feed_service.invalidate()
+                return client.get("/api/v1/orders/?limit=20", headers=HS)
+
+            checks = [
+                ("лента покупателя", lambda: client.get("/api/v1/orders/?limit=20", headers=HB)),
+                ("лента покупателя по статусу", lambda: client.get(
+                    f"/api/v1/orders/?limit=20&status={OrderStatus.IN_PROGRESS.value}", headers=HB
+                )),
+                ("лента поставщика из БД", supplier_feed_from_db),
+                ("лента поставщика из снимка", supplier_feed_snapshot),
+                ("список чатов", lambda: client.get("/api/v1/messages/chats", headers=HS)),
+                ("страница переписки", lambda: client.get(
+                    f"/api/v1/orders/{chat_order.id}/messages?limit=5", headers=HS
+                )),
+                ("последние сообщения", lambda: client.get(
+                    f"/api/v1/orders/{chat_order.id}/messages?latest=true&limit=5", headers=HS
+                )),
+                ("прочтение сообщения", lambda: client.put(
+                    f"/api/v1/messages/{last_message_id}/read", headers=HS
+                )),
+                ("прочтение всех сообщений", lambda: client.post(
+                    f"/api/v1/orders/{chat_order.id}/messages/mark-all-read", headers=HB
+                )),
+            ]
+            for label, call in checks:
+                captured.clear()
+                response = call()
+                if response.status_code >= 400:
+                    print(f"{label}: HTTP {response.status_code} {response.text}")
+                    failed = True
+                    continue
+                # Один и тот же запрос проверяется один раз (с первыми параметрами)
+                statements = {}
+                for statement, parameters in captured:
+                    statements.setdefault(statement, parameters)
+                explain = _plan_seq_scans_postgres if postgres else _plan_seq_scans_sqlite
+                problems = []
+                for statement, parameters in statements.items():
+                    scans = explain(connection, statement, parameters)
+                    if scans:
+                        problems.append((sorted(set(scans)), statement))
+                failed = failed or bool(problems)
+                print(f"{label:<32} {len(statements):>3} запросов  {'SEQ SCAN' if problems else 'ok'}")
+                for tables, statement in problems:
+                    print(f"    {', '.join(tables)}: " + " ".join(statement.split())[:200])
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        event.remove(connection, "before_cursor_execute", _capture)
+        db.close()
+        transaction.rollback()
+        connection.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
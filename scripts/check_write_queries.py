@@ -0,0 +1,173 @@
+"""
+Проверка числа SQL запросов на эндпоинтах заказов и сообщений
+
+Ответ пишущего эндпоинта строится из объектов сессии (expire_on_commit=False,
+RETURNING, identity map) без перечитывания строки после commit; списки
+(лента заказов, чаты, переписка) читаются фиксированным числом запросов
+независимо от числа строк. Скрипт прогоняет эндпоинты через TestClient на
+временной SQLite базе, считает запросы к БД (app.core.query_stats.capture)
+и завершается с ошибкой, если какой-то эндпоинт превысил бюджет или
+выполнил один и тот же запрос DB_N_PLUS_ONE_THRESHOLD раз и больше
+(query_stats.problems).
+
+Запуск: python scripts/check_write_queries.py
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Отдельная база и без автоприменения миграций - до импорта приложения
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/write_queries.db"
+os.environ["MIGRATIONS_APPLIED"] = "1"
+
+# Добавляем путь к корню проекта
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.testclient import TestClient
+from app.core import query_stats
+from app.core.database import Base, engine
+from app.main import app
+from app import models  # noqa: F401  (регистрация моделей в metadata)
+
+# Бюджет запросов на эндпоинт при прогретых кешах аутентификации и участников
+BUDGETS = {
+    "POST /orders/": 2,  # INSERT заказа, INSERT ... SELECT в outbox
+    "PUT /orders/{id}": 2,  # SELECT заказа, UPDATE
+    "PUT /orders/{id}/status": 3,  # SELECT заказа, UPDATE, SELECT поставщика для ответа
+    "POST /orders/{id}/respond": 3,  # UPDATE ... RETURNING, SELECT покупателя и поставщика для ответа
+    # SELECT получателя, INSERT, UPDATE сводки; для первого сообщения заказа
+    # еще SAVEPOINT, INSERT сводки, RELEASE
+    "POST /messages": 6,
+    "PUT /messages/{id}/read": 4,  # SELECT сообщения, upsert курсора, пересчет сводки, read_at по курсору
+    "POST /orders/{id}/messages/mark-all-read": 3,  # непрочитанные, upsert курсора, пересчет сводки
+    "DELETE /orders/{id}": 3,
+    # Списки на CHATS заказах с перепиской - число запросов не зависит от числа строк
+    "GET /orders/ (покупатель)": 1,  # SELECT заказов вместе с покупателем и поставщиком
+    "GET /orders/ (поставщик)": 2,  # перестройка снимка свободных заказов, собственные заказы
+    "GET /messages/chats": 1,  # сводки переписки вместе с заказами и собеседниками
+    "GET /orders/{id}/messages": 2,  # страница сообщений, курсор прочтения собеседника
+}
+# Заказов с перепиской для проверки списков
+CHATS = 8
+
+def measure(label: str, call):
+    """Выполнить запрос и вернуть (ответ, статистику его SQL запросов)"""
+    with query_stats.capture() as requests:
+        response = call()
+    if response.status_code >= 400:
+        raise SystemExit(f"{label}: HTTP {response.status_code} {response.text}")
+    _, stats = requests[-1]
+    return response, stats
+
+
+def main() -> int:
+    Base.metadata.create_all(bind=engine)
+    results = {}
+    with TestClient(app) as client:
+        tokens = {}
+        for username, role, email in (
+            ("buyer", "buyer", None),
+            ("supplier", "supplier", "supplier@example.com"),
+        ):
+            client.post("/api/v1/auth/register", json={
+                "username": username, "password": "secret", "role": role, "email": email
+            })
+            token = client.post(
+                "/api/v1/auth/login", data={"username": username, "password": "secret"}
+            ).json()["access_token"]
+            tokens[username] = {"Authorization": f"Bearer {token}"}
+        buyer, supplier = tokens["buyer"], tokens["supplier"]
+        buyer_id = client.get("/api/v1/auth/me", headers=buyer).json()["id"]
+        supplier_id = client.get("/api/v1/auth/me", headers=supplier).json()["id"]
+
+        new_order = {
+            "title": "Кабель ВВГ", "product_name": "кабель",
+            "deadline_at": "2030-01-01T00:00:00", "cost": 100
+        }
+        response, results["POST /orders/"] = measure(
+            "POST /orders/", lambda: client.post("/api/v1/orders/", headers=buyer, json=new_order)
+        )
+        order_id = response.json()["id"]
+        _, results["PUT /orders/{id}"] = measure(
+            "PUT /orders/{id}",
+            lambda: client.put(f"/api/v1/orders/{order_id}", headers=buyer, json={"note": "срочно"})
+        )
+        # Прогреваем кеш поставщика перед откликом
+        client.get("/api/v1/orders/", headers=supplier)
+        _, results["POST /orders/{id}/respond"] = measure(
+            "POST /orders/{id}/respond",
+            lambda: client.post(f"/api/v1/orders/{order_id}/respond", headers=supplier)
+        )
+        _, results["PUT /orders/{id}/status"] = measure(
+            "PUT /orders/{id}/status",
+            lambda: client.put(f"/api/v1/orders/{order_id}/status?new_status=в_работе", headers=buyer)
+        )
+        # Прогреваем кеш участников заказа
+        client.get(f"/api/v1/orders/{order_id}/messages", headers=buyer)
+        response, results["POST /messages"] = measure(
+            "POST /messages",
+            lambda: client.post("/api/v1/messages", headers=buyer, json={
+                "order_id": order_id, "receiver_id": supplier_id, "content": "Здравствуйте"
+            })
+        )
+        message_id = response.json()["id"]
+        _, results["PUT /messages/{id}/read"] = measure(
+            "PUT /messages/{id}/read",
+            lambda: client.put(f"/api/v1/messages/{message_id}/read", headers=supplier)
+        )
+        client.post("/api/v1/messages", headers=supplier, json={
+            "order_id": order_id, "receiver_id": buyer_id, "content": "Добрый день"
+        })
+        _, results["POST /orders/{id}/messages/mark-all-read"] = measure(
+            "POST /orders/{id}/messages/mark-all-read",
+            lambda: client.post(f"/api/v1/orders/{order_id}/messages/mark-all-read", headers=buyer)
+        )
+        spare_id = client.post("/api/v1/orders/", headers=buyer, json=new_order).json()["id"]
+        _, results["DELETE /orders/{id}"] = measure(
+            "DELETE /orders/{id}",
+            lambda: client.delete(f"/api/v1/orders/{spare_id}", headers=buyer)
+        )
+
+        # Несколько заказов с перепиской: N+1 в списках проявится повтором запроса
+        for i in range(CHATS):
+            chat_id = client.post("/api/v1/orders/", headers=buyer, json=new_order).json()["id"]
+            client.post(f"/api/v1/orders/{chat_id}/respond", headers=supplier)
+            for sender, receiver_id in ((buyer, supplier_id), (supplier, buyer_id)):
+                client.post("/api/v1/messages", headers=sender, json={
+                    "order_id": chat_id, "receiver_id": receiver_id, "content": f"Сообщение {i}"
+                })
+        # Свободные заказы для ленты поставщика
+        for _ in range(CHATS):
+            client.post("/api/v1/orders/", headers=buyer, json=new_order)
+        _, results["GET /orders/ (покупатель)"] = measure(
+            "GET /orders/ (покупатель)", lambda: client.get("/api/v1/orders/?limit=50", headers=buyer)
+        )
+        _, results["GET /orders/ (поставщик)"] = measure(
+            "GET /orders/ (поставщик)", lambda: client.get("/api/v1/orders/?limit=50", headers=supplier)
+        )
+        _, results["GET /messages/chats"] = measure(
+            "GET /messages/chats", lambda: client.get("/api/v1/messages/chats", headers=supplier)
+        )
+        _, results["GET /orders/{id}/messages"] = measure(
+            "GET /orders/{id}/messages",
+            lambda: client.get(f"/api/v1/orders/{order_id}/messages", headers=buyer)
+        )
+
+    failed = False
+    for label, budget in BUDGETS.items():
+        stats = results[label]
+        found = query_stats.problems(stats, budget)
+        failed = failed or bool(found)
+        print(f"{label:<44} {stats.count:>3} / {budget:<3} {'ПРЕВЫШЕН' if found else 'ok'}")
+        for problem in found:
+            print(f"    {problem}")
+        if stats.count > budget:
+            for statement, count in stats.statements.items():
+                print(f"    {count} x " + " ".join(statement.split())[:120])
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())